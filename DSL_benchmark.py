@@ -41,9 +41,13 @@ dsl = "SELECT Name, Age FROM bank_data FILTER(Name == 'Aaron Maashoh') AS aaron_
 tree = parser.parse(dsl)
 interpreter.interpret(tree)
 
-original_df = interpreter.clean_interpreter.tables["aaron_subset"].copy()
+# keep this version of the subset, each cleaning method below starts from it;
+# the snapshot shares its columns with the table, nothing is copied
+dsl = "SNAPSHOT aaron_subset AS aaron_original;"
+tree = parser.parse(dsl)
+interpreter.interpret(tree)
 print(f"\nThe query '{dsl}' executed successfully.")
-print(original_df.head())
+print(interpreter.table["aaron_subset"].head())
 
 dsl = "SELECT Name, Age FROM bank_data FILTER(Name == 'Aaron Maashoh' AND Age < 24);"
 tree = parser.parse(dsl)
@@ -57,27 +61,30 @@ except TypeError as e:
 # 4. Clean the invalid 'Age' entry in different ways
 # -----------------------
 
-interpreter.clean_interpreter.tables["aaron_subset"] = original_df.copy()
 dsl1 = "DROP ROW 3 FROM aaron_subset;"
 tree = parser.parse(dsl1)
 result1 = interpreter.interpret(tree)
 print("\n[Method 1] After dropping row 3:")
 print(result1.head())
 
-interpreter.clean_interpreter.tables["aaron_subset"] = original_df.copy()
+interpreter.interpret(parser.parse("RESTORE aaron_subset FROM aaron_original;"))
 dsl2 = "CLEAN NUMERIC aaron_subset Age REMOVE STRINGS;"
 tree = parser.parse(dsl2)
 result2 = interpreter.interpret(tree)
 print("\n[Method 2] After cleaning non-numeric values from 'Age':")
 print(result2.head())
 
-interpreter.clean_interpreter.tables["aaron_subset"] = original_df.copy()
+interpreter.interpret(parser.parse("RESTORE aaron_subset FROM aaron_original;"))
 dsl3 = "REPLACE aaron_subset ROW 3 COLUMN Age WITH 24;"
 tree = parser.parse(dsl3)
 result3 = interpreter.interpret(tree)
 print("\n[Method 3] After replacing cell (3, Age) with 24:")
 print(result3.head())
 
+interpreter.interpret(parser.parse("RESTORE aaron_subset FROM aaron_original;"))
+print("\nMemory of the versions of aaron_subset:")
+print(interpreter.interpret(parser.parse("SHOW SNAPSHOTS;")))
+
 # -----------------------
 # 5. Clean and fill missing values
 # -----------------------
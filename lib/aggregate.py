@@ -0,0 +1,138 @@
+# aggregation engine for SELECT: every aggregate of a statement is computed in one
+# grouping pass. rows are mapped to dense group codes (factorized group keys), counts
+# come from np.bincount, and sums / minimums / maximums from ufunc.reduceat over the
+# rows ordered by group, an ordering computed once and shared by every column
+
+import numpy as np
+import pandas as pd
+
+AGG_FUNCS = ("COUNT", "SUM", "AVG", "MIN", "MAX")
+
+
+def aggregate(df, group_by, aggregates):
+    # one row per group (a single row without GROUP BY): the group columns, then
+    # one column per aggregate named like count / sum_salary / avg_age
+    for expr in aggregates:
+        if expr.func not in AGG_FUNCS:
+            raise ValueError(f"Unknown aggregate function: {expr.func}")
+        if expr.param != "*" and expr.param not in df.columns:
+            raise ValueError(f"Column '{expr.param}' not found.")
+
+    group_by = list(group_by)
+    groups = Groups(df, group_by)
+
+    result = {col: groups.keys(df[col]) for col in group_by}
+    for expr in aggregates:
+        if expr.param == "*":
+            result[output_name(expr)] = groups.sizes
+        else:
+            result[output_name(expr)] = groups.reduce(df[expr.param], expr.func)
+    return pd.DataFrame(result)
+
+
+def output_name(expr):
+    # the result column of an aggregate: count for COUNT(*), else like sum_salary
+    if expr.param == "*":
+        return "count"
+    return f"{expr.func.lower()}_{expr.param}"
+
+
+class Groups:
+    # the grouping of the rows of a table: codes[i] is the group of row i, -1 for rows
+    # with a missing key (left out, like pandas' groupby). groups are numbered in the
+    # sorted order of their keys
+    def __init__(self, df, group_by):
+        if group_by:
+            self.codes, self.count = group_codes(df, group_by)
+        else:
+            self.codes, self.count = np.zeros(len(df), dtype=np.intp), 1
+        self.sizes = np.bincount(self.codes[self.codes >= 0], minlength=self.count)
+        # position of the first row of every group in 'order'
+        self.starts = (np.cumsum(self.sizes) - self.sizes).astype(np.intp)
+        self._order = None
+        # per column: (values ordered by group, valid mask), reused by every aggregate
+        self._columns = {}
+
+    @property
+    def order(self):
+        # row positions ordered by group, missing keys dropped
+        if self._order is None:
+            # shifted so missing keys sort first; up to 65535 groups the
+            # codes fit in 16 bits, which numpy radix sorts in linear time
+            codes = self.codes + 1
+            if self.count < np.iinfo(np.uint16).max:
+                codes = codes.astype(np.uint16)
+            order = np.argsort(codes, kind="stable")
+            self._order = order[len(order) - self.sizes.sum():]
+        return self._order
+
+    def keys(self, column):
+        # the key of every group, from its first row
+        return column.take(self.order[self.starts]).reset_index(drop=True)
+
+    def reduce(self, column, func):
+        values, valid = self._ordered(column)
+        if func == "COUNT":
+            return np.add.reduceat(valid.astype(np.int64), self.starts) if len(values) else self.sizes * 0
+
+        if values.dtype == object:
+            # strings and mixed values: let pandas compare them, group by group
+            series = pd.Series(values[valid], dtype=object)
+            reduced = series.groupby(self.codes[self.order][valid]).agg(func.lower() if func != "AVG" else "mean")
+            return reduced.reindex(range(self.count)).to_numpy()
+
+        if len(values) == 0:
+            # no rows: no group, or the single empty group without GROUP BY
+            return np.full(self.count, 0 if func == "SUM" else np.nan)
+
+        starts = self.starts
+        if func in ("SUM", "AVG"):
+            # small integer types (see lib/optimize.py) are summed in 64 bits
+            dtype = {"i": np.int64, "u": np.uint64}.get(values.dtype.kind)
+            summed = np.add.reduceat(np.where(valid, values, 0), starts, dtype=dtype)
+            if func == "SUM":
+                return summed
+            counts = np.add.reduceat(valid.astype(np.int64), starts)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return summed / counts
+        # fmin / fmax skip the NaN of missing values
+        ufunc = np.fmin if func == "MIN" else np.fmax
+        return ufunc.reduceat(values, starts)
+
+    def _ordered(self, column):
+        # the values of a column ordered by group, gathered once per column
+        key = column.name
+        if key not in self._columns:
+            if pd.api.types.is_bool_dtype(column.dtype):
+                column = column.astype(np.int64)
+            if isinstance(column.dtype, np.dtype) and column.dtype.kind in "iuf":
+                values = column.to_numpy()[self.order]
+                valid = ~np.isnan(values) if values.dtype.kind == "f" else np.ones(len(values), dtype=bool)
+            else:
+                values = column.to_numpy(dtype=object)[self.order]
+                valid = ~pd.isna(values)
+            self._columns[key] = (values, valid)
+        return self._columns[key]
+
+
+def group_codes(df, group_by):
+    # dense group codes in the lexicographic order of the keys, and the number of groups.
+    # every key column is factorized in sorted order, and the codes are combined
+    # column by column (re-factorized after each step so they never overflow)
+    codes, count = None, 1
+    for col in group_by:
+        col_codes, uniques = pd.factorize(df[col], sort=True)
+        if codes is None:
+            codes, count = col_codes, len(uniques)
+            continue
+        missing = (codes < 0) | (col_codes < 0)
+        combined = codes.astype(np.int64) * len(uniques) + col_codes
+        combined[missing] = -1
+        codes, uniques = pd.factorize(combined, sort=True)
+        # factorize numbers -1 like any value: move it back to the missing code
+        if missing.any():
+            codes = np.where(missing, -1, codes - (uniques[0] == -1))
+            count = len(uniques) - 1
+        else:
+            count = len(uniques)
+    return np.asarray(codes, dtype=np.intp), count
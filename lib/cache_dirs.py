@@ -0,0 +1,29 @@
+# directories of the on-disk caches (parser tables, loaded tables). the cache files are
+# pickles, which run code when they are read, so a cache lives in the user's own cache
+# directory, is created readable by its owner only, and a directory owned by another
+# user is refused instead of read
+
+import os
+import stat
+
+
+def user_cache_dir(name):
+    # $XDG_CACHE_HOME/dataprep_dsl/<name>, ~/.cache/dataprep_dsl/<name> by default
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "dataprep_dsl", name)
+
+
+def private_dir(path):
+    # create the directory (mode 0700) or check an existing one: it must be a real
+    # directory owned by the current user, and is made private when it isn't.
+    # raises PermissionError (an OSError, which the caches treat as no cache)
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"Cache directory '{path}' is not a directory.")
+    if hasattr(os, "getuid"):
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"Cache directory '{path}' is owned by another user.")
+        if info.st_mode & 0o077:
+            os.chmod(path, 0o700)
+    return path
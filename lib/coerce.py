@@ -0,0 +1,136 @@
+# bulk numeric coercion for CLEAN NUMERIC. every target column is factorized and each
+# distinct value goes through one search of a compiled number regex, then the numbers
+# found are spread back over the rows: a column costs one hashing pass over its rows
+# plus one regex match per distinct value, and the table is sliced once at the end.
+#   REMOVE STRINGS: a string counts only when it is a number ('12', ' -4.5 ', '1e3')
+#   STRIP STRINGS: the number in a string is kept ('24_' -> 24, '__10000__' -> 10000);
+#     a string holding digits besides that number ('1,000', '3-4') is not guessed at
+# rows left without a number in one of the columns are dropped
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+DIGIT = re.compile(r"\d")
+
+# with no column list, the non-numeric columns where at least this fraction of the
+# values are numbers or numeric strings are coerced
+MIN_NUMERIC_RATIO = 0.5
+
+# what a distinct value holds
+INVALID, NUMBER_VALUE, NUMBER_STRING, STRIPPED = range(4)
+
+
+def coerce_numeric(df, columns=None, strip=False, workers=1):
+    # (table, report). columns: the columns to coerce, None picks the mostly numeric
+    # non-numeric ones. report: one row per coerced column with the rows whose string
+    # became a number ('coerced'), those of them that lost other characters
+    # ('stripped') and the rows dropped for holding no number ('dropped', a row is
+    # counted in the first column that rejects it)
+    if columns:
+        targets = list(columns)
+        missing = [col for col in targets if col not in df.columns]
+        if missing:
+            raise ValueError(f"Columns not found: {', '.join(map(str, missing))}")
+    else:
+        targets = [col for col in df.columns if not pd.api.types.is_numeric_dtype(df[col])]
+
+    # the columns are classified independently: on threads with workers > 1, pandas
+    # hashes the rows of a string column with the GIL released
+    if workers > 1 and len(targets) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            classified = list(pool.map(lambda col: _classify(df[col], strip), targets))
+    else:
+        classified = [_classify(df[col], strip) for col in targets]
+    parts = dict(zip(targets, classified))
+
+    if not columns:
+        parts = {col: part for col, part in parts.items() if part is not None and _mostly_numbers(part)}
+
+    keep = np.ones(len(df), dtype=bool)
+    rows = []
+    for col in parts:
+        valid = _valid_rows(df[col], parts[col])
+        counts = _counts(parts[col])
+        rows.append((col, counts[NUMBER_STRING] + counts[STRIPPED], counts[STRIPPED], int((keep & ~valid).sum())))
+        keep &= valid
+    report = pd.DataFrame(rows, columns=["column", "coerced", "stripped", "dropped"]).set_index("column")
+
+    # one slice of the table, then only the coerced columns are replaced
+    result = (df if keep.all() else df[keep]).copy(deep=False)
+    for col, part in parts.items():
+        if part is not None:
+            result[col] = _numbers(part, keep)
+    return result, report
+
+
+def _classify(values, strip):
+    # (codes, kinds, numbers): the factorized column, what each distinct value holds
+    # and the number of each valid distinct value. None for a numeric column,
+    # which has nothing to coerce
+    if pd.api.types.is_numeric_dtype(values):
+        return None
+    codes, uniques = pd.factorize(values)
+    kinds = np.zeros(len(uniques), dtype=np.int8)
+    found = []      # positions in uniques of the values below
+    texts = []
+    for i, value in enumerate(uniques):
+        if isinstance(value, str):
+            match = NUMBER.search(value)
+            if match is None:
+                continue
+            exact = not value[:match.start()].strip() and not value[match.end():].strip()
+            if not exact and (not strip or DIGIT.search(value, match.end())):
+                continue
+            kinds[i] = NUMBER_STRING if exact else STRIPPED
+            texts.append(match.group())
+        elif isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_)):
+            kinds[i] = NUMBER_VALUE
+            texts.append(value)
+        else:
+            continue
+        found.append(i)
+    if not texts:
+        return codes, kinds, np.empty(0)
+    # one vectorized parse of the numbers found, ints stay ints (unless one is beyond
+    # int64, like a long ID, then they become floats); a string that doesn't parse
+    # ('1e999') holds no number
+    numbers = pd.to_numeric(pd.Series(texts, dtype=object), errors="coerce").to_numpy()
+    failed = pd.isna(numbers)
+    if failed.any():
+        kinds[np.asarray(found)[failed]] = INVALID
+        numbers = numbers[~failed]
+    return codes, kinds, numbers
+
+
+def _valid_rows(values, part):
+    # the rows holding a number; missing values hold none
+    if part is None:
+        return values.notna().to_numpy()
+    codes, kinds, _ = part
+    return np.append(kinds != INVALID, False)[codes]
+
+
+def _counts(part):
+    # rows per kind of value
+    if part is None:
+        return np.zeros(4, dtype=np.int64)
+    codes, kinds, _ = part
+    valued = codes[codes >= 0]
+    return np.bincount(kinds[valued], minlength=4) if len(valued) else np.zeros(4, dtype=np.int64)
+
+
+def _mostly_numbers(part):
+    counts = _counts(part)
+    present = counts.sum()
+    return present > 0 and counts[NUMBER_VALUE] + counts[NUMBER_STRING] >= MIN_NUMERIC_RATIO * present
+
+
+def _numbers(part, keep):
+    # the numbers of the kept rows, which all hold one
+    codes, kinds, numbers = part
+    # position of each valid distinct value in numbers
+    positions = np.cumsum(kinds != INVALID) - 1
+    return numbers[positions[codes[keep]]]
@@ -0,0 +1,72 @@
+# planning of deferred clean commands (Interpreter(lazy=True)). the commands of a table
+# are queued until a statement reads the table, then split into groups: a run of
+# adjacent column-wise commands is fused, every other command runs on its own.
+# a fused group runs on a narrow table holding only the columns its commands use, so
+# its row filters and column rewrites copy those columns only, and the full table is
+# sliced once, when the result is spliced back into it
+
+import pandas as pd
+from lib.nodes import FillNA, DropNA, CleanNumeric, CleanNonNumeric, FilterOutliers, Normalize
+
+
+def command_columns(cmd):
+    # the columns a column-wise command reads and writes, None when it needs the whole
+    # table (no column list) or the row labels (DROP ROW, REPLACE), which the narrow
+    # table does not keep
+    if isinstance(cmd, (FillNA, FilterOutliers, Normalize)):
+        return (cmd.column,)
+    if isinstance(cmd, (CleanNumeric, CleanNonNumeric)) and cmd.columns:
+        return tuple(cmd.columns)
+    if isinstance(cmd, DropNA) and cmd.axis == 0 and cmd.columns:
+        return tuple(cmd.columns)
+    return None
+
+
+def fuse(commands):
+    # split the commands into groups run in order: runs of two or more adjacent
+    # column-wise commands, and single commands
+    groups, run = [], []
+    for cmd in commands:
+        if command_columns(cmd) is not None:
+            run.append(cmd)
+            continue
+        groups.extend(_close(run))
+        run = []
+        groups.append([cmd])
+    groups.extend(_close(run))
+    return groups
+
+
+def _close(run):
+    # a single column-wise command gains nothing from a narrow table
+    return [run] if len(run) > 1 else [[cmd] for cmd in run]
+
+
+def narrow_table(df, commands):
+    # the columns used by the fused commands, rows numbered by position
+    # built column by column: selecting a column list would first consolidate the
+    # stored table (one block per column) into 2-d blocks, copying all of it
+    columns = dict.fromkeys(col for cmd in commands for col in command_columns(cmd))
+    index = pd.RangeIndex(len(df))
+    return pd.DataFrame({col: df[col].set_axis(index, copy=False) for col in columns}, copy=False)
+
+
+def splice(df, narrow):
+    # (table, unchanged columns): the table with the columns of the narrow table put
+    # back, keeping only the rows left in it (its index holds their positions)
+    others = [col for col in df.columns if col not in narrow.columns]
+    rows = narrow.index.to_numpy()
+    if len(rows) == len(df):
+        # no row removed: the other columns are shared with the old table
+        result = df.copy(deep=False)
+        for col in narrow.columns:
+            result[col] = narrow[col].set_axis(df.index, copy=False)
+        return result, others
+
+    # the single slice of the other columns, taken column by column (see narrow_table)
+    index = df.index[rows]
+    columns = {
+        col: narrow[col].array if col in narrow.columns else df[col].array.take(rows)
+        for col in df.columns
+    }
+    return pd.DataFrame(columns, index=index, copy=False), ()
@@ -0,0 +1,185 @@
+# secondary indexes used by FILTER (CREATE INDEX ON t(col)). a sorted index (the row
+# positions in value order) answers equality and range comparisons by binary search;
+# columns that are not numbers get a hash index for equality, the distinct values in a
+# pandas Index whose hash table maps a value to the rows holding it, and a sorted index
+# only once a range comparison needs one, sorting strings being slow.
+# an index belongs to the column version it was built from (see TableStore): once a
+# command changes the column it is rebuilt on first use
+
+import numpy as np
+import pandas as pd
+from pandas.errors import InvalidIndexError
+from lib.nodes import Compare, Logical
+from lib.tables import get_table, column_versions
+
+RANGE_OPS = ("<", "<=", ">", ">=")
+
+# ranges matching more than 1 / SORT_RATIO of the rows are put back in table order
+# through a row mask, which is cheaper than sorting that many positions
+SORT_RATIO = 16
+
+
+class HashIndex:
+    def __init__(self, column):
+        codes, uniques = pd.factorize(column)
+        self.keys = pd.Index(uniques)
+        # build the hash table now rather than on the first lookup
+        self.keys.get_indexer(self.keys[:1])
+        # row positions grouped by value (in table order within a value),
+        # the rows of keys[i] are positions[bounds[i]:bounds[i + 1]]
+        order = np.argsort(codes, kind="stable")
+        sizes = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        self.positions = order[len(order) - sizes.sum():]
+        self.bounds = np.concatenate([[0], np.cumsum(sizes)])
+
+    def equal(self, value):
+        # positions of the rows holding 'value', missing values never match
+        try:
+            code = self.keys.get_loc(value)
+        except (KeyError, TypeError, InvalidIndexError):
+            return np.empty(0, dtype=np.intp)
+        return self.positions[self.bounds[code]:self.bounds[code + 1]]
+
+
+class SortedIndex:
+    def __init__(self, column):
+        values = column.to_numpy()
+        valid = np.flatnonzero(column.notna().to_numpy())
+        # a stable sort keeps the rows of equal values in table order
+        self.positions = valid[np.argsort(values[valid], kind="stable")]
+        self.values = values[self.positions]
+        self.rows = len(column)
+
+    def equal(self, value):
+        start = np.searchsorted(self.values, value, side="left")
+        stop = np.searchsorted(self.values, value, side="right")
+        return self.positions[start:stop]
+
+    def range(self, op, value):
+        # positions of the rows where 'column op value' holds, in table order
+        cut = np.searchsorted(self.values, value, side="left" if op in ("<", ">=") else "right")
+        positions = self.positions[:cut] if op in ("<", "<=") else self.positions[cut:]
+        if len(positions) * SORT_RATIO > self.rows:
+            mask = np.zeros(self.rows, dtype=bool)
+            mask[positions] = True
+            return np.flatnonzero(mask)
+        return np.sort(positions)
+
+
+class ColumnIndex:
+    # the indexes of one column version
+    def __init__(self, column):
+        self.column = column
+        self.kind = _kind(column)
+        self._hash = None
+        self._sorted = None
+        if self.kind == "number":
+            self.sorted()
+        else:
+            self.hash()
+
+    def hash(self):
+        if self._hash is None:
+            self._hash = HashIndex(self.column)
+        return self._hash
+
+    def sorted(self):
+        if self._sorted is None:
+            self._sorted = SortedIndex(self.column)
+        return self._sorted
+
+    def lookup(self, cond):
+        # positions of the rows passing a comparison, in table order; None when
+        # the index can't answer it exactly like the comparison would
+        value = cond.value
+        if cond.op == "==":
+            if self.kind != "number":
+                return self.hash().equal(value)
+            if not _is_number(value):
+                # a number never equals a string
+                return np.empty(0, dtype=np.intp)
+            return self.sorted().equal(value)
+        if cond.op in RANGE_OPS:
+            if (self.kind == "number" and _is_number(value)) or (self.kind == "string" and isinstance(value, str)):
+                return self.sorted().range(cond.op, value)
+        return None
+
+
+def _kind(column):
+    # number or string when the values can be binary searched, other otherwise
+    dtype = column.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in "iuf":
+        return "number"
+    if dtype == object and pd.api.types.infer_dtype(column, skipna=True) == "string":
+        return "string"
+    return "other"
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class IndexCache:
+    def __init__(self, tables):
+        self.tables = tables
+        self.entries = {}       # (table, column) -> (column version, ColumnIndex)
+
+    def create(self, table_name, col):
+        df = get_table(self.tables, table_name)
+        if col not in df.columns:
+            raise ValueError(f"Column '{col}' not found.")
+        if column_versions(self.tables, table_name) is None:
+            raise ValueError(f"Table '{table_name}' cannot be indexed.")
+        self.entries[(table_name, col)] = (None, None)
+        return self.get(table_name, col)
+
+    def get(self, table_name, col):
+        # the index of a column, rebuilt when the column changed since it was built;
+        # None when the column has no index
+        entry = self.entries.get((table_name, col))
+        if entry is None:
+            return None
+        versions = column_versions(self.tables, table_name)
+        version = None if versions is None else versions.get(col)
+        if version is None:
+            # the table was dropped, or replaced by one without the column
+            return None
+        if entry[0] != version:
+            entry = (version, ColumnIndex(self.tables[table_name][col]))
+            self.entries[(table_name, col)] = entry
+        return entry[1]
+
+    def lookup(self, table_name, condition):
+        # answer a FILTER condition with an index: returns (positions, rest), the positions
+        # of the rows passing the first indexed comparison of the top-level AND chain and
+        # the rest of the condition (None if nothing is left), or None without a usable index
+        if not isinstance(self.tables.get(table_name), pd.DataFrame):
+            return None
+        terms = conjuncts(condition)
+        # equality first, it is the most selective
+        candidates = sorted(
+            (i for i, term in enumerate(terms) if isinstance(term, Compare)),
+            key=lambda i: terms[i].op != "==",
+        )
+        for i in candidates:
+            index = self.get(table_name, terms[i].column)
+            positions = None if index is None else index.lookup(terms[i])
+            if positions is not None:
+                return positions, conjunction(terms[:i] + terms[i + 1:])
+        return None
+
+
+def conjuncts(cond):
+    # the terms of an AND chain, left to right
+    if isinstance(cond, Logical) and cond.op == "AND":
+        return conjuncts(cond.left) + conjuncts(cond.right)
+    return [cond]
+
+
+def conjunction(terms):
+    if not terms:
+        return None
+    cond = terms[0]
+    for term in terms[1:]:
+        cond = Logical("AND", cond, term)
+    return cond
@@ -1,111 +1,227 @@
-from lark import Token, Tree
+import re
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
+from lib.nodes import (
+    FillNA, DropNA, CleanNumeric, CleanNonNumeric, DropRow, DropColumn,
+    ReplaceCell, FilterOutliers, Normalize,
+)
+from lib.coerce import coerce_numeric
+from lib.fusion import fuse, narrow_table, splice
+from lib.oplog import rewritten_columns
+from lib.stats import ColumnStats, StatsCache
+from lib.tables import (
+    TableStore, column_versions, get_table, store_table, update_columns, drop_columns, set_cell, with_category,
+    StreamTable,
+)
+
+
+def remove_str_in_numeric(df, columns=None, strip=False):
+    # turn the columns into numbers and drop the rows holding a non-number in one of
+    # them; strip keeps the number found inside a string. see lib/coerce.py
+    return coerce_numeric(df, columns, strip)[0]
+
+
+# a string holding a decimal number, e.g. '123', '-4.5', ' 1e3 '
+NUMBER_STRING = re.compile(r"\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*")
+
+
+def is_number(value):
+    if isinstance(value, str):
+        return NUMBER_STRING.fullmatch(value) is not None
+    return isinstance(value, (int, float, np.number))
+
+
+def numeric_values(values):
+    # boolean mask of the numbers and numeric strings in a column, missing values excluded.
+    # each distinct value is classified once and the result is spread back over the rows
+    codes, uniques = pd.factorize(values)
+    flags = np.fromiter((is_number(value) for value in uniques), dtype=bool, count=len(uniques))
+    # missing values have code -1, which picks the trailing False
+    return np.append(flags, False)[codes]
+
+
+def remove_num_in_nonnumeric(df, columns=None, workers=1):
+    # drop the rows holding a number in one of the non-numeric columns
+    if columns:
+        cols = list(columns)
+    else:
+        cols = [col for col in df.columns if not pd.api.types.is_numeric_dtype(df[col])]
+
+    # the columns are classified on threads with workers > 1, like CLEAN NUMERIC
+    if workers > 1 and len(cols) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            masks = list(pool.map(lambda col: numeric_values(df[col]), cols))
+    else:
+        masks = [numeric_values(df[col]) for col in cols]
+
+    # one combined mask, so the table is sliced once whatever the number of columns
+    keep = np.ones(len(df), dtype=bool)
+    for mask in masks:
+        keep &= ~mask
+    return df[keep]
+
 
 class CleanInterpreter:
-    def __init__(self, tables):
+    def __init__(self, tables, workers=1, lazy=False, log=None):
         self.tables = tables
+        # OpLog recording every command for UNDO / REDO, None keeps no history
+        self.log = log
+        # threads classifying the columns of CLEAN NUMERIC / NONNUMERIC (the
+        # commands run in this process: per row they only hash and slice)
+        self.workers = workers
+        # lazy: commands are queued per table until flush(), see lib/fusion.py
+        self.lazy = lazy
+        self.pending = {}       # table name -> queued commands
+        # column statistics, reused until the column changes
+        self.stats = StatsCache(tables)
+        # table name -> per-column rows coerced and dropped by its last CLEAN NUMERIC
+        self.coercion_reports = {}
+
+    def execute(self, cmd):
+        if isinstance(self.tables.get(cmd.table), StreamTable):
+            return self.execute_stream(cmd)
+
+        if self.lazy:
+            if cmd.table not in self.tables:
+                raise ValueError(f"Table '{cmd.table}' not found. Load it first!")
+            self.pending.setdefault(cmd.table, []).append(cmd)
+            return None
+        return self.run_logged(cmd.table, [cmd], lambda: self.run(cmd))
+
+    def flush(self, table_name=None):
+        # run the queued commands of a table, of every table when None. if a command
+        # fails the rest of the queue is dropped, the table keeps the commands run so far
+        names = [table_name] if table_name is not None else list(self.pending)
+        for name in names:
+            for group in fuse(self.pending.pop(name, ())):
+                if len(group) == 1:
+                    self.run_logged(name, group, lambda: self.run(group[0]))
+                else:
+                    # a fused run is logged, and undone, as one operation
+                    self.run_logged(name, group, lambda: self.run_fused(name, group))
+
+    def run_logged(self, table_name, commands, run):
+        # run commands on a table, recording the change they make in the log
+        if self.log is None:
+            return run()
+        # a lazy table is read first, the log holds the tables in memory
+        before = get_table(self.tables, table_name)
+        before_versions = column_versions(self.tables, table_name)
+        result = run()
+        self.log.record(table_name, before, before_versions, commands,
+                        rewritten_columns(commands, self.coercion_reports))
+        return result
 
-    def execute(self, tree):
-        cmd = tree.children[0]
-        if cmd.data == "fillna_cmd":
+    def discard(self, table_name):
+        # forget the queued commands of a table that is replaced
+        self.pending.pop(table_name, None)
+
+    def run_fused(self, table_name, commands):
+        # run column-wise commands on a narrow table of the columns they use, then
+        # splice the result back: the whole table is sliced at most once
+        df = get_table(self.tables, table_name)
+        scratch = CleanInterpreter(TableStore(), self.workers)
+        scratch.tables[table_name] = narrow_table(df, commands)
+        for cmd in commands:
+            scratch.run(cmd)
+        self.coercion_reports.update(scratch.coercion_reports)
+
+        result, unchanged = splice(df, scratch.tables[table_name])
+        return store_table(self.tables, table_name, result, unchanged)
+
+    def run(self, cmd):
+        # run one command now
+        if isinstance(cmd, FillNA):
             return self.execute_fillna(cmd)
-        elif cmd.data == "dropna_cmd":
+        elif isinstance(cmd, DropNA):
             return self.execute_dropna(cmd)
-        elif cmd.data == "filter_outliers_cmd":
+        elif isinstance(cmd, FilterOutliers):
             return self.execute_filter_outliers(cmd)
-        elif cmd.data == "normalize_cmd":
+        elif isinstance(cmd, Normalize):
             return self.execute_normalize(cmd)
-        elif cmd.data == "remove_str_in_numeric_cmd":
+        elif isinstance(cmd, CleanNumeric):
             return self.execute_clean_remove_str_in_numeric(cmd)
-        elif cmd.data == "remove_num_in_nonnumeric_cmd":
+        elif isinstance(cmd, CleanNonNumeric):
             return self.execute_clean_remove_num_in_nonnumeric(cmd)
-        elif cmd.data == "drop_row_col_cmd":
+        elif isinstance(cmd, (DropRow, DropColumn)):
             return self.execute_drop_row_col(cmd)
-        elif cmd.data == "replace_cell_cmd":
+        elif isinstance(cmd, ReplaceCell):
             return self.execute_replace_cell(cmd)
         else:
-            raise ValueError(f"Unknown clean commands: {cmd.data}")
+            raise ValueError(f"Unknown clean commands: {type(cmd).__name__}")
+
+    def execute_stream(self, cmd):
+        # a streamed table is never held in memory: the command becomes one more
+        # stage run on every chunk, which only works for row-local commands
+        stream = self.tables[cmd.table]
+
+        if isinstance(cmd, CleanNumeric):
+            if not cmd.columns:
+                # the columns are chosen from their values, which could differ between chunks
+                raise ValueError(f"CLEAN NUMERIC needs a column list on streamed table '{cmd.table}'")
+            stage = lambda chunk: remove_str_in_numeric(chunk, cmd.columns, cmd.strip)
+        elif isinstance(cmd, CleanNonNumeric):
+            stage = lambda chunk: remove_num_in_nonnumeric(chunk, cmd.columns)
+        elif isinstance(cmd, FillNA) and cmd.method == "value":
+            stage = lambda chunk: chunk.assign(**{cmd.column: chunk[cmd.column].fillna(cmd.value)})
+        elif isinstance(cmd, DropColumn):
+            stage = lambda chunk: chunk.drop(columns=cmd.column)
+        else:
+            # statistics (mean, quantiles, ...) and row positions span the whole file
+            raise ValueError(f"{type(cmd).__name__} is not supported on streamed table '{cmd.table}'")
 
-    def execute_fillna(self, tree):
-        table_name = tree.children[0].value 
-        col = tree.children[1].value
-        method = tree.children[2] 
+        self.tables[cmd.table] = stream.then(stage)
+        return self.tables[cmd.table]
 
-        df = self.tables[table_name]
-        df = df.copy() 
-        
-        if isinstance(method, Tree):
-            method_name = method.data
+
+    def execute_fillna(self, cmd):
+        table_name = cmd.table
+        col = cmd.column
+        method_name = cmd.method
+
+        df = get_table(self.tables, table_name)
+
+        if method_name == "value":
+            fill_value = cmd.value
+        else:
             # only check numeric dtype if it's a statistical method
             if not pd.api.types.is_numeric_dtype(df[col]):
                 raise TypeError(f"Column '{col}' contains non-numeric values, cannot compute {method_name}.")
 
+            # the mean is exact either way: it already takes one pass and constant memory
             if method_name == "mean":
-                fill_value = df[col].mean()
+                fill_value = self.stats.mean(df, table_name, col)
+            elif method_name == "median" and cmd.approx:
+                fill_value = self.stats.approx_quantile(df, table_name, col, 0.5)
             elif method_name == "median":
-                fill_value = df[col].median()
+                fill_value = self.stats.median(df, table_name, col)
+            elif method_name == "mode" and cmd.approx:
+                fill_value = self.stats.approx_mode(df, table_name, col)
             elif method_name == "mode":
-                fill_value = df[col].mode().iloc[0]
+                fill_value = self.stats.mode(df, table_name, col)
             else:
-                raise ValueError(f"Unsupported fill method tree: {method_name}")
-
+                raise ValueError(f"Unsupported fill method: {method_name}")
 
-        elif isinstance(method, Token):
-            if method.type == "NUMBER":
-                fill_value = float(method.value)
-            elif method.type == "STRING":
-                fill_value = str(method.value.strip("'\""))
-            else:
-                raise ValueError(f"Unsupported token type in fill method: {method.type}")
-        else:
-            raise ValueError("Invalid fill method format")
+        missing = int(df[col].isna().sum())
+        before = self.stats.versions(table_name)
+        # only the filled column is replaced, the others are shared with the old table
+        result = update_columns(self.tables, table_name, {col: with_category(df[col], fill_value).fillna(fill_value)})
+        self.stats.values_added(table_name, col, before, ColumnStats.constant(fill_value, missing))
+        return result
 
-        df.loc[:, col] = df[col].fillna(fill_value)
-        self.tables[table_name] = df
-        return df
 
+    def execute_dropna(self, cmd):
+        table_name = cmd.table
+        df = get_table(self.tables, table_name)
 
-    def execute_dropna(self, tree):
-        table_name = tree.children[0].value 
-        df = self.tables[table_name]
-        df = df.copy() 
-
-        # set default values
-        axis = 0
-        how = 'any'
-        col_list = None
-
-        # iterate through the children of the tree
-        children = tree.children[1:]
-        i = 0
-
-        # deal with axis parameter, 0 for rows, 1 for columns
-        axis_token = children[i]
-        axis = 0 if axis_token.upper() == "ROWS" else 1
-        i += 1
-
-        # deal with how parameter, 'any' for any NA, 'all' for all NA
-        if i < len(children) and children[i].upper() == "WHERE":
-            i += 1
-            how_token = children[i].upper()
-            if how_token in ("ALL", "ANY"):
-                how = how_token
-                i += 1
-
-        # deal with columns to drop NA from
-        if i < len(children) and children[i].upper() == "IN":
-            i += 1
-            col_list = []
-            while i < len(children) and isinstance(children[i], str):
-                col = children[i]
-                if col != ",":
-                    col_list.append(col)
-                i += 1
+        # axis: 0 for rows, 1 for columns; how: 'any' for any NA, 'all' for all NA
+        col_list = list(cmd.columns) if cmd.columns else None
 
         # apply above parameters to dropna
         result = df.dropna(
-            axis=axis,
-            how=how,
+            axis=cmd.axis,
+            how=cmd.how,
             subset=col_list,
             inplace=False
         )
@@ -113,185 +229,139 @@ class CleanInterpreter:
         return result
 
 
-    def execute_clean_remove_str_in_numeric(self, tree):
-        table_name = tree.children[0].value
-        if table_name not in self.tables:
-            raise ValueError(f"Table '{table_name}' not found. Load it first!")
-
-        df = self.tables[table_name]
-        df = df.copy() 
-
-        if len(tree.children) > 1:
-            col_info = tree.children[1]
-            if isinstance(col_info, Token):
-                cols = [col_info.value]
-            else:
-                cols = [col.value for col in col_info.children if isinstance(col, Token)]
-        else:
-            # if no columns specified, apply to all numeric columns
-            cols = df.select_dtypes(include='number').columns
+    def execute_clean_remove_str_in_numeric(self, cmd):
+        table_name = cmd.table
+        df = get_table(self.tables, table_name)
 
-        for col in cols:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-        df = df.dropna(subset=cols, how='any')
+        # each distinct value is parsed once, the work left per row is hashing, one
+        # take and one slice; with workers > 1 the columns are classified on threads
+        df, report = coerce_numeric(df, cmd.columns, cmd.strip, self.workers)
+        self.coercion_reports[table_name] = report
         self.tables[table_name] = df
         return df
 
 
-    def execute_clean_remove_num_in_nonnumeric(self, tree):
-        table_name = tree.children[0].value
-        if table_name not in self.tables:
-            raise ValueError(f"Table '{table_name}' not found. Load it first!")
-
-        df = self.tables[table_name]
-        df = df.copy() 
-
-        if len(tree.children) > 1:
-            col_info = tree.children[1]
-            if isinstance(col_info, Token):
-                cols = [col_info.value]
-            else:
-                cols = [col.value for col in col_info.children if isinstance(col, Token)]
-        else:
-            cols = [col for col in df.columns if not pd.api.types.is_numeric_dtype(df[col])]
+    def execute_clean_remove_num_in_nonnumeric(self, cmd):
+        table_name = cmd.table
+        df = get_table(self.tables, table_name)
 
-        for col in cols:
-            df = df[~df[col].apply(lambda x: isinstance(x, (int, float)))]
+        # classified per distinct value, like CLEAN NUMERIC
+        df = remove_num_in_nonnumeric(df, cmd.columns, self.workers)
         self.tables[table_name] = df
         return df
 
 
-    def execute_drop_row_col(self, tree):
-        drop_type_token = tree.children[0] 
-        value_token = tree.children[1]  
-        # FROM token is at index 2  
-        table_name = tree.children[3].value
-
-        if table_name not in self.tables:
-            raise ValueError(f"Table '{table_name}' not found. Load it first!")
+    def execute_drop_row_col(self, cmd):
+        table_name = cmd.table
 
-        df = self.tables[table_name]
-        df = df.copy() 
+        df = get_table(self.tables, table_name)
 
-        if drop_type_token.type == "ROW":
-            row_index = int(value_token.value)
-            df = df.drop(index=row_index)
-        elif drop_type_token.type == "COLUMN":
-            col_name = value_token.value
-            df = df.drop(columns=col_name)
+        if isinstance(cmd, DropRow):
+            before = self.stats.versions(table_name)
+            removed = df.loc[[cmd.row]]
+            self.tables[table_name] = df.drop(index=cmd.row)
+            self.stats.rows_removed(table_name, before, removed)
+        elif isinstance(cmd, DropColumn):
+            # the other columns stay shared with the previous version
+            drop_columns(self.tables, table_name, [cmd.column])
         else:
             raise ValueError("DROP must specify ROW or COLUMN")
 
-        self.tables[table_name] = df
-        return df
+        return self.tables[table_name]
 
         
-    def execute_replace_cell(self, tree):
-        table_name = tree.children[0].value
-        row_index = int(tree.children[2].value) 
-        col_name = tree.children[4].value
-        val_node = tree.children[5]
-
-        if table_name not in self.tables:
-            raise ValueError(f"Table '{table_name}' not found. Load it first!")
+    def execute_replace_cell(self, cmd):
+        table_name = cmd.table
+        row_index = cmd.row
+        col_name = cmd.column
+        val = cmd.value
 
-        df = self.tables[table_name]
-        df = df.copy() 
+        df = get_table(self.tables, table_name)
 
         if row_index not in df.index:
             raise IndexError(f"Row index {row_index} does not exist in table '{table_name}'")
 
-        if val_node.type == "NUMBER":
-            val = float(val_node.value) if "." in val_node.value else int(val_node.value)
-        else:
-            val = val_node.value.strip("'")
-
-        df.at[row_index, col_name] = val
-        self.tables[table_name] = df
-        return df
-
-
+        before = self.stats.versions(table_name)
+        old_values = df.loc[[row_index], col_name] if col_name in df.columns else None
+        # only the column holding the cell is copied
+        result = set_cell(self.tables, table_name, row_index, col_name, val)
+        if old_values is not None:
+            self.stats.values_replaced(table_name, col_name, before, old_values, result.loc[[row_index], col_name])
+        return result
 
-    def execute_filter_outliers(self, tree):
-        table_name = tree.children[0].value 
-        col = tree.children[1].value
-        df = self.tables[table_name]
-        df = df.copy() 
 
-        # default outlier detection method
-        method = "iqr"
-        threshold = 1.5
 
-        # if a method is specified
-        if len(tree.children) > 2:
-            method_tree = tree.children[2]
-            method_token = method_tree.children[0]
+    def execute_filter_outliers(self, cmd):
+        table_name = cmd.table
+        col = cmd.column
+        df = get_table(self.tables, table_name)
 
-            if method_token.type.upper() == "ZSCORE":
-                method = "zscore"
-                threshold_token = method_tree.children[1]
-                threshold = float(threshold_token)
-            elif method_token.type.upper() == "IQR":
-                method = "iqr"
+        # outlier detection method, IQR with a 1.5 threshold by default
+        method = cmd.method
+        threshold = cmd.threshold
 
         if method == "zscore":
-            col_mean = df[col].mean()
-            col_std = df[col].std()
+            # mean and std are one-pass statistics, APPROX leaves them exact
+            col_mean = self.stats.mean(df, table_name, col)
+            col_std = self.stats.std(df, table_name, col)
             z_scores = (df[col] - col_mean) / col_std
-            df_filtered = df[z_scores.abs() <= threshold]
-            self.tables[table_name] = df_filtered
+            keep = z_scores.abs() <= threshold
 
         elif method == "iqr":
-            q1 = df[col].quantile(0.25)
-            q3 = df[col].quantile(0.75)
+            quantile = self.stats.approx_quantile if cmd.approx else self.stats.quantile
+            q1 = quantile(df, table_name, col, 0.25)
+            q3 = quantile(df, table_name, col, 0.75)
             iqr = q3 - q1
             lower_bound = q1 - threshold * iqr
             upper_bound = q3 + threshold * iqr
-            df_filtered = df[(df[col] >= lower_bound) & (df[col] <= upper_bound)]
-            self.tables[table_name] = df_filtered
+            keep = (df[col] >= lower_bound) & (df[col] <= upper_bound)
+
+        else:
+            raise ValueError(f"Unknown outlier method: {method}")
 
-        return df_filtered
+        if keep.all():
+            # nothing to remove: the table and its cached statistics stay as they are
+            return df
 
-    def execute_normalize(self, tree):
-        table_name = tree.children[0].value
-        col = tree.children[1].value
-        df = self.tables[table_name]
-        df = df.copy() 
+        before = self.stats.versions(table_name)
+        self.tables[table_name] = df[keep]
+        # the statistics of every cached column lose the removed rows only
+        self.stats.rows_removed(table_name, before, df[~keep])
+        return self.tables[table_name]
 
-        # default normalization method
-        method = "MINMAX" 
+    def execute_normalize(self, cmd):
+        table_name = cmd.table
+        col = cmd.column
+        df = get_table(self.tables, table_name)
 
-        if len(tree.children) > 3:
-            if tree.children[2].upper() == "WITH":
-                method = tree.children[3].upper()
+        # normalization method, MIN-MAX by default
+        method = cmd.method.upper()
 
         s = df[col]
 
         if method == "MINMAX":
-            min = s.min()
-            max = s.max()
+            # as Python floats: the range of a small integer type may not fit in it
+            min = float(self.stats.min(df, table_name, col))
+            max = float(self.stats.max(df, table_name, col))
             range = max - min
-
-            # If all values are the same, keep them unchanged to avoid zero division error
-            if range == 0:
-                normed = s
-            else:
-                normed = (s - min) / range
+            shift, scale = min, range
 
         elif method == "ZSCORE":
-            mean = s.mean()
-            std = s.std()
-
-            # If all values are the same, keep them unchanged
-            if std == 0:
-                normed = s
-            else:
-                normed = (s - mean) / std
+            shift = self.stats.mean(df, table_name, col)
+            scale = self.stats.std(df, table_name, col)
 
         else:
             raise ValueError(f"Unknown normalization method: {method}")
 
-        df[col] = normed
-        self.tables[table_name] = df
-        return df
\ No newline at end of file
+        # If all values are the same, keep them unchanged to avoid zero division error
+        if scale == 0:
+            shift, scale = 0, 1
+            normed = s
+        else:
+            normed = (s - shift) / scale
+
+        before = self.stats.versions(table_name)
+        result = update_columns(self.tables, table_name, {col: normed})
+        # the statistics of the normalized column follow from the old ones
+        self.stats.column_scaled(table_name, col, before, shift, scale)
+        return result
\ No newline at end of file
@@ -1,29 +1,120 @@
-from lark import Tree, Token
+import time
+import pandas as pd
+from lib.parser import get_parser
+from lib.nodes import (
+    LoadStmt, SaveStmt, SelectStmt, ExplainStmt, CreateIndex, Snapshot, Restore, ShowSnapshots, Undo, Redo,
+    CleanCmd, PlotCmd,
+)
+from lib.indexes import IndexCache
+from lib.load_cache import LoadCache
+from lib.oplog import OpLog
+from lib.snapshots import Snapshots
+from lib.tables import TableStore
 from lib.interpreter.load_interpreter import LoadInterpreter
 from lib.interpreter.select_interpreter import SelectInterpreter
 from lib.interpreter.clean_interpreter import CleanInterpreter
 from lib.interpreter.plot_interpreter import PlotInterpreter
 
 class Interpreter:
-    def __init__(self):
-        self.table = {}
-        self.load_interpreter = LoadInterpreter(self.table)
-        self.select_interpreter = SelectInterpreter(self.table)
-        self.clean_interpreter = CleanInterpreter(self.table)
+    def __init__(self, workers=1, load_cache=True, lazy=False, history=0):
+        # workers: threads classifying the columns of CLEAN NUMERIC / NONNUMERIC
+        # load_cache: a LoadCache for the files read by LOAD, True for the default
+        # one (see lib/load_cache.py), False to parse every file on every LOAD
+        # lazy: clean commands are queued until a SELECT, PLOT, SAVE or CREATE INDEX
+        # reads the table, adjacent column-wise ones are fused (see lib/fusion.py)
+        # history: clean commands kept for UNDO (see lib/oplog.py, DEFAULT_LIMIT is a
+        # usual value); off by default, the log holds on to the replaced columns
+        if load_cache is True:
+            load_cache = LoadCache()
+        self.load_cache = load_cache or None
+        self.table = TableStore()
+        self.indexes = IndexCache(self.table)
+        self.snapshots = Snapshots(self.table)
+        self.parser = None
+        self.load_interpreter = LoadInterpreter(self.table, self.load_cache)
+        self.select_interpreter = SelectInterpreter(self.table, self.indexes)
+        self.log = OpLog(self.table, history) if history else None
+        self.clean_interpreter = CleanInterpreter(self.table, workers, lazy, self.log)
         self.plot_interpreter = PlotInterpreter(self.table)
 
-    def interpret(self, tree):
-        if isinstance(tree, Token):
-            return tree.value
+    def interpret(self, node):
+        if isinstance(node, LoadStmt):
+            result = self.load_interpreter.execute(node)
+            # the commands queued for the table it replaces no longer apply
+            self.clean_interpreter.discard(node.table)
+            return result
+        elif isinstance(node, SaveStmt):
+            self.flush(node.table)
+            return self.load_interpreter.execute(node)
+        elif isinstance(node, SelectStmt):
+            self.flush(node.table)
+            result = self.select_interpreter.execute(node)
+            if node.into is not None:
+                self.clean_interpreter.discard(node.into)
+            return result
+        elif isinstance(node, ExplainStmt):
+            plan = self.select_interpreter.explain(node.select)
+            print(plan)
+            return plan
+        elif isinstance(node, CreateIndex):
+            self.flush(node.table)
+            return self.indexes.create(node.table, node.column)
+        elif isinstance(node, Snapshot):
+            self.flush(node.table)
+            return self.snapshots.take(node.table, node.name)
+        elif isinstance(node, Restore):
+            result = self.snapshots.restore(node.table, node.name)
+            self.clean_interpreter.discard(node.table)
+            return result
+        elif isinstance(node, ShowSnapshots):
+            # the rows, columns and memory of every version, see Snapshots.report
+            return self.snapshots.report()
+        elif isinstance(node, (Undo, Redo)):
+            if self.log is None:
+                raise ValueError("UNDO / REDO need an interpreter keeping a history")
+            # queued commands run first, so they are in the history
+            self.flush()
+            if isinstance(node, Undo):
+                return self.log.undo(node.count)
+            return self.log.redo(node.count)
+        elif isinstance(node, CleanCmd):
+            return self.clean_interpreter.execute(node)
+        elif isinstance(node, PlotCmd):
+            self.flush(node.table)
+            return self.plot_interpreter.execute(node)
+        else:
+            raise ValueError(f"Unknown operation: {type(node).__name__}")
 
-        if isinstance(tree, Tree):
-            if tree.data == "load_stmt":
-                return self.load_interpreter.execute(tree)
-            elif tree.data == "select_stmt":
-                return self.select_interpreter.execute(tree)
-            elif tree.data == "clean_cmds":
-                return self.clean_interpreter.execute(tree)
-            elif tree.data == "plot_cmd":
-                return self.plot_interpreter.execute(tree)
-            else:
-                raise ValueError(f"Unknown operation: {tree.data}")
+    def flush(self, table_name=None):
+        # run the clean commands queued in lazy mode, for one table or all of them
+        self.clean_interpreter.flush(table_name)
+
+    def run_script(self, script, keep_results=False):
+        # parse the whole script once, then execute the statements in order.
+        # keep_results: the report holds each statement's result; off by default, as
+        # the results (intermediate tables, old table versions) would stay in memory
+        # until the script ends
+        if self.parser is None:
+            self.parser = get_parser()
+        statements = self.parser.parse_program(script)
+
+        # one report entry per statement: its kind, the time it took and the shape
+        # of the table it returned
+        report = []
+        for node in statements:
+            start = time.perf_counter()
+            result = self.interpret(node)
+            entry = {
+                "statement": type(node).__name__,
+                "seconds": time.perf_counter() - start,
+                "shape": result.shape if isinstance(result, pd.DataFrame) else None,
+            }
+            if keep_results:
+                entry["result"] = result
+            report.append(entry)
+        return report
+
+    def run_file(self, path, keep_results=False):
+        # run a .dsl script file
+        with open(path, encoding="utf-8") as f:
+            return self.run_script(f.read(), keep_results)
@@ -1,24 +1,67 @@
-import pandas as pd
-import os
+from lib.nodes import SaveStmt
+from lib.optimize import optimize_dtypes
+from lib.readers import check_source, read_files, read_table, write_table, CHUNKED_FORMATS
+from lib.tables import LazyTable, StreamTable, get_table
+
+def read_optimized(file_name):
+    return optimize_dtypes(read_table(file_name))
+
 
 class LoadInterpreter:
-    def __init__(self, table):
+    def __init__(self, table, cache=None):
         self.table = table
+        # LoadCache serving the parsed tables of unchanged files, None reads every time
+        self.cache = cache
+        # table name -> per-column dtype and memory report of its LOAD ... OPTIMIZE
+        self.memory_reports = {}
+
+    def execute(self, stmt):
+        if isinstance(stmt, SaveStmt):
+            return self.execute_save(stmt)
+
+        file_name = stmt.path
+        table_name = stmt.table
 
-    def execute(self, tree):
-        file_name = tree.children[0].value.strip("'\"")
-        table_name = tree.children[1].value
-
-        # check if the file exists
-        if not os.path.isfile(file_name):
-             raise FileNotFoundError(f"File {file_name} not found")
-        
-        # only allow loading from csv or json files
-        if file_name.endswith(".csv"):
-            self.table[table_name] = pd.read_csv(file_name)
-        elif file_name.endswith(".json"):
-            self.table[table_name] = pd.read_json(file_name)
+        # check the file exists and its format is supported; a glob pattern gives its shards
+        files = check_source(file_name)
+
+        if stmt.optimize and stmt.mode != "eager":
+            raise ValueError("OPTIMIZE only applies to tables loaded in full")
+        # a glob pattern (not an existing file whose name looks like one) is sharded
+        sharded = files != [file_name] or stmt.source is not None
+        if sharded and stmt.mode != "eager":
+            raise ValueError("glob patterns and WITH SOURCE only apply to tables loaded in full")
+
+        if sharded:
+            # every shard is read (and cached) on its own, then they are stacked once
+            read = read_table if self.cache is None else lambda name: self.cache.load(name, read_table)
+            df = read_files(files, read, stmt.source)
+            if stmt.optimize:
+                df, self.memory_reports[table_name] = optimize_dtypes(df)
+            self.table[table_name] = df
+        elif stmt.optimize:
+            # the optimized table and its report are cached together
+            if self.cache is not None:
+                df, report = self.cache.load(file_name, read_optimized, options=("optimize",))
+            else:
+                df, report = read_optimized(file_name)
+            self.table[table_name] = df
+            self.memory_reports[table_name] = report
+        elif stmt.mode == "lazy":
+            # defer reading until a query references the table
+            self.table[table_name] = LazyTable(file_name)
+        elif stmt.mode == "stream":
+            # columnar files are read column by column, not in chunks of rows
+            if not file_name.endswith(CHUNKED_FORMATS):
+                raise ValueError(f"STREAM requires a {', '.join(CHUNKED_FORMATS)} file: {file_name}")
+            self.table[table_name] = StreamTable(file_name)
+        elif self.cache is not None:
+            self.table[table_name] = self.cache.load(file_name, read_table)
         else:
-            raise ValueError(f"Unsupported file format: {file_name}. Must be .csv or .json")
-        
+            self.table[table_name] = read_table(file_name)
+
         return self.table[table_name]
+
+    def execute_save(self, stmt):
+        # write a table to a file, which LOAD can read back
+        return write_table(get_table(self.table, stmt.table), stmt.path)
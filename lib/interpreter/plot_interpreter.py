@@ -1,48 +1,20 @@
 import matplotlib.pyplot as plt
 import pandas as pd
-from lark import Token, Tree
+from lib.tables import get_table
 
 class PlotInterpreter():
     def __init__(self, table):
         self.table = table
 
-    def execute(self, tree):
-        col_list = []
-        table_name = None
-        plot_type = None
-
-        # define the set of valid plot_type values
-        PLOT_TYPES = {"HIST", "HISTOGRAM", "SCATTER", "BOX", "LINE"}
-
-        for child in tree.children:
-            if isinstance(child, Token):
-                if child.type == "COL_NAME":
-                    col_list.append(child.value)
-                elif child.type == "TABLE_NAME":
-                    table_name = child.value
-                elif child.type == "PLOT_TYPE":
-                    plot_type = child.value.upper()
-                else:
-                    raise ValueError(f"Unknown token type: {child.type}")
-            
-            elif isinstance(child, Tree):
-                if child.data == "columns":
-                    for token in child.children:
-                        if isinstance(token, Token) and token.type == "COL_NAME":
-                            col_list.append(token.value)
-                else:
-                    raise ValueError(f"Unknown tree type: {child.data}")
-
-            else:
-                raise ValueError(f"Unknown child type: {type(child)}")
+    def execute(self, cmd):
+        col_list = list(cmd.columns)
+        table_name = cmd.table
+        plot_type = cmd.kind
 
         if not table_name or not plot_type:
             raise ValueError("Missing required parameters: table_name or plot_type.")
 
-        if table_name not in self.table:
-            raise ValueError(f"Table '{table_name}' not found.")
-
-        df = self.table[table_name]
+        df = get_table(self.table, table_name)
 
         # plot
         plt.style.use("default")  
@@ -0,0 +1,237 @@
+# chunked reader for JSON record files: JSON Lines (.jsonl / .ndjson, one object per line)
+# and .json files holding a top-level array of objects. records are decoded one at a time,
+# the array by an incremental parser over a fixed-size text buffer, and turned into one
+# DataFrame per chunk, so the Python objects of a single chunk are alive at a time.
+# every chunk gets the conversions of pd.read_json (numeric strings to numbers, date
+# columns to datetimes), so the dtypes match those of an eager LOAD of the file.
+# the dtypes inferred for the first chunk are kept for the later ones, widened only when
+# a later chunk holds values they can't represent
+
+import json
+import numpy as np
+import pandas as pd
+
+JSON_LINES_FORMATS = (".jsonl", ".ndjson")
+
+# characters read from an array file at a time
+BLOCK_SIZE = 1 << 20
+
+_WHITESPACE = " \t\n\r"
+
+# pd.read_json's date conversion: the units tried, in order, and the smallest number
+# taken for an epoch timestamp (in seconds, one year)
+DATE_UNITS = ("s", "ms", "us", "ns")
+MIN_STAMP = 31_536_000
+
+
+def read_json_chunks(file_name, columns=None, chunksize=100_000):
+    # yield the records of the file as DataFrames of up to 'chunksize' rows, numbered
+    # across chunks like one table. columns: keep only these keys, None keeps every key.
+    # at least one (maybe empty) chunk is yielded
+    with open(file_name, encoding="utf-8") as f:
+        if file_name.endswith(JSON_LINES_FORMATS):
+            records = iter_json_lines(f)
+        elif _first_char(f) == "[":
+            records = iter_json_array(f)
+        else:
+            # any other JSON layout (pandas' column or index orients, ...) is read whole
+            f.close()
+            df = pd.read_json(file_name)
+            yield df if columns is None else df[list(columns)]
+            return
+
+        dtypes = None
+        start = 0
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) == chunksize:
+                chunk, dtypes = _frame(batch, columns, dtypes, start)
+                yield chunk
+                start += len(batch)
+                batch = []
+        if batch or start == 0:
+            yield _frame(batch, columns, dtypes, start)[0]
+
+
+def _first_char(f):
+    # the first non-whitespace character of a text file, the file is rewound
+    while True:
+        char = f.read(1)
+        if char == "" or char not in _WHITESPACE:
+            f.seek(0)
+            return char
+
+
+def iter_json_lines(f):
+    for number, line in enumerate(f, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {number}: {e}") from None
+
+
+def iter_json_array(f, block_size=BLOCK_SIZE):
+    # yield the elements of the top-level JSON array in a text file, holding at most
+    # one block plus one element of the text in memory
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def fill():
+        # append the next block to the unread part of the buffer
+        nonlocal buffer, pos, eof
+        block = f.read(block_size)
+        eof = block == ""
+        buffer = buffer[pos:] + block
+        pos = 0
+        return not eof
+
+    def skip_whitespace():
+        # move to the next significant character, False at the end of the file
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer):
+                return True
+            if not fill():
+                return False
+
+    if not skip_whitespace() or buffer[pos] != "[":
+        raise ValueError("Expected a JSON array")
+    pos += 1
+
+    expect_value = False        # after a ',' another element must follow
+    while True:
+        if not skip_whitespace():
+            raise ValueError("Unterminated JSON array")
+        if buffer[pos] == "]" and not expect_value:
+            return
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                value, end = None, None
+            # a value running to the end of the buffer (a number, ...) may continue in the next block
+            if end is not None and (end < len(buffer) or eof):
+                break
+            if eof:
+                raise ValueError(f"Invalid JSON array element: {buffer[pos:pos + 80]!r}")
+            fill()
+        yield value
+        pos = end
+
+        if not skip_whitespace():
+            raise ValueError("Unterminated JSON array")
+        if buffer[pos] == ",":
+            pos += 1
+            expect_value = True
+        elif buffer[pos] == "]":
+            return
+        else:
+            raise ValueError(f"Expected ',' or ']' in JSON array, got {buffer[pos]!r}")
+
+
+def _frame(records, columns, dtypes, start):
+    # the DataFrame of one chunk of records and the dtypes for the next chunks
+    df = convert_types(pd.DataFrame.from_records(records, columns=list(columns) if columns is not None else None))
+    df.index = pd.RangeIndex(start, start + len(df))
+    if dtypes is None:
+        # the first chunk is the sample the dtypes are inferred from; the dtype of a
+        # column without any value yet is left to the first chunk that has one
+        return df, {col: None if df[col].isna().all() else df[col].dtype for col in df.columns}
+
+    dtypes = dict(dtypes)
+    for col in df.columns:
+        if col not in dtypes:
+            dtypes[col] = df[col].dtype
+            continue
+        dtype = _common_dtype(dtypes[col], df[col])
+        if dtype is not None and df[col].dtype != dtype:
+            df[col] = df[col].astype(dtype)
+        dtypes[col] = dtype
+    return df, dtypes
+
+
+def _common_dtype(dtype, values):
+    # the sample's dtype if it holds every value of the column, a wider one otherwise
+    if values.isna().all():
+        # no value in this chunk: missing in any dtype that has NaN
+        if dtype is None or dtype.kind in "fOM":
+            return dtype
+        return np.dtype(float) if dtype.kind in "iu" else np.dtype(object)
+    if dtype is None or values.dtype == dtype:
+        return values.dtype
+    if dtype.kind in "iuf" and values.dtype.kind in "iuf":
+        # ints and floats mix into floats, like in one pandas column
+        return np.result_type(dtype, values.dtype)
+    return np.dtype(object)
+
+
+def convert_types(df):
+    # the dtype conversions pd.read_json applies to a frame of records: columns named
+    # like dates ('date', 'created_at', 'timestamp', ...) become datetimes when every
+    # value parses, then object columns become floats when every value is a number,
+    # and floats become ints when every value is whole
+    for col in df.columns:
+        values = df[col]
+        if _is_date_column(col):
+            dates = _to_dates(values)
+            if dates is not None:
+                df[col] = dates
+                continue
+        numbers = _to_numbers(values)
+        if numbers is not values:
+            df[col] = numbers
+    return df
+
+
+def _is_date_column(name):
+    if not isinstance(name, str):
+        return False
+    name = name.lower()
+    return (name.endswith(("_at", "_time")) or name in ("modified", "date", "datetime")
+            or name.startswith("timestamp"))
+
+
+def _to_dates(values):
+    # None when the column doesn't parse as dates in any unit
+    if not len(values):
+        return None
+    stamps = values
+    if stamps.dtype == object:
+        try:
+            stamps = values.astype("int64")
+        except (TypeError, ValueError, OverflowError):
+            pass
+    if stamps.dtype.kind in "iuf" and not (stamps.isna() | (stamps > MIN_STAMP)).all():
+        # small numbers are not timestamps
+        return None
+    for unit in DATE_UNITS:
+        try:
+            return pd.to_datetime(stamps, errors="raise", unit=unit)
+        except (ValueError, OverflowError, TypeError):
+            continue
+    return None
+
+
+def _to_numbers(values):
+    # the column itself when nothing converts
+    result = values
+    if result.dtype == object:
+        try:
+            result = result.astype("float64")
+        except (TypeError, ValueError):
+            pass
+    if result.dtype.kind == "f" and result.dtype != np.float64:
+        result = result.astype("float64")
+    if len(result) and result.dtype in (np.float64, object):
+        try:
+            ints = result.astype("int64")
+            if (ints == result).all():
+                result = ints
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return result
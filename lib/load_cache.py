@@ -0,0 +1,158 @@
+# on-disk cache of the tables read by LOAD. parsing a csv / json file is far slower than
+# reading back a pickled DataFrame, so the first LOAD of a file stores the parsed table,
+# keyed by the file's absolute path, modification time and size and by the read options,
+# and later LOADs of the unchanged file (in this or any later session) read the pickle.
+# entries are evicted least recently used first once the cache outgrows its size cap
+
+import hashlib
+import os
+import pickle
+import tempfile
+from lib.cache_dirs import user_cache_dir, private_dir
+
+# total size of the cached tables
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# binary formats are read about as fast as a pickle, only text formats are cached
+CACHED_FORMATS = (".csv", ".json", ".jsonl", ".ndjson")
+
+ENTRY_SUFFIX = ".pkl"
+
+# part of every key: bump it when a reader change alters the tables read (dtypes,
+# columns, ...), so entries written before are no longer served
+FORMAT_VERSION = 2
+
+
+def default_directory():
+    # directory of the cached tables: DSL_LOAD_CACHE_DIR, else a private one per user
+    # (entries are pickles, see lib/cache_dirs.py)
+    return os.environ.get("DSL_LOAD_CACHE_DIR") or user_cache_dir("load")
+
+
+class LoadCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0    # size of the source files that did not have to be parsed
+
+    def entry_path(self, file_name, options=()):
+        # the cache file of a source file; a changed file (mtime or size), other read
+        # options or another FORMAT_VERSION give another entry, the stale one ages out of the cache
+        stat = os.stat(file_name)
+        key = repr((FORMAT_VERSION, os.path.abspath(file_name), stat.st_mtime_ns, stat.st_size, tuple(options)))
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + ENTRY_SUFFIX)
+
+    def load(self, file_name, read, options=()):
+        # the table read by read(file_name), from the cache when it holds it
+        if not file_name.endswith(CACHED_FORMATS):
+            return read(file_name)
+        try:
+            # never read entries from a directory another user could write to
+            private_dir(self.directory)
+        except OSError:
+            return read(file_name)
+
+        path = self.entry_path(file_name, options)
+        df = self._read_entry(path)
+        if df is not None:
+            self.hits += 1
+            self.bytes_saved += os.path.getsize(file_name)
+            return df
+
+        self.misses += 1
+        df = read(file_name)
+        self._write_entry(path, df)
+        return df
+
+    def _read_entry(self, path):
+        try:
+            with open(path, "rb") as f:
+                df = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # truncated or written by an incompatible version: drop it
+            self._remove(path)
+            return None
+        # mark the entry as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted meanwhile by a concurrent load
+            pass
+        return df
+
+    def _write_entry(self, path, df):
+        try:
+            # written under a temporary name, so a concurrent LOAD never reads half an entry
+            fd, temp_name = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        except OSError:
+            # read-only filesystem etc., the table is simply not cached
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+            if os.path.getsize(temp_name) > self.max_bytes:
+                # larger than the whole cache
+                return
+            os.replace(temp_name, path)
+        except OSError:
+            # full filesystem etc.
+            return
+        finally:
+            # nothing left behind when the entry was not moved in place
+            self._remove(temp_name)
+        self.evict()
+
+    def entries(self):
+        # (path, size, last use) of the cached tables
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            if name.endswith(ENTRY_SUFFIX):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self):
+        # remove the least recently used entries until the cache fits in max_bytes
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            self.evictions += 1
+            total -= size
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            self._remove(path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def cache_info(self):
+        entries = self.entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes_saved": self.bytes_saved,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
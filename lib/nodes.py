@@ -0,0 +1,200 @@
+# typed AST nodes built by the parser, one class per DSL statement / clause.
+# nodes are frozen and only hold tuples, so a parsed statement can be shared freely.
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True, slots=True)
+class LoadStmt:
+    path: str
+    table: str
+    mode: str = "eager"         # eager reads the file now, lazy defers it to the first query,
+                                # stream reads it chunk by chunk on every query
+    optimize: bool = False      # store the eager table with compact dtypes
+    source: Optional[str] = None    # WITH SOURCE: column naming the file each row was read from
+
+
+@dataclass(frozen=True, slots=True)
+class SaveStmt:
+    table: str
+    path: str                   # the format follows the extension, like LOAD
+
+
+"""
+SELECT
+"""
+@dataclass(frozen=True, slots=True)
+class AggExpr:
+    func: str                   # COUNT, SUM, AVG, MIN or MAX
+    param: str                  # column name or '*'
+
+
+@dataclass(frozen=True, slots=True)
+class Compare:
+    column: str
+    op: str                     # ==, !=, <, <=, >, >=
+    value: object               # int / float for numbers, str for quoted strings
+
+
+@dataclass(frozen=True, slots=True)
+class Logical:
+    op: str                     # AND or OR
+    left: object
+    right: object
+
+
+@dataclass(frozen=True, slots=True)
+class Not:
+    operand: object
+
+
+@dataclass(frozen=True, slots=True)
+class FilterClause:
+    condition: object
+
+
+@dataclass(frozen=True, slots=True)
+class GroupByClause:
+    columns: tuple
+
+
+@dataclass(frozen=True, slots=True)
+class OrderByClause:
+    keys: tuple                 # ((column, ascending), ...)
+
+
+@dataclass(frozen=True, slots=True)
+class LimitClause:
+    count: int
+
+
+@dataclass(frozen=True, slots=True)
+class SelectStmt:
+    columns: object             # '*' or a tuple of column names and AggExpr
+    table: str
+    clauses: tuple = ()         # FilterClause / GroupByClause / OrderByClause in written order,
+                                # then an optional LimitClause
+    into: Optional[str] = None  # SELECT ... AS new_table
+
+
+@dataclass(frozen=True, slots=True)
+class ExplainStmt:
+    select: SelectStmt
+
+
+"""
+Indexes
+"""
+@dataclass(frozen=True, slots=True)
+class CreateIndex:
+    table: str
+    column: str
+
+
+"""
+Snapshots
+"""
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    table: str
+    name: str                   # the snapshot, a version of the table restorable by name
+
+
+@dataclass(frozen=True, slots=True)
+class Restore:
+    table: str
+    name: str
+
+
+@dataclass(frozen=True, slots=True)
+class ShowSnapshots:
+    pass
+
+
+"""
+History
+"""
+@dataclass(frozen=True, slots=True)
+class Undo:
+    count: int = 1              # the last 'count' clean commands are reverted
+
+
+@dataclass(frozen=True, slots=True)
+class Redo:
+    count: int = 1
+
+
+"""
+Clean commands
+"""
+@dataclass(frozen=True, slots=True)
+class CleanCmd:
+    table: str
+
+
+@dataclass(frozen=True, slots=True)
+class FillNA(CleanCmd):
+    column: str
+    method: str                 # mean, median, mode or value
+    value: object = None        # fill value when method is 'value'
+    approx: bool = False        # estimate the median / mode with a sketch
+
+
+@dataclass(frozen=True, slots=True)
+class DropNA(CleanCmd):
+    axis: int = 0               # 0 drops rows, 1 drops columns
+    how: str = "any"
+    columns: Optional[tuple] = None
+
+
+@dataclass(frozen=True, slots=True)
+class CleanNumeric(CleanCmd):
+    columns: Optional[tuple] = None     # None: the non-numeric columns holding mostly numbers
+    strip: bool = False                 # STRIP STRINGS keeps the number inside a string
+
+
+@dataclass(frozen=True, slots=True)
+class CleanNonNumeric(CleanCmd):
+    columns: Optional[tuple] = None
+
+
+@dataclass(frozen=True, slots=True)
+class DropRow(CleanCmd):
+    row: int
+
+
+@dataclass(frozen=True, slots=True)
+class DropColumn(CleanCmd):
+    column: str
+
+
+@dataclass(frozen=True, slots=True)
+class ReplaceCell(CleanCmd):
+    row: int
+    column: str
+    value: object
+
+
+@dataclass(frozen=True, slots=True)
+class FilterOutliers(CleanCmd):
+    column: str
+    method: str = "iqr"         # iqr or zscore
+    threshold: float = 1.5
+    approx: bool = False        # estimate the quartiles with a sketch
+
+
+@dataclass(frozen=True, slots=True)
+class Normalize(CleanCmd):
+    column: str
+    method: str = "minmax"      # minmax or zscore
+
+
+"""
+PLOT
+"""
+@dataclass(frozen=True, slots=True)
+class PlotCmd:
+    columns: tuple
+    table: str
+    kind: str                   # HIST, HISTOGRAM, SCATTER, BOX, LINE or BAR
@@ -0,0 +1,237 @@
+# undo / redo log of the clean commands (UNDO n, REDO n). every command run on a
+# table is recorded as a Change holding what it takes to go back and forth between
+# the table before and after it, instead of the two tables:
+#   - the row positions the command removed and the values of those rows
+#   - the old and new value of a replaced cell
+#   - the previous and new buffers of the columns it replaced, added or dropped;
+#     columns are never written in place (see TableStore), so these are references
+# undoing a column or cell change swaps the column back (a cell costs one column
+# copy); undoing a row removal puts the stored rows back in a single pass.
+# the column versions of both tables are kept, so caches keyed by column version
+# (statistics, indexes) stay valid across UNDO and REDO
+
+import numpy as np
+import pandas as pd
+from lib.nodes import FillNA, Normalize, CleanNumeric, ReplaceCell
+from lib.tables import column_versions
+
+# operations kept for UNDO, the oldest are forgotten first
+DEFAULT_LIMIT = 100
+
+
+class OpLog:
+    def __init__(self, tables, limit=DEFAULT_LIMIT):
+        self.tables = tables
+        self.limit = limit
+        self.done = []          # Changes that UNDO reverts, the latest last
+        self.undone = []        # Changes that REDO applies again, the latest undone last
+
+    def record(self, table_name, before, before_versions, commands, rewritten=()):
+        # log the change a run of commands made to a table. before: the table and
+        # its column versions before the run; rewritten: the columns whose values the
+        # commands replaced, besides any row removal
+        after = self.tables[table_name]
+        after_versions = column_versions(self.tables, table_name)
+        if before_versions is None or after_versions is None:
+            raise ValueError(f"Operations on table '{table_name}' cannot be logged.")
+        change = Change.between(table_name, before, dict(before_versions), after, dict(after_versions),
+                                commands, rewritten)
+        self.done.append(change)
+        del self.done[:-self.limit]
+        # a new operation starts a new history
+        self.undone.clear()
+        return change
+
+    def undo(self, count=1):
+        # revert the last 'count' operations (fewer if the log is shorter), the number reverted
+        return self._replay(self.done, self.undone, count, undo=True)
+
+    def redo(self, count=1):
+        return self._replay(self.undone, self.done, count, undo=False)
+
+    def _replay(self, source, target, count, undo):
+        if count < 0:
+            raise ValueError("The count of UNDO / REDO must not be negative")
+        replayed = 0
+        while replayed < count and source:
+            change = source[-1]
+            if undo:
+                change.undo(self.tables)
+            else:
+                change.redo(self.tables)
+            target.append(source.pop())
+            replayed += 1
+        return replayed
+
+    def clear(self):
+        self.done.clear()
+        self.undone.clear()
+
+
+def rewritten_columns(commands, reports=None):
+    # the columns whose values a run of commands replaces: the target column of FILL NA,
+    # NORMALIZE and REPLACE, and the columns CLEAN NUMERIC coerced (see its report)
+    columns = []
+    for cmd in commands:
+        if isinstance(cmd, (FillNA, Normalize, ReplaceCell)):
+            columns.append(cmd.column)
+        elif isinstance(cmd, CleanNumeric):
+            report = (reports or {}).get(cmd.table)
+            columns.extend(cmd.columns or (report.index if report is not None else ()))
+    return list(dict.fromkeys(columns))
+
+
+class Change:
+    def __init__(self, table, before_versions, after_versions):
+        self.table = table
+        self.before_versions = before_versions      # {column: version}, in column order
+        self.after_versions = after_versions
+        self.before_columns = {}    # column -> Series of the table before, where it differs
+        self.after_columns = {}     # column -> Series of the table after, where it differs
+        self.rows = None            # (row count before, positions removed, DataFrame of the removed rows)
+        self.cell = None            # (row label, column, old value, new value, old dtype, new dtype)
+        self.tables = None          # (before, after): whole tables, when no compact delta applies
+
+    @classmethod
+    def between(cls, table, before, before_versions, after, after_versions, commands, rewritten):
+        change = cls(table, before_versions, after_versions)
+        if after is before:
+            # nothing changed (no outlier found, ...)
+            return change
+
+        removed = _removed_positions(before, after)
+        if removed is None:
+            # rows added or reordered, or labels that don't identify rows
+            change.tables = (before, after)
+            return change
+
+        if len(removed) == 0:
+            # column changes only: the columns whose version moved
+            changed = [col for col in before_versions if after_versions.get(col) != before_versions[col]]
+            added = [col for col in after_versions if before_versions.get(col) != after_versions[col]]
+            cmd = commands[-1] if len(commands) == 1 else None
+            if (isinstance(cmd, ReplaceCell) and changed == [cmd.column] and added == [cmd.column]
+                    and before.index.is_unique):
+                old, new = before.at[cmd.row, cmd.column], after.at[cmd.row, cmd.column]
+                change.cell = (cmd.row, cmd.column, old, new, before[cmd.column].dtype, after[cmd.column].dtype)
+                return change
+        else:
+            # after a row removal every column has a new version, only the columns
+            # the commands rewrote (or whose dtype moved) hold other values
+            changed = [col for col in before_versions
+                       if col not in after_versions or col in rewritten or before[col].dtype != after[col].dtype]
+            added = [col for col in after_versions if col not in before_versions or col in changed]
+            kept = [col for col in before_versions if col not in changed]
+            rows = {col: before[col].array.take(removed) for col in kept}
+            change.rows = (len(before), removed, pd.DataFrame(rows, index=before.index[removed], copy=False))
+
+        change.before_columns = {col: before[col] for col in changed}
+        change.after_columns = {col: after[col] for col in added}
+        return change
+
+    def undo(self, tables):
+        df = self._current(tables, self.after_versions, "undone")
+        if self.before_versions == self.after_versions:
+            return
+        if self.tables is not None:
+            result = self.tables[0]
+        elif self.cell is not None:
+            row, col, old, _, old_dtype, _ = self.cell
+            result = _set_value(df, row, col, old, old_dtype)
+        else:
+            if self.rows is not None:
+                n, removed, rows = self.rows
+                df = _insert_rows(df, rows, removed, n)
+            result = _with_columns(df, self.before_columns, self.before_versions)
+        tables.store(self.table, result, versions=self.before_versions)
+
+    def redo(self, tables):
+        df = self._current(tables, self.before_versions, "redone")
+        if self.before_versions == self.after_versions:
+            return
+        if self.tables is not None:
+            result = self.tables[1]
+        elif self.cell is not None:
+            row, col, _, new, _, new_dtype = self.cell
+            result = _set_value(df, row, col, new, new_dtype)
+        else:
+            if self.rows is not None:
+                n, removed, _ = self.rows
+                df = _take_rows(df, np.setdiff1d(np.arange(n), removed, assume_unique=True))
+            result = _with_columns(df, self.after_columns, self.after_versions)
+        tables.store(self.table, result, versions=self.after_versions)
+
+    def _current(self, tables, versions, action):
+        # the table as the change left it; a table replaced since (LOAD, SELECT ... AS,
+        # RESTORE, ...) can't be changed back
+        if column_versions(tables, self.table) != versions:
+            raise ValueError(f"Table '{self.table}' changed since, the operation cannot be {action}.")
+        return tables[self.table]
+
+
+def _removed_positions(before, after):
+    # the positions of the rows of 'before' missing from 'after', None when 'after'
+    # is not 'before' with rows removed (commands never add or reorder rows)
+    if len(after) == len(before):
+        return np.empty(0, dtype=np.intp) if after.index.equals(before.index) else None
+    if len(after) > len(before):
+        return None
+    labels = before.index
+    if labels.is_monotonic_increasing and (isinstance(labels, pd.RangeIndex) or
+                                           (labels.dtype.kind in "iuf" and (np.diff(labels.to_numpy()) > 0).all())):
+        # strictly increasing numbers (a RangeIndex, ...) are unique and found by binary
+        # search, without hashing the labels
+        kept = labels.searchsorted(after.index)
+        if (kept >= len(before)).any() or not labels.take(kept).equals(after.index):
+            return None
+    elif labels.is_unique:
+        kept = labels.get_indexer(after.index)
+    else:
+        return None
+    if (kept < 0).any() or (np.diff(kept) <= 0).any():
+        return None
+    mask = np.ones(len(before), dtype=bool)
+    mask[kept] = False
+    return np.flatnonzero(mask)
+
+
+def _insert_rows(df, rows, removed, n):
+    # the table with 'rows' put back at the positions 'removed', in one pass: the
+    # kept rows and the removed ones are appended, then moved to their positions.
+    # only the columns stored with the rows are rebuilt
+    order = np.empty(n, dtype=np.intp)
+    kept = np.setdiff1d(np.arange(n), removed, assume_unique=True)
+    order[kept] = np.arange(len(kept))
+    order[removed] = len(kept) + np.arange(len(removed))
+    index = df.index.append(rows.index).take(order)
+    columns = {
+        col: pd.concat([df[col], rows[col]], ignore_index=True).array.take(order)
+        for col in rows.columns
+    }
+    return pd.DataFrame(columns, index=index, copy=False)
+
+
+def _take_rows(df, positions):
+    # the rows at 'positions', column by column (no consolidation of the stored table)
+    return pd.DataFrame({col: df[col].array.take(positions) for col in df.columns},
+                        index=df.index.take(positions), copy=False)
+
+
+def _with_columns(df, columns, versions):
+    # the table with the given columns put back, its columns ordered like 'versions'
+    result = {col: (columns[col] if col in columns else df[col]).set_axis(df.index, copy=False) for col in versions}
+    return pd.DataFrame(result, index=df.index, copy=False)
+
+
+def _set_value(df, row, col, value, dtype):
+    # the table with one cell changed, the column copied
+    values = df[col].copy()
+    if isinstance(dtype, pd.CategoricalDtype):
+        # the categories of the version changed to, which hold the value
+        values = values.astype(dtype)
+    values.at[row] = value
+    if values.dtype != dtype:
+        values = values.astype(dtype)
+    result = df.copy(deep=False)
+    result[col] = values
+    return result
@@ -0,0 +1,98 @@
+# compact dtypes for LOAD ... OPTIMIZE. pandas reads numbers as 64-bit and text as Python
+# string objects; a loaded table is shrunk column by column:
+#   - integers are downcast to the smallest signed type holding their min and max
+#   - floats become float32 when that loses nothing (every value round-trips)
+#   - string columns with few distinct values become categories (one code per row
+#     and one string per distinct value)
+# a sample of the rows decides what is worth trying, the full column decides what is
+# kept: a conversion is only kept when it is lossless and makes the column smaller
+
+import numpy as np
+import pandas as pd
+
+# rows looked at to choose the dtype of a column
+SAMPLE_SIZE = 100_000
+
+# string columns with more distinct values than this fraction of the rows (in the
+# sample) stay strings, their categories would take about as much memory
+MAX_CATEGORY_RATIO = 0.5
+
+INT_TYPES = (np.int8, np.int16, np.int32)
+
+
+def optimize_dtypes(df, sample_size=SAMPLE_SIZE):
+    # the table with compact dtypes, and a report with one row per column: its dtype
+    # and memory use (deep, strings included) before and after
+    step = max(1, len(df) // sample_size)
+    sample = df.iloc[::step]
+
+    columns = {}
+    rows = []
+    for col in df.columns:
+        values = df[col]
+        before = values.memory_usage(index=False, deep=True)
+        compact = _compact(values, sample[col])
+        after = before
+        if compact is not None:
+            after = compact.memory_usage(index=False, deep=True)
+            if after < before:
+                values = compact
+            else:
+                after = before
+        columns[col] = values
+        rows.append((col, str(df[col].dtype), str(values.dtype), before, after))
+
+    result = pd.DataFrame(columns, index=df.index, copy=False) if len(df.columns) else df
+    report = pd.DataFrame(rows, columns=["column", "dtype_before", "dtype_after", "bytes_before", "bytes_after"])
+    return result, report.set_index("column")
+
+
+def _compact(values, sample):
+    # a compact copy of the column, None when there is nothing to try
+    dtype = values.dtype
+    if not isinstance(dtype, np.dtype):
+        return None
+    if dtype.kind == "i":
+        return _downcast_int(values)
+    if dtype == np.float64:
+        return _downcast_float(values, sample)
+    if dtype == object and _few_strings(sample):
+        return values.astype("category")
+    return None
+
+
+def _downcast_int(values):
+    if values.empty:
+        return None
+    low, high = values.min(), values.max()
+    for int_type in INT_TYPES:
+        info = np.iinfo(int_type)
+        if info.min <= low and high <= info.max:
+            return values.astype(int_type) if np.dtype(int_type).itemsize < values.dtype.itemsize else None
+    return None
+
+
+def _downcast_float(values, sample):
+    # float32 only when every value survives the round trip (NaN included)
+    if not _round_trips(sample):
+        return None
+    with np.errstate(over="ignore"):
+        compact = values.astype(np.float32)
+    if not _round_trips(values, compact):
+        return None
+    return compact
+
+
+def _round_trips(values, compact=None):
+    original = values.to_numpy()
+    if compact is None:
+        # values beyond the float32 range become inf and fail the check
+        with np.errstate(over="ignore"):
+            compact = original.astype(np.float32)
+    return np.array_equal(np.asarray(compact, dtype=np.float64), original, equal_nan=True)
+
+
+def _few_strings(sample):
+    if sample.empty or pd.api.types.infer_dtype(sample, skipna=True) != "string":
+        return False
+    return sample.nunique() <= MAX_CATEGORY_RATIO * len(sample)
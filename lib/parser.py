@@ -1,22 +1,63 @@
 # a DSL parser that parses the DSL and generates the AST
 # used for data visualization and preparation
 
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
 import lark
-from lark import Tree, Token
+from lark import Transformer, Token
 from lark.exceptions import UnexpectedInput
+from lib.cache_dirs import user_cache_dir, private_dir
+from lib.nodes import (
+    LoadStmt, SaveStmt, AggExpr, Compare, Logical, Not, FilterClause, GroupByClause, OrderByClause,
+    LimitClause, SelectStmt, ExplainStmt, CreateIndex, Snapshot, Restore, ShowSnapshots, Undo, Redo,
+    FillNA, DropNA, CleanNumeric, CleanNonNumeric, DropRow, DropColumn, ReplaceCell, FilterOutliers,
+    Normalize, PlotCmd,
+)
 
 # define the grammar for the DSL
 GRAMMAR = """
-?start : expr
+?start : expr ";"?
+
+// a script is a sequence of ';'-terminated statements, the last one may omit it;
+// an empty (or comment-only) script has none
+program : stmt* expr?
+?stmt : expr ";"
 
 ?expr : load_stmt
+      | save_stmt
       | select_stmt
+      | explain_stmt
+      | create_index_stmt
+      | snapshot_stmt
+      | restore_stmt
+      | show_snapshots_stmt
+      | undo_stmt
+      | redo_stmt
       | clean_cmds
       | plot_cmd
 
-load_stmt : "LOAD"i STRING "AS"i TABLE_NAME ";"? 
+load_stmt : "LOAD"i STRING "AS"i TABLE_NAME LOAD_MODE? OPTIMIZE? source_option?
+source_option : "WITH"i "SOURCE"i COL_NAME?
+LOAD_MODE : "LAZY"i | "STREAM"i
+OPTIMIZE : "OPTIMIZE"i
+
+save_stmt : "SAVE"i TABLE_NAME "TO"i STRING
+
+select_stmt : "SELECT"i select_columns "FROM"i from_clause ("AS" TABLE_NAME)?
+
+explain_stmt : "EXPLAIN"i select_stmt
 
-select_stmt : "SELECT"i select_columns "FROM"i from_clause ("AS" TABLE_NAME)? ";"?
+create_index_stmt : "CREATE"i "INDEX"i "ON"i TABLE_NAME "(" COL_NAME ")"
+
+snapshot_stmt : "SNAPSHOT"i TABLE_NAME "AS"i TABLE_NAME
+restore_stmt : "RESTORE"i TABLE_NAME "FROM"i TABLE_NAME
+show_snapshots_stmt : "SHOW"i "SNAPSHOTS"i
+
+undo_stmt : "UNDO"i INT?
+redo_stmt : "REDO"i INT?
 
 select_columns : STAR | select_column ("," select_column)*
 select_column : COL_NAME | agg_expr
@@ -29,13 +70,13 @@ agg_func : "COUNT"i -> count
          | "MIN"i -> min
          | "MAX"i -> max
 
-from_clause : TABLE_NAME (filter_clause | groupby_clause | orderby_clause)*
+from_clause : TABLE_NAME (filter_clause | groupby_clause | orderby_clause)* limit_clause?
 
 filter_clause : "FILTER"i "(" condition ")"
 
 ?condition: simple_condition
           | condition LOP condition   -> logical_condition
-          | "NOT"i condition          -> not
+          | "NOT"i condition          -> not_condition
           | "(" condition ")"
 
 simple_condition: COL_NAME OP value
@@ -53,6 +94,8 @@ order_columns : "(" order_column ("," order_column)* ")"
 order_column : COL_NAME ORDER?
 ORDER : "ASC"i | "DESC"i
 
+limit_clause : "LIMIT"i INT
+
 clean_cmds : fillna_cmd
            | dropna_cmd
            | remove_str_in_numeric_cmd
@@ -62,7 +105,7 @@ clean_cmds : fillna_cmd
            | filter_outliers_cmd
            | normalize_cmd
 
-fillna_cmd : "FILL"i "NA"i TABLE_NAME COL_NAME "WITH"i fill_method ";"?
+fillna_cmd : "FILL"i "NA"i TABLE_NAME COL_NAME "WITH"i fill_method APPROX?
 fill_method : "mean"i     -> mean
             | "median"i   -> median
             | "mode"i     -> mode
@@ -70,24 +113,31 @@ fill_method : "mean"i     -> mean
             | STRING
 
 dropna_cmd : "DROP"i "NA"i TABLE_NAME (ROW | COLUMN) \
-            ("WHERE"i ("ALL"i | "ANY"i))? \
-            ("IN"i columns)? ";"?
+            ("WHERE"i NA_HOW)? \
+            ("IN"i columns)?
+NA_HOW : "ALL"i | "ANY"i
 
-remove_str_in_numeric_cmd : "CLEAN"i "NUMERIC"i TABLE_NAME (COL_NAME | columns) "REMOVE"i "STRINGS"i ";"?
-remove_num_in_nonnumeric_cmd : "CLEAN"i "NONNUMERIC"i TABLE_NAME (COL_NAME | columns) "REMOVE"i "NUMBERS"i ";"?
+remove_str_in_numeric_cmd : "CLEAN"i "NUMERIC"i TABLE_NAME (COL_NAME | columns)? ("REMOVE"i | STRIP) "STRINGS"i
+STRIP : "STRIP"i
+remove_num_in_nonnumeric_cmd : "CLEAN"i "NONNUMERIC"i TABLE_NAME (COL_NAME | columns) "REMOVE"i "NUMBERS"i
 
-drop_row_col_cmd : "DROP"i (ROW INT | COLUMN COL_NAME) FROM TABLE_NAME ";"?
+drop_row_col_cmd : "DROP"i (ROW INT | COLUMN COL_NAME) FROM TABLE_NAME
 
-replace_cell_cmd : "REPLACE"i TABLE_NAME ROW INT COLUMN COL_NAME "WITH"i value ";"?
+replace_cell_cmd : "REPLACE"i TABLE_NAME ROW INT COLUMN COL_NAME "WITH"i value
 
 
-filter_outliers_cmd : "FILTER"i "OUTLIERS"i TABLE_NAME COL_NAME ("WITH"i outlier_method)? ";"?
-outlier_method : "ZSCORE"i "(" NUMBER ")" | "IQR"i
+filter_outliers_cmd : "FILTER"i "OUTLIERS"i TABLE_NAME COL_NAME ("WITH"i outlier_method)? APPROX?
+outlier_method : ZSCORE "(" NUMBER ")" | IQR
 
-normalize_cmd : "NORMALIZE"i TABLE_NAME COL_NAME ("WITH"i normalize_method)? ";"?
-normalize_method : "MIN-MAX"i | "ZSCORE"i
+normalize_cmd : "NORMALIZE"i TABLE_NAME COL_NAME ("WITH"i normalize_method)?
+normalize_method : MINMAX | ZSCORE
+ZSCORE : "ZSCORE"i
+IQR : "IQR"i
+MINMAX : "MIN-MAX"i
+// statistics estimated with a sketch instead of computed exactly
+APPROX : "APPROX"i
 
-plot_cmd : "PLOT"i (COL_NAME | columns) "FROM"i TABLE_NAME "AS"i PLOT_TYPE ";"?
+plot_cmd : "PLOT"i (COL_NAME | columns) "FROM"i TABLE_NAME "AS"i PLOT_TYPE
 PLOT_TYPE : ("HIST"i | "HISTOGRAM"i) | "SCATTER"i | "BOX"i | "LINE"i | "BAR"i
 
 
@@ -101,38 +151,356 @@ FROM: /FROM/i
 COL_NAME : CNAME
 TABLE_NAME : CNAME
 
+// '--' starts a comment running to the end of the line
+COMMENT : /--[^\\n]*/
+
 %import common.CNAME
 %import common.NUMBER
 %import common.INT
 %import common.WS
 %ignore WS
+%ignore COMMENT
 """
 
+def _string(token):
+    # strip the surrounding quotes of a STRING token
+    return token.value[1:-1]
+
+
+def _number(token):
+    text = token.value
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _value(token):
+    return _number(token) if token.type in ("NUMBER", "INT") else _string(token)
+
+
+class ASTBuilder(Transformer):
+    # runs inline with the LALR parser: every rule is reduced straight into
+    # its typed node, so no intermediate parse tree is ever built
+
+    def program(self, statements):
+        return tuple(statements)
+
+    def load_stmt(self, children):
+        options = {child.type: child for child in children[2:] if isinstance(child, Token)}
+        mode = options["LOAD_MODE"].value.lower() if "LOAD_MODE" in options else "eager"
+        source = children[-1] if len(children) > 2 and not isinstance(children[-1], Token) else None
+        return LoadStmt(_string(children[0]), children[1].value, mode, "OPTIMIZE" in options, source)
+
+    def source_option(self, children):
+        # WITH SOURCE [column], the column is named source_file by default
+        return children[0].value if children else "source_file"
+
+    def save_stmt(self, children):
+        return SaveStmt(children[0].value, _string(children[1]))
+
+    # SELECT
+    def select_stmt(self, children):
+        columns, (table, clauses) = children[0], children[1]
+        into = children[2].value if len(children) > 2 else None
+        return SelectStmt(columns, table, clauses, into)
+
+    def explain_stmt(self, children):
+        return ExplainStmt(children[0])
+
+    def create_index_stmt(self, children):
+        return CreateIndex(children[0].value, children[1].value)
+
+    def snapshot_stmt(self, children):
+        return Snapshot(children[0].value, children[1].value)
+
+    def restore_stmt(self, children):
+        return Restore(children[0].value, children[1].value)
+
+    def show_snapshots_stmt(self, children):
+        return ShowSnapshots()
+
+    def undo_stmt(self, children):
+        return Undo(int(children[0].value)) if children else Undo()
+
+    def redo_stmt(self, children):
+        return Redo(int(children[0].value)) if children else Redo()
+
+    def select_columns(self, children):
+        if isinstance(children[0], Token) and children[0].type == "STAR":
+            return "*"
+        return tuple(children)
+
+    def select_column(self, children):
+        child = children[0]
+        return child.value if isinstance(child, Token) else child
+
+    def agg_expr(self, children):
+        return AggExpr(children[0], children[1])
+
+    def agg_param(self, children):
+        return children[0].value
+
+    def count(self, _):
+        return "COUNT"
+
+    def sum(self, _):
+        return "SUM"
+
+    def avg(self, _):
+        return "AVG"
+
+    def min(self, _):
+        return "MIN"
+
+    def max(self, _):
+        return "MAX"
+
+    def from_clause(self, children):
+        return children[0].value, tuple(children[1:])
+
+    def filter_clause(self, children):
+        return FilterClause(children[0])
+
+    def simple_condition(self, children):
+        col, op, val = children
+        return Compare(col.value, op.value, _value(val))
+
+    def logical_condition(self, children):
+        left, lop, right = children
+        return Logical(lop.value.upper(), left, right)
+
+    def not_condition(self, children):
+        return Not(children[0])
+
+    def groupby_clause(self, children):
+        return GroupByClause(children[0])
+
+    def columns(self, children):
+        return tuple(child.value for child in children)
+
+    def orderby_clause(self, children):
+        return OrderByClause(children[0])
+
+    def order_columns(self, children):
+        return tuple(children)
+
+    def order_column(self, children):
+        # set default order to ascending
+        ascending = len(children) == 1 or children[1].value.upper() == "ASC"
+        return children[0].value, ascending
+
+    def limit_clause(self, children):
+        return LimitClause(int(children[0].value))
+
+    # Clean commands
+    def clean_cmds(self, children):
+        return children[0]
+
+    def fillna_cmd(self, children):
+        table, col, (method, value) = children[:3]
+        return FillNA(table.value, col.value, method, value, approx=len(children) > 3)
+
+    def fill_method(self, children):
+        return "value", _value(children[0])
+
+    def mean(self, _):
+        return "mean", None
+
+    def median(self, _):
+        return "median", None
+
+    def mode(self, _):
+        return "mode", None
+
+    def dropna_cmd(self, children):
+        table, axis_token = children[0], children[1]
+        how = "any"
+        columns = None
+        for child in children[2:]:
+            if isinstance(child, tuple):
+                columns = child
+            else:
+                how = child.value.lower()
+        axis = 0 if axis_token.type == "ROW" else 1
+        return DropNA(table.value, axis, how, columns)
+
+    def remove_str_in_numeric_cmd(self, children):
+        strip = isinstance(children[-1], Token) and children[-1].type == "STRIP"
+        columns = children[1:-1] if strip else children[1:]
+        return CleanNumeric(children[0].value, self._target_columns(columns), strip)
+
+    def remove_num_in_nonnumeric_cmd(self, children):
+        return CleanNonNumeric(children[0].value, self._target_columns(children[1:]))
+
+    def _target_columns(self, children):
+        # a single COL_NAME or a parenthesized column list
+        if not children:
+            return None
+        if isinstance(children[0], Token):
+            return (children[0].value,)
+        return children[0]
+
+    def drop_row_col_cmd(self, children):
+        drop_type, target, _, table = children
+        if drop_type.type == "ROW":
+            return DropRow(table.value, int(target.value))
+        return DropColumn(table.value, target.value)
+
+    def replace_cell_cmd(self, children):
+        table, _, row, _, col, val = children
+        return ReplaceCell(table.value, int(row.value), col.value, _value(val))
+
+    def filter_outliers_cmd(self, children):
+        table, col = children[0], children[1]
+        approx = isinstance(children[-1], Token) and children[-1].type == "APPROX"
+        if len(children) > 2 and isinstance(children[2], tuple):
+            method, threshold = children[2]
+            return FilterOutliers(table.value, col.value, method, threshold, approx)
+        return FilterOutliers(table.value, col.value, approx=approx)
+
+    def outlier_method(self, children):
+        if children[0].type == "ZSCORE":
+            return "zscore", float(children[1].value)
+        return "iqr", 1.5
+
+    def normalize_cmd(self, children):
+        table, col = children[0], children[1]
+        if len(children) > 2:
+            return Normalize(table.value, col.value, children[2])
+        return Normalize(table.value, col.value)
+
+    def normalize_method(self, children):
+        return children[0].type.lower()
+
+    # PLOT
+    def plot_cmd(self, children):
+        target, table, plot_type = children
+        columns = target if isinstance(target, tuple) else (target.value,)
+        return PlotCmd(columns, table.value, plot_type.value.upper())
+
+
+# directory holding the serialized LALR tables, override with DSL_PARSER_CACHE_DIR.
+# per user and private: lark's cache file is a pickle (see lib/cache_dirs.py)
+CACHE_DIR = os.environ.get("DSL_PARSER_CACHE_DIR") or user_cache_dir("parser")
+
+_lark_lock = threading.Lock()
+_shared_lark = None
+_shared_parser = None
+
+
+def grammar_cache_path(cache_dir=None):
+    # the cache file is keyed by a hash of the grammar, so editing GRAMMAR never loads stale tables
+    grammar_hash = hashlib.sha256(GRAMMAR.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir or CACHE_DIR, f"grammar_{grammar_hash}.lark")
+
+
+def build_lark(cache_dir=None):
+    # compile the grammar, or load the precompiled LALR tables from the on-disk cache.
+    # lark verifies the cached tables itself and rebuilds them when they don't match.
+    cache = grammar_cache_path(cache_dir)
+    try:
+        private_dir(os.path.dirname(cache))
+    except OSError:
+        # read-only filesystem, directory of another user etc., fall back to compiling in memory
+        cache = False
+
+    # 'start' parses a single statement, 'program' a whole script
+    return lark.Lark(GRAMMAR, parser="lalr", start=["start", "program"], cache=cache,
+                     transformer=ASTBuilder())
+
+
+def shared_lark():
+    # process-wide lark instance, built at most once per process
+    global _shared_lark
+    if _shared_lark is None:
+        with _lark_lock:
+            if _shared_lark is None:
+                _shared_lark = build_lark()
+    return _shared_lark
+
+
+def get_parser():
+    # process-wide Parser instance
+    global _shared_parser
+    if _shared_parser is None:
+        _shared_parser = Parser()
+    return _shared_parser
+
+
+# quoted strings and the 'GROUP BY' / 'ORDER BY' keywords (a single space is part of
+# them) are kept verbatim, any other run of whitespace and '--' comments collapses to one space
+_CACHE_KEY_PATTERN = re.compile(
+    r"""('[^']*'|"[^"]*"|\b(?i:GROUP|ORDER)(?:\s|--[^\n]*)+(?i:BY)\b)|(?:\s|--[^\n]*)+""")
+
+
+def normalize_dsl(dsl):
+    # cache key of a statement: whitespace and comments outside of string literals
+    # and the trailing ';' don't change the parse
+    key = _CACHE_KEY_PATTERN.sub(lambda m: m.group(1) or " ", dsl).strip()
+    return key[:-1].rstrip() if key.endswith(";") else key
+
+
 class Parser:
-    def __init__(self):
-        self.parser = lark.Lark(GRAMMAR, parser="lalr")
-
-    def normalize_tree(self, tree):
-        # transform the tree to a more readable format:
-        # convert all Token('RULE', 'xxx') to str type rule name
-        if isinstance(tree, Tree):
-            if isinstance(tree.data, Token):
-                rule_name = tree.data.value 
-            else: 
-                rule_name = tree.data
-
-            # Recursively normalize all children
-            normalized_child = []
-            for child in tree.children:
-                normalized_child.append(self.normalize_tree(child))
-
-            return Tree(rule_name, normalized_child)
-        else:
-            return tree
+    def __init__(self, cache_size=256):
+        # every Parser shares the same compiled lark instance, its parse() is stateless
+        self.parser = shared_lark()
+
+        # LRU cache of parsed statements keyed by normalized DSL text,
+        # the nodes are immutable so cached entries are shared as they are
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
 
     def parse(self, dsl):
+        # parse a single statement into its typed AST node
+        if self.cache_size <= 0:
+            return self._parse(dsl)
+
+        key = normalize_dsl(dsl)
+        with self._cache_lock:
+            node = self._cache.get(key)
+            if node is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return node
+            self.misses += 1
+
+        node = self._parse(dsl)
+        with self._cache_lock:
+            self._cache[key] = node
+            self._cache.move_to_end(key)
+            # evict the least recently used statements
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return node
+
+    def _parse(self, dsl):
+        try:
+            return self.parser.parse(dsl, start="start")
+        except lark.LarkError as e:
+            raise UnexpectedInput(f"DSL Parse Error: {e}")
+
+    def cache_info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._cache),
+            "max_size": self.cache_size,
+        }
+
+    def cache_clear(self):
+        with self._cache_lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def parse_program(self, script):
+        # parse a whole multi-statement script in one pass,
+        # returns the statement nodes in execution order
         try:
-            tree = self.parser.parse(dsl)
-            return self.normalize_tree(tree)
+            return self.parser.parse(script, start="program")
         except lark.LarkError as e:
-            raise UnexpectedInput(f"DSL Parse Error: {e}") 
\ No newline at end of file
+            raise UnexpectedInput(f"DSL Parse Error: {e}")
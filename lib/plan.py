@@ -0,0 +1,265 @@
+# logical query plan for SELECT statements and the rewrite rules that optimize it.
+# a plan is a chain of nodes, each reading the output of its child:
+#   Scan -> Filter -> Sort -> Project -> Limit
+#   Scan -> Filter -> Aggregate -> Sort -> Limit
+
+from dataclasses import dataclass, replace
+from typing import Optional
+from lib.aggregate import output_name
+from lib.nodes import AggExpr, Compare, Logical, Not, FilterClause, GroupByClause, OrderByClause, LimitClause
+
+
+@dataclass(frozen=True, slots=True)
+class Scan:
+    table: str
+    columns: Optional[tuple] = None     # pruned column list, None reads every column
+    predicate: object = None            # condition evaluated while scanning
+
+
+@dataclass(frozen=True, slots=True)
+class Filter:
+    child: object
+    condition: object
+
+
+@dataclass(frozen=True, slots=True)
+class Project:
+    child: object
+    columns: tuple
+
+
+@dataclass(frozen=True, slots=True)
+class Aggregate:
+    child: object
+    group_by: tuple
+    aggregates: tuple                   # AggExpr nodes
+
+
+@dataclass(frozen=True, slots=True)
+class Sort:
+    child: object
+    keys: tuple                         # ((column, ascending), ...)
+
+
+@dataclass(frozen=True, slots=True)
+class Limit:
+    child: object
+    count: int
+
+
+@dataclass(frozen=True, slots=True)
+class TopK:
+    # Limit(Sort(x)): the first 'count' rows in sort order, without sorting every row
+    child: object
+    keys: tuple
+    count: int
+
+
+def build_plan(stmt):
+    # translate a SelectStmt into a plan following the clauses in written order
+    node = Scan(stmt.table)
+    group_by = ()
+    limit = None
+    # ORDER BY of an aggregating statement sorts its result, see _sort_aggregate
+    aggregating = stmt.columns != "*" and any(isinstance(col, AggExpr) for col in stmt.columns)
+    sorts = []
+    for clause in stmt.clauses:
+        if isinstance(clause, FilterClause):
+            node = Filter(node, clause.condition)
+        elif isinstance(clause, GroupByClause):
+            group_by = tuple(clause.columns)
+        elif isinstance(clause, OrderByClause):
+            if aggregating:
+                sorts.append(tuple(clause.keys))
+            else:
+                node = Sort(node, tuple(clause.keys))
+        elif isinstance(clause, LimitClause):
+            limit = clause.count
+
+    node = _select_columns(stmt, node, group_by)
+    for keys in sorts:
+        node = _sort_aggregate(node, keys)
+    if limit is not None:
+        node = Limit(node, limit)
+    return node
+
+
+def _select_columns(stmt, node, group_by):
+    # the Project / Aggregate computing the selected columns on top of the clauses
+    if stmt.columns == "*":
+        return node
+
+    normal_cols = tuple(col for col in stmt.columns if isinstance(col, str))
+    agg_exprs = tuple(col for col in stmt.columns if isinstance(col, AggExpr))
+
+    # check if the normal_cols are in the groupby columns
+    for col in normal_cols:
+        if group_by and col not in group_by:
+            raise ValueError(f"Column '{col}' must appear in GROUP BY clause or be used in an aggregate function.")
+
+    if agg_exprs:
+        return Aggregate(node, group_by, agg_exprs)
+    return Project(node, normal_cols)
+
+
+def _sort_aggregate(node, keys):
+    # grouping reorders rows by the group keys, so an ORDER BY sorts the aggregated
+    # rows: by group columns or by aggregate outputs (count, sum_salary, ...)
+    aggregate = node
+    while not isinstance(aggregate, Aggregate):
+        aggregate = aggregate.child
+    outputs = aggregate.group_by + tuple(output_name(expr) for expr in aggregate.aggregates)
+    for col, _ in keys:
+        if col not in outputs:
+            raise ValueError(f"ORDER BY column '{col}' must appear in GROUP BY clause or name an aggregate "
+                             f"({', '.join(outputs)}).")
+    return Sort(node, keys)
+
+
+def optimize(plan):
+    # apply the local rewrite rules until the plan stops changing,
+    # then prune the columns read by the scan
+    while True:
+        rewritten = _rewrite(plan)
+        if rewritten == plan:
+            break
+        plan = rewritten
+    return _prune_columns(plan, None)
+
+
+def _rewrite(node):
+    # one bottom-up pass of every local rule
+    if not isinstance(node, Scan):
+        node = replace(node, child=_rewrite(node.child))
+
+    for rule in (_filter_before_sort, _merge_filters, _filter_into_scan,
+                 _limit_before_project, _limit_sort_into_topk):
+        node = rule(node)
+    return node
+
+
+def _filter_before_sort(node):
+    # Filter(Sort(x)) -> Sort(Filter(x)): sort only the rows that survive
+    if isinstance(node, Filter) and isinstance(node.child, Sort):
+        sort = node.child
+        return Sort(Filter(sort.child, node.condition), sort.keys)
+    return node
+
+
+def _merge_filters(node):
+    # Filter(Filter(x, a), b) -> Filter(x, a AND b), a keeps being evaluated first
+    if isinstance(node, Filter) and isinstance(node.child, Filter):
+        inner = node.child
+        return Filter(inner.child, Logical("AND", inner.condition, node.condition))
+    return node
+
+
+def _filter_into_scan(node):
+    # evaluate the predicate on the stored table before any column is copied
+    if isinstance(node, Filter) and isinstance(node.child, Scan):
+        scan = node.child
+        predicate = node.condition
+        if scan.predicate is not None:
+            predicate = Logical("AND", scan.predicate, predicate)
+        return replace(scan, predicate=predicate)
+    return node
+
+
+def _limit_before_project(node):
+    # Limit(Project(x)) -> Project(Limit(x)): a projection keeps every row
+    if isinstance(node, Limit) and isinstance(node.child, Project):
+        project = node.child
+        return Project(Limit(project.child, node.count), project.columns)
+    return node
+
+
+def _limit_sort_into_topk(node):
+    # Limit(Sort(x)) -> TopK(x): only the first rows in sort order are needed
+    if isinstance(node, Limit) and isinstance(node.child, Sort):
+        sort = node.child
+        return TopK(sort.child, sort.keys, node.count)
+    return node
+
+
+def _prune_columns(node, needed):
+    # projection pushdown: 'needed' lists the columns the parent reads from this node,
+    # None when it needs all of them
+    if isinstance(node, Scan):
+        # an empty tuple means only the row count is needed
+        return replace(node, columns=needed)
+    if isinstance(node, Project):
+        child_needed = node.columns
+    elif isinstance(node, Aggregate):
+        child_needed = node.group_by + tuple(expr.param for expr in node.aggregates if expr.param != "*")
+    elif isinstance(node, (Sort, TopK)):
+        child_needed = None if needed is None else needed + tuple(col for col, _ in node.keys)
+    elif isinstance(node, Limit):
+        child_needed = needed
+    elif isinstance(node, Filter):
+        child_needed = None if needed is None else needed + tuple(condition_columns(node.condition))
+    else:
+        raise ValueError(f"Unknown plan node: {type(node).__name__}")
+
+    if child_needed is not None:
+        # keep the first occurrence of every column
+        child_needed = tuple(dict.fromkeys(child_needed))
+    return replace(node, child=_prune_columns(node.child, child_needed))
+
+
+def condition_columns(cond):
+    # columns referenced by a FILTER condition, in order of appearance
+    if isinstance(cond, Compare):
+        return [cond.column]
+    elif isinstance(cond, Logical):
+        return condition_columns(cond.left) + condition_columns(cond.right)
+    elif isinstance(cond, Not):
+        return condition_columns(cond.operand)
+    raise ValueError("Invalid condition format")
+
+
+"""
+EXPLAIN
+"""
+def format_condition(cond):
+    if isinstance(cond, Compare):
+        return f"{cond.column} {cond.op} {cond.value!r}"
+    elif isinstance(cond, Logical):
+        return f"({format_condition(cond.left)} {cond.op} {format_condition(cond.right)})"
+    elif isinstance(cond, Not):
+        return f"NOT {format_condition(cond.operand)}"
+    raise ValueError("Invalid condition format")
+
+
+def _format_keys(keys):
+    return ", ".join(f"{col} {'ASC' if ascending else 'DESC'}" for col, ascending in keys)
+
+
+def explain(plan, indent=0):
+    # render the plan top-down, one node per line
+    pad = "  " * indent
+    if isinstance(plan, Scan):
+        line = f"{pad}Scan {plan.table}"
+        if plan.columns is not None:
+            line += f" [{', '.join(plan.columns)}]"
+        if plan.predicate is not None:
+            line += f" WHERE {format_condition(plan.predicate)}"
+        return line
+
+    if isinstance(plan, Filter):
+        line = f"{pad}Filter {format_condition(plan.condition)}"
+    elif isinstance(plan, Project):
+        line = f"{pad}Project [{', '.join(plan.columns)}]"
+    elif isinstance(plan, Aggregate):
+        aggregates = ", ".join(f"{expr.func}({expr.param})" for expr in plan.aggregates)
+        line = f"{pad}Aggregate [{aggregates}]"
+        if plan.group_by:
+            line += f" GROUP BY [{', '.join(plan.group_by)}]"
+    elif isinstance(plan, Sort):
+        line = f"{pad}Sort [{_format_keys(plan.keys)}]"
+    elif isinstance(plan, TopK):
+        line = f"{pad}TopK {plan.count} [{_format_keys(plan.keys)}]"
+    elif isinstance(plan, Limit):
+        line = f"{pad}Limit {plan.count}"
+    else:
+        raise ValueError(f"Unknown plan node: {type(plan).__name__}")
+    return line + "\n" + explain(plan.child, indent + 1)
@@ -0,0 +1,99 @@
+# compile FILTER conditions into functions returning NumPy boolean masks,
+# so filtering never goes through a query string and pandas' expression parser
+
+import operator
+import numpy as np
+import pandas as pd
+from lib.nodes import Compare, Logical, Not
+
+COMPARE_OPS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+# AND / OR evaluate their right side only on the rows the left side left undecided,
+# once fewer than 1 / SHORT_CIRCUIT_RATIO of the rows are undecided
+SHORT_CIRCUIT_RATIO = 4
+
+
+def compile_condition(cond):
+    # returns mask(df, rows=None): a boolean array over the rows of df,
+    # or over the row positions in 'rows' when it is given
+    if isinstance(cond, Compare):
+        return _compile_compare(cond)
+    elif isinstance(cond, Logical):
+        return _compile_logical(cond)
+    elif isinstance(cond, Not):
+        inner = compile_condition(cond.operand)
+        return lambda df, rows=None: ~inner(df, rows)
+    raise ValueError("Invalid condition format")
+
+
+def _compile_compare(cond):
+    if cond.op not in COMPARE_OPS:
+        raise ValueError(f"Unknown comparison operator: {cond.op}")
+    op = COMPARE_OPS[cond.op]
+    col = cond.column
+    value = cond.value
+
+    def mask(df, rows=None):
+        if col not in df.columns:
+            raise ValueError(f"Column '{col}' not found.")
+        values = df[col]
+        if rows is not None:
+            values = values.iloc[rows]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            return _compare_categories(values, op, value)
+        try:
+            result = op(values, value)
+        except TypeError as e:
+            raise TypeError(f"Invalid filter condition: {e}") from None
+        # missing values never match
+        return result.to_numpy(dtype=bool, na_value=False)
+
+    return mask
+
+
+def _compare_categories(values, op, value):
+    # compare every distinct value once, then spread the result over the rows by code;
+    # the categories are compared as plain values, like the strings they stand for
+    try:
+        matches = op(pd.Series(values.cat.categories), value).to_numpy(dtype=bool, na_value=False)
+    except TypeError as e:
+        raise TypeError(f"Invalid filter condition: {e}") from None
+    # missing values have code -1, which picks the trailing False
+    return np.append(matches, False)[values.cat.codes.to_numpy()]
+
+
+def _compile_logical(cond):
+    left = compile_condition(cond.left)
+    right = compile_condition(cond.right)
+
+    if cond.op == "AND":
+        # only rows that passed the left side can still pass
+        decide, combine = np.flatnonzero, np.logical_and
+    elif cond.op == "OR":
+        # only rows that failed the left side can still pass
+        decide, combine = (lambda result: np.flatnonzero(~result)), np.logical_or
+    else:
+        raise ValueError(f"Unknown logical operator: {cond.op}")
+
+    def mask(df, rows=None):
+        result = left(df, rows)
+        undecided = decide(result)
+        if len(undecided) == 0:
+            return result
+
+        if len(undecided) * SHORT_CIRCUIT_RATIO < len(result):
+            # selective left side: evaluate the right side on the undecided rows only
+            positions = undecided if rows is None else rows[undecided]
+            result[undecided] = right(df, positions)
+            return result
+
+        return combine(result, right(df, rows), out=result)
+
+    return mask
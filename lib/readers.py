@@ -0,0 +1,233 @@
+# file readers used by LOAD and by deferred tables, and the writer used by SAVE
+
+import glob
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from lib.json_records import read_json_chunks, JSON_LINES_FORMATS
+from lib.plan import condition_columns
+from lib.predicates import compile_condition
+
+# optional: Parquet and Feather / Arrow IPC files are read and written with pyarrow
+try:
+    import pyarrow
+    from pyarrow import feather
+except ImportError:
+    pyarrow = None
+
+SUPPORTED_FORMATS = (".csv", ".json", ".parquet", ".feather", ".arrow") + JSON_LINES_FORMATS
+COLUMNAR_FORMATS = (".parquet", ".feather", ".arrow")
+# text formats, read chunk by chunk
+CHUNKED_FORMATS = (".csv", ".json") + JSON_LINES_FORMATS
+
+# rows per chunk when a condition is applied while reading
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def check_source(file_name):
+    # check the file exists and its format is supported, and return the files to
+    # read: the file itself, or every file matching a glob pattern in name order.
+    # an existing file is read as it is, even when its name holds '[', '*' or '?'
+    if os.path.isfile(file_name):
+        files = [file_name]
+    elif is_pattern(file_name):
+        files = sorted(name for name in glob.glob(file_name) if os.path.isfile(name))
+        if not files:
+            raise FileNotFoundError(f"No file matches {file_name}")
+    else:
+        raise FileNotFoundError(f"File {file_name} not found")
+
+    for name in files:
+        check_format(name)
+    return files
+
+
+def is_pattern(file_name):
+    # whether a LOAD path is a glob pattern ('data/2026-*.csv') rather than one file
+    return glob.has_magic(file_name)
+
+
+def check_format(file_name):
+    if not file_name.endswith(SUPPORTED_FORMATS):
+        raise ValueError(f"Unsupported file format: {file_name}. Must be one of {', '.join(SUPPORTED_FORMATS)}")
+
+
+def read_table(file_name, columns=None, condition=None, chunksize=DEFAULT_CHUNKSIZE):
+    # read a csv / json / parquet / feather file into a DataFrame.
+    # columns: only these columns are kept, None keeps all of them
+    # condition: FILTER condition, rows failing it are dropped while reading
+    columns = list(columns) if columns is not None else None
+    mask = compile_condition(condition) if condition is not None else None
+
+    if file_name.endswith(COLUMNAR_FORMATS):
+        # columnar files are read column by column: only the needed ones are
+        df = _read_columnar(file_name, _needed_columns(columns, condition))
+        if mask is not None:
+            df = df[mask(df)]
+        return df if columns is None else df[columns]
+
+    return _read_text(file_name, columns, condition, mask, chunksize)
+
+
+def read_files(file_names, read=read_table, source_column=None, workers=None):
+    # read several files (the shards of one table) into a single DataFrame.
+    # the files are read concurrently: the pandas / pyarrow parsers spend most of
+    # their time outside the GIL. read: the function reading one file
+    # source_column: name of an added column holding the file each row comes from
+    if len(file_names) == 1:
+        frames = [read(file_names[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(read, file_names))
+    return concat_shards(frames, file_names, source_column)
+
+
+def concat_shards(frames, file_names, source_column=None):
+    # stack the shards into one table numbered 0..n-1 (a single shard keeps its
+    # row labels, like a LOAD of that file), in a single concat so every column
+    # is copied once. the schemas are reconciled like pandas does: the
+    # columns are the union of the shards' columns in order of first appearance,
+    # a column missing from a shard is NA for its rows, and a column read with
+    # different dtypes gets their common dtype (ints and floats -> float, else object)
+    if source_column is not None and any(source_column in df.columns for df in frames):
+        raise ValueError(f"Column '{source_column}' already exists, choose another source column name")
+
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True, sort=False, copy=False)
+    if source_column is not None:
+        # a category: one small code per row and each file name stored once
+        codes = np.repeat(np.arange(len(frames), dtype=np.int32), [len(frame) for frame in frames])
+        df[source_column] = pd.Categorical.from_codes(codes, categories=list(file_names))
+    return df
+
+
+def read_chunks(file_name, usecols=None, chunksize=DEFAULT_CHUNKSIZE):
+    # yield a csv / json / json lines file as DataFrames of up to 'chunksize' rows,
+    # with the columns in 'usecols' (see read_columns). at least one (maybe empty)
+    # chunk is yielded
+    if not file_name.endswith(".csv"):
+        # records are decoded whole, so only named columns are selected
+        yield from read_json_chunks(file_name, usecols if usecols != [0] else None, chunksize)
+        return
+
+    empty = True
+    for chunk in pd.read_csv(file_name, usecols=usecols, chunksize=chunksize):
+        empty = False
+        yield chunk
+    if empty:
+        yield pd.read_csv(file_name, usecols=usecols, nrows=0)
+
+
+def read_columns(columns, condition):
+    # the columns to read from a file so that 'columns' can be returned
+    # after 'condition' is applied, None reads all of them
+    if columns is None:
+        return None
+    # the condition may read columns that are not returned
+    usecols = list(columns) + (condition_columns(condition) if condition is not None else [])
+    usecols = list(dict.fromkeys(usecols))
+    if not usecols:
+        # only the row count is needed, read the narrowest possible frame
+        usecols = [0]
+    return usecols
+
+
+def _needed_columns(columns, condition):
+    # the columns read_columns asks for, by name; None (every column) when only
+    # the row count is needed
+    usecols = read_columns(columns, condition)
+    return usecols if usecols != [0] else None
+
+
+def _require_pyarrow(file_name):
+    if pyarrow is None:
+        raise ImportError(f"pyarrow is required for {os.path.splitext(file_name)[1]} files: pip install pyarrow")
+
+
+def _read_columnar(file_name, columns):
+    _require_pyarrow(file_name)
+    if file_name.endswith(".parquet"):
+        # the row labels stored by SAVE are restored from the pandas metadata
+        return pd.read_parquet(file_name, engine="pyarrow", columns=columns)
+
+    # Arrow IPC (Feather v2) files are memory-mapped: the buffers of an uncompressed
+    # file are used in place, and only the selected columns are ever touched
+    table = feather.read_table(file_name, memory_map=True)
+    if columns is not None:
+        table = table.select(list(columns) + _index_columns(table.schema, columns))
+    # one block per column, so numeric columns need no consolidation copy
+    return table.to_pandas(split_blocks=True)
+
+
+def _index_columns(schema, columns):
+    # the columns holding the row labels written by SAVE
+    metadata = schema.pandas_metadata or {}
+    return [col for col in metadata.get("index_columns", []) if isinstance(col, str) and col not in columns]
+
+
+def write_table(df, file_name):
+    # write a table for SAVE, in the format given by the file extension.
+    # parquet and feather keep the dtypes and row labels; csv and json hold the
+    # values only, like the files LOAD reads (json as an array of records,
+    # json lines as one record per line).
+    # the file is written next to its destination then moved over it, so a reader
+    # never sees it half written and a memory-mapped earlier version stays valid
+    check_format(file_name)
+    if file_name.endswith(COLUMNAR_FORMATS):
+        _require_pyarrow(file_name)
+
+    extension = os.path.splitext(file_name)[1]
+    fd, temp_name = tempfile.mkstemp(suffix=extension, dir=os.path.dirname(os.path.abspath(file_name)))
+    os.close(fd)
+    try:
+        if extension == ".csv":
+            df.to_csv(temp_name, index=False)
+        elif extension == ".json":
+            df.to_json(temp_name, orient="records")
+        elif extension in JSON_LINES_FORMATS:
+            df.to_json(temp_name, orient="records", lines=True)
+        elif extension == ".parquet":
+            df.to_parquet(temp_name, engine="pyarrow")
+        else:
+            # uncompressed and in one record batch, so LOAD can memory-map every
+            # column as a single buffer, without decoding or concatenating chunks
+            feather.write_feather(pyarrow.Table.from_pandas(df), temp_name, compression="uncompressed",
+                                  chunksize=max(len(df), 1))
+        # mkstemp creates the file readable by its owner only
+        os.chmod(temp_name, _file_mode(file_name))
+        os.replace(temp_name, file_name)
+    except BaseException:
+        os.remove(temp_name)
+        raise
+    return file_name
+
+
+def _file_mode(file_name):
+    # the mode of the file replaced, or the one open() would give a new file
+    try:
+        return os.stat(file_name).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def _read_text(file_name, columns, condition, mask, chunksize):
+    usecols = read_columns(columns, condition)
+
+    if mask is None and file_name.endswith(".csv"):
+        df = pd.read_csv(file_name, usecols=usecols)
+        return df if columns is None else df[columns]
+    if mask is None and columns is None and file_name.endswith(".json"):
+        # a whole .json file (eager LOAD) is read by pandas; the record decoder, which
+        # reads parts of a file (LAZY, STREAM), applies the same dtype conversions
+        return pd.read_json(file_name)
+
+    # filter chunk by chunk so the rows failing the condition are never accumulated
+    kept = []
+    for chunk in read_chunks(file_name, usecols, chunksize):
+        if mask is not None:
+            chunk = chunk[mask(chunk)]
+        kept.append(chunk if columns is None else chunk[columns])
+    return kept[0] if len(kept) == 1 else pd.concat(kept)
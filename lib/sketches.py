@@ -0,0 +1,138 @@
+# mergeable sketches used by the APPROX modifier: they read a column once, in batches,
+# keep memory sub-linear in the number of rows, and two sketches of different chunks
+# merge into the sketch of both
+
+import numpy as np
+import pandas as pd
+
+# values are added to a sketch this many at a time
+BATCH_SIZE = 65_536
+
+# the random offsets of the KLL compactions are drawn from a fixed seed, so the same
+# column always gives the same sketch (and APPROX the same rows)
+DEFAULT_SEED = 0
+
+
+class KLLSketch:
+    # quantile sketch of Karnin, Lang and Liberty (2016). items are kept in levels,
+    # an item at level h standing for 2**h values; a full level is sorted and every
+    # other item (from a random offset) is promoted to the next level.
+    # memory is O(k log(n / k)) items. the rank error shrinks as 1 / k: for the default
+    # k=200 the rank of a returned quantile is within +-1.33% of the rows of the requested
+    # one with 99% confidence (the bound published for the DataSketches implementation)
+    def __init__(self, k=200, seed=DEFAULT_SEED):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def capacity(self, level):
+        # lower levels get geometrically smaller buffers
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        # add a Series or array of numbers, missing values are skipped. only one batch
+        # at a time is converted to floats, never a copy of the whole column
+        if not isinstance(values, pd.Series):
+            values = np.asarray(values)
+        for start in range(0, len(values), BATCH_SIZE):
+            if isinstance(values, pd.Series):
+                batch = values.iloc[start:start + BATCH_SIZE].to_numpy(dtype=float, na_value=np.nan)
+            else:
+                batch = values[start:start + BATCH_SIZE].astype(float)
+            batch = batch[~np.isnan(batch)]
+            self.levels[0] = np.concatenate([self.levels[0], batch])
+            self.count += len(batch)
+            self._compact()
+        return self
+
+    def merge(self, other):
+        # a sketch of the values of both sketches
+        if other.k != self.k:
+            raise ValueError("Cannot merge KLL sketches with different k")
+        merged = KLLSketch(self.k)
+        merged.rng = self.rng
+        merged.count = self.count + other.count
+        depth = max(len(self.levels), len(other.levels))
+        merged.levels = [
+            np.concatenate([sketch.levels[h] for sketch in (self, other) if h < len(sketch.levels)])
+            for h in range(depth)
+        ]
+        merged._compact()
+        return merged
+
+    def _compact(self):
+        # a single pass from the bottom is enough: a level only grows from the one below
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # with an odd number of items the smallest one stays
+                odd = len(items) % 2
+                promoted = items[odd + self.rng.integers(2)::2]
+                self.levels[level] = items[:odd]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        position = np.searchsorted(cumulative, q * cumulative[-1], side="left")
+        return items[order[min(position, len(items) - 1)]]
+
+    def __len__(self):
+        # number of items held
+        return sum(len(items) for items in self.levels)
+
+
+class FrequentItems:
+    # Misra-Gries heavy hitters summary with at most k counters. a counter underestimates
+    # the frequency of its value by at most n / (k + 1), and any value more frequent
+    # than n / (k + 1) has a counter, so the most frequent value is found whenever it
+    # leads the next one by more than n / (k + 1). summaries merge with the same bound
+    # (Agarwal et al., Mergeable Summaries, 2012)
+    def __init__(self, k=1024):
+        self.k = k
+        self.count = 0
+        self.counters = pd.Series(dtype="int64")
+
+    def update(self, values):
+        # add a Series or array of values, missing values are skipped
+        values = pd.Series(values)
+        for start in range(0, len(values), BATCH_SIZE):
+            batch = values.iloc[start:start + BATCH_SIZE].value_counts()
+            self.count += int(batch.sum())
+            self.counters = self._reduce(self.counters.add(batch, fill_value=0))
+        return self
+
+    def merge(self, other):
+        merged = FrequentItems(self.k)
+        merged.count = self.count + other.count
+        merged.counters = self._reduce(self.counters.add(other.counters, fill_value=0))
+        return merged
+
+    def _reduce(self, counters):
+        # keep k counters: every count drops by the (k + 1)-th largest one
+        if len(counters) > self.k:
+            counters = counters.sort_values(ascending=False)
+            counters = counters.iloc[:self.k] - counters.iloc[self.k]
+            counters = counters[counters > 0]
+        return counters.astype("int64")
+
+    def most_frequent(self):
+        # the value with the largest counter, the smallest value among ties
+        if self.counters.empty:
+            return np.nan
+        top = self.counters[self.counters == self.counters.max()]
+        return top.index.sort_values()[0]
+
+    def error_bound(self):
+        return self.count / (self.k + 1)
@@ -0,0 +1,62 @@
+# named versions of tables (SNAPSHOT t AS t_v1, RESTORE t FROM t_v1). stored tables are
+# copy-on-write per column (see TableStore), so a snapshot is a shallow copy: it shares
+# every column with the table until a command replaces that column in the table, and
+# keeping many versions costs only the columns that differ between them.
+# a snapshot keeps the version numbers of its columns, so after a RESTORE the caches
+# keyed by column version (statistics, indexes) still match the restored columns
+
+import pandas as pd
+from lib.tables import column_versions, get_table
+
+
+class Snapshots:
+    def __init__(self, tables):
+        self.tables = tables
+        self.entries = {}       # snapshot name -> (table name, DataFrame, {column: version})
+
+    def take(self, table_name, name):
+        df = get_table(self.tables, table_name)
+        versions = column_versions(self.tables, table_name)
+        if versions is None:
+            raise ValueError(f"Table '{table_name}' cannot be snapshot.")
+        self.entries[name] = (table_name, df.copy(deep=False), dict(versions))
+        return name
+
+    def restore(self, table_name, name):
+        # make the snapshot the current version of the table; the snapshot is kept,
+        # so it can be restored again
+        if name not in self.entries:
+            raise ValueError(f"Snapshot '{name}' not found.")
+        _, df, versions = self.entries[name]
+        self.tables.store(table_name, df.copy(deep=False), versions=versions)
+        return self.tables[table_name]
+
+    def drop(self, name):
+        self.entries.pop(name, None)
+
+    def report(self):
+        # one row per snapshot and per table that has snapshots: its rows, columns and
+        # the memory of its columns (deep, index excluded), and how much of that is
+        # shared with another snapshot or table. a column's memory is counted once
+        # per distinct version
+        versions = {name: (table, df, columns) for name, (table, df, columns) in self.entries.items()}
+        for table in dict.fromkeys(table for table, _, _ in self.entries.values()):
+            current = column_versions(self.tables, table)
+            if current is not None:
+                versions[table] = (table, self.tables[table], current)
+
+        holders = {}    # column version -> number of versions holding it
+        sizes = {}      # column version -> bytes
+        for _, df, columns in versions.values():
+            for col, version in columns.items():
+                holders[version] = holders.get(version, 0) + 1
+                if version not in sizes:
+                    sizes[version] = int(df[col].memory_usage(index=False, deep=True))
+
+        rows = []
+        for name, (table, df, columns) in versions.items():
+            total = sum(sizes[version] for version in columns.values())
+            shared = sum(sizes[version] for version in columns.values() if holders[version] > 1)
+            rows.append((name, table, name in self.entries, len(df), len(columns), total, shared))
+        report = pd.DataFrame(rows, columns=["version", "table", "snapshot", "rows", "columns", "bytes", "shared_bytes"])
+        return report.set_index("version")
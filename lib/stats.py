@@ -0,0 +1,198 @@
+# per-column statistics shared by the clean commands (FILL NA, NORMALIZE, FILTER OUTLIERS).
+# statistics are cached per table column and column version (see TableStore), and kept up
+# to date when a command changes a column in a known way instead of re-scanning it:
+# count / mean / M2 are merged (Chan et al.'s parallel form of Welford's algorithm) when
+# values are added or removed, and shifted / scaled with a linear transform of the column
+
+import math
+import pandas as pd
+from lib.sketches import KLLSketch, FrequentItems
+from lib.tables import column_versions
+
+
+class ColumnStats:
+    # count, mean and M2 (sum of squared deviations from the mean) of the non-missing
+    # values, min / max, and the memoized exact order statistics (median, quantiles, mode),
+    # which are never carried over to a changed column.
+    # None marks a statistic that is not known and has to be computed from the column
+    def __init__(self, count=None, mean=None, m2=None, minimum=None, maximum=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+        self.memo = {}
+
+    @classmethod
+    def of(cls, values):
+        # the moments of a Series, computed the way pandas computes them
+        count = int(values.count())
+        var = values.var(ddof=0) if count else 0.0
+        return cls(count, values.mean(), var * count, values.min(), values.max())
+
+    @classmethod
+    def constant(cls, value, count):
+        return cls(count, value, 0.0, value, value)
+
+    def var(self, ddof=1):
+        if self.count - ddof <= 0:
+            return math.nan
+        return self.m2 / (self.count - ddof)
+
+    def std(self, ddof=1):
+        return math.sqrt(self.var(ddof))
+
+    def merge(self, other):
+        # statistics of both sets of values together
+        if other.count == 0:
+            return ColumnStats(self.count, self.mean, self.m2, self.min, self.max)
+        if self.count == 0:
+            return ColumnStats(other.count, other.mean, other.m2, other.min, other.max)
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        mean = self.mean + delta * other.count / count
+        m2 = self.m2 + other.m2 + delta * delta * self.count * other.count / count
+        minimum = None if self.min is None else min(self.min, other.min)
+        maximum = None if self.max is None else max(self.max, other.max)
+        return ColumnStats(count, mean, m2, minimum, maximum)
+
+    def remove(self, other):
+        # statistics of these values once the values summarized by 'other' are removed.
+        # min / max become unknown when a removed value may have been the extreme one
+        count = self.count - other.count
+        if count <= 0:
+            return ColumnStats(0, math.nan, 0.0, None, None)
+        if other.count == 0:
+            return ColumnStats(self.count, self.mean, self.m2, self.min, self.max)
+        mean = (self.count * self.mean - other.count * other.mean) / count
+        delta = other.mean - mean
+        m2 = max(self.m2 - other.m2 - delta * delta * count * other.count / self.count, 0.0)
+        minimum = self.min if self.min is not None and other.min > self.min else None
+        maximum = self.max if self.max is not None and other.max < self.max else None
+        return ColumnStats(count, mean, m2, minimum, maximum)
+
+    def scaled(self, shift, scale):
+        # statistics of (value - shift) / scale
+        minimum = None if self.min is None else (self.min - shift) / scale
+        maximum = None if self.max is None else (self.max - shift) / scale
+        if scale < 0:
+            minimum, maximum = maximum, minimum
+        return ColumnStats(self.count, (self.mean - shift) / scale, self.m2 / (scale * scale), minimum, maximum)
+
+
+class StatsCache:
+    def __init__(self, tables):
+        self.tables = tables
+        self.entries = {}       # (table, column) -> (column version, ColumnStats)
+
+    def column_stats(self, table_name, col):
+        # the cached statistics of a column, a fresh (uncached) object when the
+        # tables are not versioned or the column changed since they were computed
+        version = self._version(table_name, col)
+        if version is not None:
+            entry = self.entries.get((table_name, col))
+            if entry is not None and entry[0] == version:
+                return entry[1]
+
+        stats = ColumnStats()
+        if version is not None:
+            self.entries[(table_name, col)] = (version, stats)
+        return stats
+
+    def _version(self, table_name, col):
+        versions = column_versions(self.tables, table_name)
+        return None if versions is None else versions.get(col)
+
+    def _moments_of(self, df, table_name, col):
+        stats = self.column_stats(table_name, col)
+        if stats.count is None:
+            fresh = ColumnStats.of(df[col])
+            stats.count, stats.mean, stats.m2 = fresh.count, fresh.mean, fresh.m2
+            if stats.min is None or stats.max is None:
+                stats.min, stats.max = fresh.min, fresh.max
+        return stats
+
+    def mean(self, df, table_name, col):
+        return self._moments_of(df, table_name, col).mean
+
+    def std(self, df, table_name, col):
+        return self._moments_of(df, table_name, col).std()
+
+    def min(self, df, table_name, col):
+        stats = self._moments_of(df, table_name, col)
+        if stats.min is None:
+            stats.min = df[col].min()
+        return stats.min
+
+    def max(self, df, table_name, col):
+        stats = self._moments_of(df, table_name, col)
+        if stats.max is None:
+            stats.max = df[col].max()
+        return stats.max
+
+    def _memo(self, df, table_name, col, key, compute):
+        memo = self.column_stats(table_name, col).memo
+        if key not in memo:
+            memo[key] = compute(df[col])
+        return memo[key]
+
+    def median(self, df, table_name, col):
+        return self._memo(df, table_name, col, "median", lambda s: s.median())
+
+    def quantile(self, df, table_name, col, q):
+        return self._memo(df, table_name, col, ("quantile", q), lambda s: s.quantile(q))
+
+    def mode(self, df, table_name, col):
+        return self._memo(df, table_name, col, "mode", lambda s: s.mode().iloc[0])
+
+    # APPROX: sketches built in one pass over the column, memoized like the exact values
+    def approx_quantile(self, df, table_name, col, q):
+        sketch = self._memo(df, table_name, col, "kll",
+                            lambda s: KLLSketch().update(s))
+        return sketch.quantile(q)
+
+    def approx_mode(self, df, table_name, col):
+        return self._memo(df, table_name, col, "frequent", lambda s: FrequentItems().update(s)).most_frequent()
+
+    # updates: called after a command stored the new version of a table,
+    # with the column versions from before the command
+    def versions(self, table_name):
+        versions = column_versions(self.tables, table_name)
+        return None if versions is None else dict(versions)
+
+    def _carry(self, table_name, col, before, update):
+        # move the known moments of a column to its new version through 'update'
+        entry = self.entries.get((table_name, col))
+        version = self._version(table_name, col)
+        if before is None or entry is None or version is None or entry[0] != before.get(col):
+            return
+        stats = entry[1]
+        if stats.count is None or not pd.api.types.is_numeric_dtype(self.tables[table_name][col]):
+            del self.entries[(table_name, col)]
+            return
+        self.entries[(table_name, col)] = (version, update(stats))
+
+    def values_added(self, table_name, col, before, added):
+        # 'added' (a ColumnStats) summarizes the values that replaced missing ones
+        self._carry(table_name, col, before, lambda stats: stats.merge(added))
+
+    def values_replaced(self, table_name, col, before, removed, added):
+        # the values of the Series 'removed' were replaced by those of 'added'
+        self._carry(table_name, col, before,
+                    lambda stats: stats.remove(ColumnStats.of(removed)).merge(ColumnStats.of(added)))
+
+    def column_scaled(self, table_name, col, before, shift, scale):
+        self._carry(table_name, col, before, lambda stats: stats.scaled(shift, scale))
+
+    def rows_removed(self, table_name, before, removed):
+        # 'removed' holds the rows dropped from the table; the moments of every
+        # cached column are updated when fewer rows were removed than kept
+        kept = len(self.tables[table_name])
+        for col in removed.columns:
+            entry = self.entries.get((table_name, col))
+            if entry is None:
+                continue
+            if len(removed) > kept or not pd.api.types.is_numeric_dtype(removed[col]):
+                # recomputing is cheaper, and numerically safer, than subtracting
+                continue
+            self._carry(table_name, col, before, lambda stats: stats.remove(ColumnStats.of(removed[col])))
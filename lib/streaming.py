@@ -0,0 +1,86 @@
+# aggregation over a stream of chunks with mergeable partial states:
+# every chunk is reduced to count / sum / min / max per group, and the partials
+# are merged right away, so memory grows with the number of groups, not the rows
+
+import pandas as pd
+from lib.aggregate import output_name
+
+# partial states each aggregate function is computed from
+PARTIALS = {
+    "COUNT": ("count",),
+    "SUM": ("sum",),
+    "MIN": ("min",),
+    "MAX": ("max",),
+    "AVG": ("sum", "count"),
+}
+
+# how two partial states of the same kind are merged
+MERGE = {"size": "sum", "count": "sum", "sum": "sum", "min": "min", "max": "max"}
+
+
+class PartialAggregate:
+    def __init__(self, group_by, aggregates):
+        self.group_by = list(group_by)
+        self.aggregates = aggregates
+
+        # partial state name -> (column, partial function)
+        self.parts = {}
+        for expr in aggregates:
+            if expr.param == "*":
+                self.parts["*:size"] = (None, "size")
+                continue
+            if expr.func not in PARTIALS:
+                raise ValueError(f"Unknown aggregate function: {expr.func}")
+            for part in PARTIALS[expr.func]:
+                self.parts[f"{expr.param}:{part}"] = (expr.param, part)
+        self.state = None
+
+    def update(self, chunk):
+        partial = self._partial(chunk)
+        if self.state is not None:
+            partial = self._merge(pd.concat([self.state, partial]))
+        self.state = partial
+
+    def _partial(self, chunk):
+        if self.group_by:
+            grouped = chunk.groupby(self.group_by)
+            return pd.DataFrame({
+                name: grouped.size() if part == "size" else grouped[col].agg(part)
+                for name, (col, part) in self.parts.items()
+            })
+        return pd.DataFrame([{
+            name: len(chunk) if part == "size" else getattr(chunk[col], part)()
+            for name, (col, part) in self.parts.items()
+        }])
+
+    def _merge(self, partials):
+        merge = {name: MERGE[part] for name, (_, part) in self.parts.items()}
+        if self.group_by:
+            return partials.groupby(level=list(range(partials.index.nlevels))).agg(merge)
+        return pd.DataFrame([{name: getattr(partials[name], func)() for name, func in merge.items()}])
+
+    def result(self):
+        # the final aggregates, named like the in-memory aggregation
+        state = self.state
+        columns = {}
+        for expr in self.aggregates:
+            func, param = expr.func, expr.param
+            if param == "*":
+                columns[output_name(expr)] = state["*:size"]
+            elif func == "AVG":
+                columns[output_name(expr)] = state[f"{param}:sum"] / state[f"{param}:count"]
+            else:
+                columns[output_name(expr)] = state[f"{param}:{PARTIALS[func][0]}"]
+
+        result_df = pd.DataFrame(columns)
+        if self.group_by:
+            result_df = result_df.reset_index()
+        return result_df
+
+
+def aggregate_chunks(chunks, group_by, aggregates):
+    # aggregate a stream of chunks, holding one chunk and the merged partials at a time
+    partial = PartialAggregate(group_by, aggregates)
+    for chunk in chunks:
+        partial.update(chunk)
+    return partial.result()
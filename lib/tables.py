@@ -0,0 +1,179 @@
+# table storage helpers shared by the interpreters
+
+import itertools
+import numpy as np
+import pandas as pd
+from lib.predicates import compile_condition
+from lib.readers import read_table, read_columns, read_chunks, DEFAULT_CHUNKSIZE
+
+
+class LazyTable:
+    # a table loaded with LOAD ... LAZY: only the source is recorded, and every
+    # query reads just the columns and rows it needs from the file
+    def __init__(self, file_name):
+        self.file_name = file_name
+
+    def read(self, columns=None, condition=None):
+        return read_table(self.file_name, columns, condition)
+
+    def __repr__(self):
+        return f"LazyTable({self.file_name!r})"
+
+
+class StreamTable:
+    # a table loaded with LOAD ... STREAM: the file is read chunk by chunk on
+    # every query, so only one chunk of the file is in memory at a time.
+    # stages are the clean commands applied to the table so far, each a function
+    # chunk -> chunk run on every chunk in order
+    def __init__(self, file_name, chunksize=DEFAULT_CHUNKSIZE, stages=()):
+        self.file_name = file_name
+        self.chunksize = chunksize
+        self.stages = tuple(stages)
+
+    def then(self, stage):
+        # the same stream with one more stage, the original is left unchanged
+        return StreamTable(self.file_name, self.chunksize, self.stages + (stage,))
+
+    def chunks(self, columns=None, condition=None):
+        # yield the chunks of the table after every stage, keeping the rows that pass
+        # 'condition' and the given columns. at least one (maybe empty) chunk is yielded
+        mask = compile_condition(condition) if condition is not None else None
+        # stages may read any column, so the file is only pruned when there are none
+        usecols = read_columns(columns, condition) if not self.stages else None
+
+        for chunk in read_chunks(self.file_name, usecols, self.chunksize):
+            yield self._select(chunk, columns, mask)
+
+    def _select(self, chunk, columns, mask):
+        for stage in self.stages:
+            chunk = stage(chunk)
+        if mask is not None:
+            chunk = chunk[mask(chunk)]
+        return chunk if columns is None else chunk[list(columns)]
+
+    def read(self, columns=None, condition=None):
+        # the selected rows and columns as one DataFrame
+        return pd.concat(self.chunks(columns, condition))
+
+    def __repr__(self):
+        return f"StreamTable({self.file_name!r}, chunksize={self.chunksize}, stages={len(self.stages)})"
+
+
+class TableStore(dict):
+    # the tables of an interpreter, by name. DataFrames are stored with one block per
+    # column, so a new version of a table can share its unchanged columns with the old
+    # one: clean commands replace whole columns on a shallow copy and never write into
+    # a stored array (copy-on-write per column).
+    # every stored column gets a version number, which changes whenever its data may
+    # have changed, so anything derived from a column (statistics, ...) can be cached
+    def __init__(self):
+        super().__init__()
+        self.versions = {}      # table name -> {column: version}
+
+    def __setitem__(self, table_name, df):
+        self.store(table_name, df)
+
+    def __delitem__(self, table_name):
+        super().__delitem__(table_name)
+        self.versions.pop(table_name, None)
+
+    def store(self, table_name, df, unchanged=(), versions=None):
+        # store a table; the columns listed in 'unchanged' hold the same data as in
+        # the previous version and keep their version number. versions: the
+        # {column: version} the table had when it was stored before (a snapshot)
+        previous = self.versions.pop(table_name, {})
+        if isinstance(df, pd.DataFrame):
+            df = split_columns(df)
+            if versions is not None:
+                self.versions[table_name] = dict(versions)
+            else:
+                self.versions[table_name] = {
+                    col: previous[col] if col in unchanged and col in previous else next(_versions)
+                    for col in df.columns
+                }
+        super().__setitem__(table_name, df)
+
+
+_versions = itertools.count()
+
+
+def column_versions(tables, table_name):
+    # {column: version} of a stored table, None when the tables are not versioned
+    if isinstance(tables, TableStore):
+        return tables.versions.get(table_name)
+    return None
+
+
+def store_table(tables, table_name, df, unchanged=()):
+    if isinstance(tables, TableStore):
+        tables.store(table_name, df, unchanged)
+    else:
+        tables[table_name] = df
+    return tables[table_name]
+
+
+def split_columns(df):
+    # the same table with every column in its own block, without copying any data
+    if df.shape[1] == 0 or not df.columns.is_unique:
+        return df
+    return pd.DataFrame({col: df[col] for col in df.columns}, copy=False)
+
+
+def update_columns(tables, table_name, columns):
+    # store a new version of the table with the given columns replaced (or added);
+    # the other columns are shared with the previous version
+    df = get_table(tables, table_name).copy(deep=False)
+    unchanged = [col for col in df.columns if col not in columns]
+    for col, values in columns.items():
+        df[col] = values
+    return store_table(tables, table_name, df, unchanged)
+
+
+def drop_columns(tables, table_name, columns):
+    # store a new version of the table without the given columns
+    df = get_table(tables, table_name).copy(deep=False)
+    for col in columns:
+        # deleting from a shallow copy keeps the other columns shared
+        del df[col]
+    return store_table(tables, table_name, df, df.columns)
+
+
+def set_cell(tables, table_name, row, column, value):
+    # change one value, copying only the column that holds it
+    df = get_table(tables, table_name)
+    if column in df.columns:
+        values = with_category(df[column], value).copy()
+    else:
+        # like DataFrame.at, a new column is added, empty but for this value
+        values = pd.Series(np.nan, index=df.index)
+    values.at[row] = value
+    return update_columns(tables, table_name, {column: values})
+
+
+def get_table(tables, table_name):
+    # look a table up, reading a lazy table in full the first time a
+    # statement needs all of it (clean commands, plots)
+    if table_name not in tables:
+        raise ValueError(f"Table '{table_name}' not found. Load it first!")
+
+    df = tables[table_name]
+    if isinstance(df, LazyTable):
+        df = df.read()
+        tables[table_name] = df
+    elif isinstance(df, StreamTable):
+        raise ValueError(f"Table '{table_name}' is streamed and cannot be read in full.")
+    return df
+
+
+def with_category(values, value):
+    # a categorical column (see lib/optimize.py) only takes values among its categories:
+    # the column with 'value' added to them, other columns as they are. the categories
+    # stay sorted, since sorting and grouping follow their order
+    if isinstance(values.dtype, pd.CategoricalDtype) and not pd.isna(value) and value not in values.cat.categories:
+        try:
+            categories = sorted([*values.cat.categories, value])
+        except TypeError:
+            # a value that doesn't compare with the categories: a plain object column
+            return values.astype(object)
+        return values.cat.set_categories(categories)
+    return values
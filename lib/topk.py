@@ -0,0 +1,50 @@
+# ORDER BY ... LIMIT k without sorting the whole table: the k-th value of the first
+# sort key is found with a linear-time partial selection (np.partition), the rows that
+# can still make the top k (all rows tied with it included) are kept, and only those
+# are sorted. the result is the same as sorting every row with a stable sort and
+# keeping the first k: O(n + k log k) instead of O(n log n)
+
+import numpy as np
+
+# below this many rows per requested row a full sort is as cheap
+MIN_ROWS_PER_RESULT = 4
+
+
+def sort_rows(df, keys):
+    # full ORDER BY, stable so tied rows keep their table order
+    columns = [column for column, _ in keys]
+    ascending = [ascending for _, ascending in keys]
+    return df.sort_values(columns, ascending=ascending, kind="stable")
+
+
+def top_k(df, keys, k):
+    # the first k rows of sort_rows(df, keys)
+    if k == 0:
+        return df.head(0)
+    candidates = _candidates(df, keys[0], k)
+    if candidates is not None:
+        df = df.take(candidates)
+    return sort_rows(df, keys).head(k)
+
+
+def _candidates(df, key, k):
+    # positions of the rows whose first sort key ranks within the top k (ties included),
+    # None when every row has to be sorted
+    column, ascending = key
+    values = df[column].to_numpy()
+    if values.dtype.kind not in "iuf" or len(values) < k * MIN_ROWS_PER_RESULT:
+        return None
+
+    # missing values sort last whatever the direction
+    valid = ~np.isnan(values) if values.dtype.kind == "f" else np.ones(len(values), dtype=bool)
+    present = values[valid]
+    if len(present) <= k:
+        return None
+
+    if ascending:
+        kth = np.partition(present, k - 1)[k - 1]
+        keep = values <= kth
+    else:
+        kth = np.partition(present, len(present) - k)[len(present) - k]
+        keep = values >= kth
+    return np.flatnonzero(keep & valid)
@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def load_cache_dir(tmp_path, monkeypatch):
+    # Interpreter() caches the loaded tables: keep them in the test's own directory
+    monkeypatch.setenv("DSL_LOAD_CACHE_DIR", str(tmp_path / "load_cache"))
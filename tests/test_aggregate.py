@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+from lib.aggregate import aggregate, group_codes
+from lib.nodes import AggExpr
+
+
+rng = np.random.default_rng(0)
+df = pd.DataFrame({
+    'dept': rng.choice(['eng', 'ops', None], 500),
+    'level': rng.integers(1, 4, 500),
+    'salary': rng.normal(100, 20, 500),
+    'age': rng.integers(20, 60, 500),
+})
+df.loc[rng.random(500) < 0.1, 'salary'] = np.nan
+
+
+def test_group_codes_follow_key_order():
+    codes, count = group_codes(df, ['dept', 'level'])
+    assert count == df.dropna().groupby(['dept', 'level']).ngroups
+    assert (codes[df['dept'].isna().to_numpy()] == -1).all()
+    keys = df.assign(code=codes)[codes >= 0].groupby('code')[['dept', 'level']].first()
+    assert keys.equals(keys.sort_values(['dept', 'level']))
+
+
+def test_matches_pandas_groupby():
+    aggs = (AggExpr('COUNT', '*'), AggExpr('SUM', 'salary'), AggExpr('AVG', 'salary'),
+            AggExpr('MIN', 'age'), AggExpr('MAX', 'salary'), AggExpr('COUNT', 'salary'))
+    result = aggregate(df, ('dept', 'level'), aggs)
+
+    grouped = df.groupby(['dept', 'level'])
+    expected = grouped.agg(
+        sum_salary=('salary', 'sum'), avg_salary=('salary', 'mean'), min_age=('age', 'min'),
+        max_salary=('salary', 'max'), count_salary=('salary', 'count'),
+    )
+    expected.insert(0, 'count', grouped.size())
+    pd.testing.assert_frame_equal(result, expected.reset_index())
+
+
+def test_without_group_by():
+    aggs = (AggExpr('COUNT', '*'), AggExpr('AVG', 'age'), AggExpr('MIN', 'dept'))
+    result = aggregate(df, (), aggs)
+    assert result.shape == (1, 3)
+    assert result['count'][0] == len(df)
+    assert result['avg_age'][0] == df['age'].mean()
+    assert result['min_dept'][0] == 'eng'
+
+
+def test_empty_table():
+    aggs = (AggExpr('COUNT', '*'), AggExpr('SUM', 'age'))
+    assert len(aggregate(df.iloc[:0], ('dept',), aggs)) == 0
+    assert aggregate(df.iloc[:0], (), aggs).iloc[0].tolist() == [0, 0]
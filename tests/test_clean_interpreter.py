@@ -1,7 +1,12 @@
 import pytest
 import pandas as pd
-from lark import Tree, Token
+from lib.fusion import fuse
 from lib.interpreter.clean_interpreter import CleanInterpreter
+from lib.tables import TableStore
+from lib.nodes import (
+    FillNA, DropNA, CleanNumeric, CleanNonNumeric, DropRow, DropColumn,
+    ReplaceCell, FilterOutliers, Normalize,
+)
 
 # test with user-defined data
 data = {
@@ -21,87 +26,55 @@ def clean_interpreter():
 
 
 def test_fillna_mean(clean_interpreter):
-    tree = Tree('clean_cmds', [Tree('fillna_cmd', [
-        Token('TABLE_NAME', 'users'),
-        Token('COL_NAME', 'age'),
-        Tree('mean', [])
-    ])])
-    clean_interpreter.execute(tree)
+    cmd = FillNA('users', 'age', 'mean')
+    clean_interpreter.execute(cmd)
     df = clean_interpreter.tables['users']
     assert df['age'].isnull().sum() == 0
     assert df['age'][2] == pytest.approx((24 + 20 + 36) / 3)
 
 
 def test_fillna_string(clean_interpreter):
-    tree = Tree('clean_cmds', [Tree('fillna_cmd', [
-        Token('TABLE_NAME', 'users'),
-        Token('COL_NAME', 'occupation'),
-        Token('STRING', 'student') 
-    ])])
+    cmd = FillNA('users', 'occupation', 'value', 'student')
 
-    clean_interpreter.execute(tree)
+    clean_interpreter.execute(cmd)
     df = clean_interpreter.tables['users']
     assert df['name'].isnull().sum() == 0
     assert df['occupation'][0] == 'student'
 
 
 def test_dropna_rows(clean_interpreter):
-    tree = Tree('clean_cmds', [Tree('dropna_cmd', [
-        Token('TABLE_NAME', 'users'),
-        Token('ROWS', 'ROWS')
-    ])])
-    clean_interpreter.execute(tree)
+    cmd = DropNA('users', axis=0)
+    clean_interpreter.execute(cmd)
     df = clean_interpreter.tables['users']
     assert df.isnull().sum().sum() == 0
     assert len(df) == 2
 
 
 def test_filter_outliers_zscore(clean_interpreter):
-    tree = Tree('clean_cmds', [Tree('filter_outliers_cmd', [
-        Token('TABLE_NAME', 'users'),
-        Token('COL_NAME', 'salary'),
-        Tree('outlier_method', [
-            Token('ZSCORE', 'ZSCORE'),
-            Token('NUMBER', '1')
-        ])
-    ])])
-    clean_interpreter.execute(tree)
+    cmd = FilterOutliers('users', 'salary', 'zscore', 1.0)
+    clean_interpreter.execute(cmd)
     df = clean_interpreter.tables['users']
     assert df['salary'].max() < 1000000
 
 
 def test_filter_outliers_iqr(clean_interpreter):
-    tree = Tree('clean_cmds', [Tree('filter_outliers_cmd', [
-        Token('TABLE_NAME', 'users'),
-        Token('COL_NAME', 'salary'),
-        Tree('outlier_method', [
-            Token('IQR', 'IQR')
-        ])
-    ])])
-    clean_interpreter.execute(tree)
+    cmd = FilterOutliers('users', 'salary', 'iqr')
+    clean_interpreter.execute(cmd)
     df = clean_interpreter.tables['users']
     assert df['salary'].max() < 1000000
 
 
 def test_normalize_zscore(clean_interpreter):
-    tree = Tree('clean_cmds', [Tree('normalize_cmd', [
-        Token('TABLE_NAME', 'users'),
-        Token('COL_NAME', 'salary'),
-        'with',
-        'zscore'
-    ])])
-    clean_interpreter.execute(tree)
+    cmd = Normalize('users', 'salary', 'zscore')
+    clean_interpreter.execute(cmd)
     col = clean_interpreter.tables['users']['salary']
     assert abs(col.mean()) < 1e-6
     assert round(col.std(), 5) == 1.0
 
 
 def test_remove_str_in_numeric(clean_interpreter):
-    tree = Tree('clean_cmds', [Tree('remove_str_in_numeric_cmd', [
-        Token('TABLE_NAME', 'users'),
-        Tree('columns', [Token('COL_NAME', 'score')])
-    ])])
-    clean_interpreter.execute(tree)
+    cmd = CleanNumeric('users', ('score',))
+    clean_interpreter.execute(cmd)
     df = clean_interpreter.tables['users']
     # check if 'not available' is removed
     assert 'not available' not in df['score'].values
@@ -109,52 +82,132 @@ def test_remove_str_in_numeric(clean_interpreter):
     assert pd.api.types.is_numeric_dtype(df['score'])
 
 
+def test_clean_numeric_strip():
+    df = pd.DataFrame({
+        'name': ['Rachel', 'Alice', 'Kristy', 'Peter', 'Xavier'],
+        'age': ['24_', '20', 'x', None, '41'],
+        'income': ['__10000__', '2500.5', '3000', 'n/a', '4000'],
+    })
+    for strip, rows in ((False, [1, 4]), (True, [0, 1, 4])):
+        clean_interpreter = CleanInterpreter({'t': df})
+        # no column list: the text columns holding mostly numbers
+        result = clean_interpreter.execute(CleanNumeric('t', strip=strip))
+        assert list(result.index) == rows
+        assert result['name'].tolist() == df['name'][rows].tolist()
+        assert pd.api.types.is_integer_dtype(result['age'])
+        assert pd.api.types.is_float_dtype(result['income'])
+
+    report = clean_interpreter.coercion_reports['t']
+    assert report.loc['age'].tolist() == [3, 1, 2]
+    assert report.loc['income'].tolist() == [4, 1, 0]
+    assert result.loc[0, 'income'] == 10000
+
+
+def test_clean_numeric_long_ids_and_ambiguous_strings():
+    df = pd.DataFrame({
+        # beyond int64: coerced to floats instead of failing the whole command
+        'account': ['12345678901234567890123', '42', '7', '8'],
+        'amount': ['1,000', '3-4', '24_', '5'],
+    })
+    assert list(CleanInterpreter({'t': df}).execute(CleanNumeric('t')).columns) == ['account', 'amount']
+    clean_interpreter = CleanInterpreter({'t': df})
+    result = clean_interpreter.execute(CleanNumeric('t', ('account',)))
+    assert result['account'].tolist() == [1.2345678901234568e22, 42.0, 7.0, 8.0]
+
+    # digits left beside the number found are not guessed at
+    result = clean_interpreter.execute(CleanNumeric('t', ('amount',), strip=True))
+    assert result['amount'].tolist() == [24, 5]
+
+
 def test_remove_num_in_nonnumeric(clean_interpreter):
-    tree = Tree('clean_cmds', [Tree('remove_num_in_nonnumeric_cmd', [
-        Token('TABLE_NAME', 'users'),
-        Tree('columns', [Token('COL_NAME', 'comment')])
-    ])])
-    clean_interpreter.execute(tree)
+    cmd = CleanNonNumeric('users', ('comment',))
+    clean_interpreter.execute(cmd)
     df = clean_interpreter.tables['users']
     # check if all values in 'comment' are strings
     assert df['comment'].apply(lambda x: not isinstance(x, (int, float))).all()
 
 
+def test_remove_num_in_nonnumeric_strings():
+    df = pd.DataFrame({
+        'code': ['A1', '123', None, ' -4.5 ', 'x', 7, '1e3'],
+        'note': ['ok', 'ok', 'ok', 'ok', '12', 'ok', 'ok'],
+    })
+    clean_interpreter = CleanInterpreter({'t': df})
+    clean_interpreter.execute(CleanNonNumeric('t', ('code', 'note')))
+    result = clean_interpreter.tables['t']
+    # numbers and numeric strings are dropped in either column, missing values are kept
+    assert list(result.index) == [0, 2]
+
+
 def test_drop_row_by_index(clean_interpreter):
-    tree = Tree('clean_cmds', [Tree('drop_row_col_cmd', [
-        Token('ROW', 'ROW'),
-        Token('INT', '1'),
-        Token('FROM', 'FROM'),
-        Token('TABLE_NAME', 'users')
-    ])])
-    clean_interpreter.execute(tree)
+    cmd = DropRow('users', 1)
+    clean_interpreter.execute(cmd)
     df = clean_interpreter.tables['users']
     assert 1 not in df.index
 
 
 def test_drop_column(clean_interpreter):
-    tree = Tree('clean_cmds', [Tree('drop_row_col_cmd', [
-        Token('COLUMN', 'COLUMN'),
-        Token('COL_NAME', 'occupation'),
-        Token('FROM', 'FROM'),
-        Token('TABLE_NAME', 'users')
-    ])])
-    clean_interpreter.execute(tree)
+    cmd = DropColumn('users', 'occupation')
+    clean_interpreter.execute(cmd)
     df = clean_interpreter.tables['users']
     assert 'occupation' not in df.columns
 
 
 def test_replace_cell(clean_interpreter):
-    tree = Tree('clean_cmds', [Tree('replace_cell_cmd', [
-        Token('TABLE_NAME', 'users'),
-        Token('ROW', 'ROW'), 
-        Token('INT', '0'),
-        Token('COLUMN', 'COLUMN'),
-        Token('COL_NAME', 'name'),
-        Token('STRING', 'Bob')
-    ])])
-
-    clean_interpreter.execute(tree)
+    cmd = ReplaceCell('users', 0, 'name', 'Bob')
+
+    clean_interpreter.execute(cmd)
     df = clean_interpreter.tables['users']
     assert df.at[0, 'name'] == 'Bob'
-    
\ No newline at end of file
+    
+
+def test_approx_statistics():
+    df = pd.DataFrame({'x': [1.0, 2.0, 2.0, None, 3.0, 100.0]})
+    clean_interpreter = CleanInterpreter({'t': df})
+    clean_interpreter.execute(FillNA('t', 'x', 'mode', approx=True))
+    assert clean_interpreter.tables['t']['x'][3] == 2.0
+
+    clean_interpreter.execute(FilterOutliers('t', 'x', 'iqr', 1.5, approx=True))
+    assert clean_interpreter.tables['t']['x'].max() == 3.0
+
+
+def test_lazy_commands_are_fused():
+    df = pd.DataFrame({
+        'name': ['Rachel', 'Alice', 'Kristy', 'Peter', 'Xavier', 'Bob'],
+        'age': ['24', '20', 'x', None, '41', '300'],
+        'salary': [1000.0, None, 75000.0, 56000.0, 88000.0, 1.0],
+    }, index=[10, 11, 12, 13, 14, 15])
+    commands = [
+        CleanNumeric('t', ('age',)), FillNA('t', 'salary', 'median'), Normalize('t', 'age'),
+        FilterOutliers('t', 'age'), DropRow('t', 10), FillNA('t', 'salary', 'value', 0.0),
+    ]
+    assert [len(group) for group in fuse(commands)] == [4, 1, 1]
+
+    eager = CleanInterpreter({'t': df})
+    lazy = CleanInterpreter(TableStore(), lazy=True)
+    lazy.tables['t'] = df
+    for cmd in commands:
+        eager.execute(cmd)
+        assert lazy.execute(cmd) is None
+    pd.testing.assert_frame_equal(lazy.tables['t'], df)
+
+    lazy.flush()
+    assert not lazy.pending
+    pd.testing.assert_frame_equal(lazy.tables['t'], eager.tables['t'])
+
+
+def test_workers_classify_columns_on_threads():
+    # the result doesn't depend on the number of threads
+    df = pd.DataFrame({
+        'score': ['98', '87', 'n/a', '91', '70', 'x'],
+        'amount': ['1', '2', '3', 'y', '5', '6'],
+        'comment': ['good', 3, 'bad', 4.5, 'ok', 'fine'],
+        'note': ['a', 'b', 'c', 'd', '7', 'e'],
+    })
+    results = []
+    for workers in (1, 2):
+        clean_interpreter = CleanInterpreter({'t': df}, workers=workers)
+        clean_interpreter.execute(CleanNumeric('t', ('score', 'amount')))
+        results.append(clean_interpreter.execute(CleanNonNumeric('t', ('comment', 'note'))))
+    assert list(results[1].index) == [0]
+    pd.testing.assert_frame_equal(results[1], results[0])
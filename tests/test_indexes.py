@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+from lib.indexes import ColumnIndex, IndexCache
+from lib.interpreter.interpreter import Interpreter
+from lib.nodes import Compare, Logical, SelectStmt, FilterClause
+from lib.predicates import compile_condition
+
+
+rng = np.random.default_rng(0)
+df = pd.DataFrame({
+    'age': rng.integers(18, 60, 500),
+    'score': np.where(rng.random(500) < 0.1, np.nan, rng.normal(50, 10, 500).round(1)),
+    'name': rng.choice(['Ann', 'Bob', 'Cy', None], 500),
+    'mixed': rng.choice([1, 'a', 2.5], 500),
+}, index=rng.permutation(500))
+
+
+@pytest.mark.parametrize("cond", [
+    Compare('age', '==', 30),
+    Compare('age', '==', 30.0),
+    Compare('age', '==', 30.5),
+    Compare('age', '==', 'x'),
+    Compare('age', '<', 25),
+    Compare('age', '>=', 59.5),
+    Compare('score', '<=', 50.0),
+    Compare('score', '>', 10**6),
+    Compare('name', '==', 'Bob'),
+    Compare('name', '>', 'Ann'),
+    Compare('mixed', '==', 'a'),
+    Compare('mixed', '==', 1),
+])
+def test_lookup_matches_scan(cond):
+    index = ColumnIndex(df[cond.column])
+    positions = index.lookup(cond)
+    assert list(positions) == list(np.flatnonzero(compile_condition(cond)(df)))
+
+
+def test_unanswerable_lookups():
+    # the comparisons raise or need every row: left to the scan
+    assert ColumnIndex(df['age']).lookup(Compare('age', '<', 'x')) is None
+    assert ColumnIndex(df['age']).lookup(Compare('age', '!=', 30)) is None
+    assert ColumnIndex(df['mixed']).lookup(Compare('mixed', '<', 2)) is None
+
+
+def select(interpreter, cond):
+    return interpreter.interpret(SelectStmt(('name', 'age'), 'users', (FilterClause(cond),)))
+
+
+def test_indexed_select():
+    interpreter = Interpreter()
+    interpreter.table['users'] = df
+    cond = Logical('AND', Compare('score', '>', 40), Compare('age', '==', 30))
+    expected = select(interpreter, cond)
+
+    interpreter.run_script("CREATE INDEX ON users(age)")
+    positions, rest = interpreter.indexes.lookup('users', cond)
+    assert rest == Compare('score', '>', 40)
+    pd.testing.assert_frame_equal(select(interpreter, cond), expected)
+
+
+def test_index_follows_clean_commands():
+    interpreter = Interpreter()
+    interpreter.table['users'] = df
+    interpreter.run_script("CREATE INDEX ON users(age); CREATE INDEX ON users(name)")
+    index = interpreter.indexes.get('users', 'age')
+
+    # another column changed: the index is kept
+    interpreter.run_script("NORMALIZE users score")
+    assert interpreter.indexes.get('users', 'age') is index
+
+    # rows removed, the cell changed: rebuilt on the next query
+    row = df.index[0]
+    interpreter.run_script(f"DROP ROW {df.index[1]} FROM users; REPLACE users ROW {row} COLUMN age WITH 99")
+    result = select(interpreter, Compare('age', '==', 99))
+    assert list(result.index) == [row]
+    assert interpreter.indexes.get('users', 'age') is not index
+    assert len(select(interpreter, Compare('name', '==', 'Ann'))) == (interpreter.table['users']['name'] == 'Ann').sum()
+
+    # a dropped column has no index any more
+    interpreter.run_script("DROP COLUMN name FROM users")
+    assert interpreter.indexes.get('users', 'name') is None
+
+
+def test_create_index_errors():
+    tables = {'users': df}
+    with pytest.raises(ValueError):
+        IndexCache(tables).create('users', 'age')
+    with pytest.raises(ValueError):
+        Interpreter().run_script("CREATE INDEX ON users(age)")
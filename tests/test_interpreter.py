@@ -0,0 +1,145 @@
+import pytest
+import pandas as pd
+from lib.interpreter.interpreter import Interpreter
+from lib.tables import StreamTable
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "users.csv"
+    pd.DataFrame({
+        'name': ['Rachel', 'Alice', 'Kristy', 'Peter', 'Xavier'],
+        'age': [24, 20, 24, 36, 45],
+    }).to_csv(path, index=False)
+    return path
+
+
+def test_run_script(csv_file):
+    interpreter = Interpreter()
+    report = interpreter.run_script(f"""
+        LOAD '{csv_file}' AS users;
+        SELECT name, age FROM users FILTER(age > 21) AS older;
+        DROP COLUMN age FROM older;
+        SELECT * FROM older
+    """)
+    assert [entry["statement"] for entry in report] == [
+        "LoadStmt", "SelectStmt", "DropColumn", "SelectStmt"
+    ]
+    assert all(entry["seconds"] >= 0 for entry in report)
+    # the tables returned are summarized, not kept
+    assert report[-1]["shape"] == (4, 1)
+    assert report[1]["shape"] is None
+    assert all("result" not in entry for entry in report)
+
+    report = interpreter.run_script("SELECT * FROM older", keep_results=True)
+    assert list(report[-1]["result"].columns) == ["name"]
+
+    # nothing to run
+    assert interpreter.run_script("") == []
+    assert interpreter.run_script("-- a comment only\n") == []
+
+
+def test_run_file(tmp_path, csv_file):
+    script = tmp_path / "job.dsl"
+    script.write_text(f"LOAD '{csv_file}' AS users;\nSELECT COUNT(*) FROM users;\n")
+    report = Interpreter().run_file(script, keep_results=True)
+    assert report[-1]["result"].iloc[0, 0] == 5
+
+
+def test_clean_methods_from_dsl(csv_file):
+    interpreter = Interpreter()
+    interpreter.run_script(f"""
+        LOAD '{csv_file}' AS users;
+        FILTER OUTLIERS users age WITH ZSCORE(1);
+        NORMALIZE users age WITH ZSCORE;
+    """)
+    age = interpreter.table['users']['age']
+    assert len(age) == 4
+    assert 4 not in age.index
+    assert abs(age.mean()) < 1e-6
+
+
+def test_explain(csv_file, capsys):
+    interpreter = Interpreter()
+    report = interpreter.run_script(f"""
+        LOAD '{csv_file}' AS users;
+        EXPLAIN SELECT name FROM users ORDER BY(age) FILTER(age > 21);
+    """, keep_results=True)
+    assert report[-1]["result"] == "Project [name]\n  Sort [age ASC]\n    Scan users [name, age] WHERE age > 21"
+    assert "Scan users" in capsys.readouterr().out
+
+
+def test_grouped_order_by(csv_file):
+    interpreter = Interpreter()
+    report = interpreter.run_script(f"""
+        LOAD '{csv_file}' AS users;
+        SELECT age, COUNT(*) FROM users GROUP BY(age) ORDER BY(age DESC);
+    """, keep_results=True)
+    assert list(report[-1]["result"]["age"]) == [45, 36, 24, 20]
+
+
+def test_order_by_aggregate(csv_file):
+    interpreter = Interpreter()
+    report = interpreter.run_script(f"""
+        LOAD '{csv_file}' AS users;
+        SELECT age, COUNT(*) FROM users GROUP BY(age) ORDER BY(count DESC, age) LIMIT 2;
+        SELECT age, SUM(age) FROM users GROUP BY(age) ORDER BY(sum_age DESC) LIMIT 1;
+    """, keep_results=True)
+    assert list(report[1]["result"]["age"]) == [24, 20]
+    assert list(report[2]["result"]["sum_age"]) == [48]
+
+    # a column that is neither grouped nor aggregated can't order the groups
+    with pytest.raises(ValueError):
+        interpreter.run_script("SELECT age, COUNT(*) FROM users GROUP BY(age) ORDER BY(name);")
+
+
+def test_lazy_load(csv_file):
+    interpreter = Interpreter()
+    report = interpreter.run_script(f"""
+        LOAD '{csv_file}' AS users LAZY;
+        SELECT name FROM users FILTER(age > 30);
+        SELECT COUNT(*) FROM users;
+        FILL NA users age WITH 0;
+    """, keep_results=True)
+    assert list(report[1]["result"]["name"]) == ["Peter", "Xavier"]
+    assert report[2]["result"].iloc[0, 0] == 5
+    # the clean command read the whole table
+    assert list(interpreter.table["users"].columns) == ["name", "age"]
+
+
+def test_stream_load(csv_file):
+    interpreter = Interpreter()
+    report = interpreter.run_script(f"""
+        LOAD '{csv_file}' AS users STREAM;
+        FILL NA users age WITH 0;
+        DROP COLUMN name FROM users;
+        SELECT SUM(age) FROM users FILTER(age > 21);
+    """, keep_results=True)
+    assert report[3]["result"].iloc[0, 0] == 24 + 24 + 36 + 45
+    assert isinstance(interpreter.table["users"], StreamTable)
+
+    # commands needing the whole table are rejected rather than reading it in full
+    with pytest.raises(ValueError):
+        interpreter.run_script("NORMALIZE users age;")
+
+
+def test_lazy_clean_commands(csv_file):
+    script = f"""
+        LOAD '{csv_file}' AS users;
+        FILL NA users age WITH MEAN;
+        NORMALIZE users age;
+        DROP ROW 1 FROM users;
+        FILTER OUTLIERS users age WITH ZSCORE(1.0);
+        SELECT * FROM users
+    """
+    eager = Interpreter(load_cache=False).run_script(script, keep_results=True)
+    interpreter = Interpreter(load_cache=False, lazy=True)
+    report = interpreter.run_script(script.rsplit("SELECT", 1)[0], keep_results=True)
+    # queued, not run
+    assert [entry["result"] for entry in report[1:]] == [None] * 4
+    assert len(interpreter.clean_interpreter.pending["users"]) == 4
+    assert interpreter.table["users"]["age"].tolist() == [24, 20, 24, 36, 45]
+
+    result = interpreter.interpret(interpreter.parser.parse("SELECT * FROM users;"))
+    assert not interpreter.clean_interpreter.pending
+    pd.testing.assert_frame_equal(result, eager[-1]["result"])
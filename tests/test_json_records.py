@@ -0,0 +1,115 @@
+import io
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from lib.nodes import Compare
+from lib.json_records import iter_json_array, read_json_chunks
+from lib.interpreter.interpreter import Interpreter
+from lib.readers import read_table
+
+
+records = [
+    {"name": "Rachel", "age": 24, "score": 1.5, "tags": [1, 2], "note": None},
+    {"name": 'Alice é "quoted" ]', "age": 20, "score": 2, "tags": [], "note": {"a": 1}},
+    {"name": "Kristy", "age": 36, "score": -3.25e2, "tags": [3], "note": "x"},
+]
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 7, 1 << 20])
+def test_iter_json_array(block_size):
+    text = "  \n" + json.dumps(records, indent=2)
+    assert list(iter_json_array(io.StringIO(text), block_size)) == records
+    assert list(iter_json_array(io.StringIO("[ ]"), block_size)) == []
+    assert list(iter_json_array(io.StringIO("[1, 23 ,456]"), block_size)) == [1, 23, 456]
+
+
+@pytest.mark.parametrize("text", ["[1, 2", "[1, 2,]", "[1 2]", "{\"a\": 1}", "[tru]"])
+def test_iter_json_array_invalid(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), 2))
+
+
+def write_lines(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    return str(path)
+
+
+def test_dtypes_fixed_across_chunks(tmp_path):
+    rows = [{"id": i, "value": i, "label": "a"} for i in range(4)]
+    rows += [{"id": 4, "value": 2.5, "label": 7}, {"id": 5, "value": None, "extra": True}]
+    path = write_lines(tmp_path / "rows.jsonl", rows)
+
+    chunks = list(read_json_chunks(path, chunksize=2))
+    assert [list(chunk.index) for chunk in chunks] == [[0, 1], [2, 3], [4, 5]]
+    # later chunks follow the dtypes of the first one, widened where they must be
+    assert chunks[1]['value'].dtype == np.int64
+    assert chunks[2]['value'].dtype == np.float64
+    assert chunks[2]['label'].dtype == object
+
+    df = read_table(path, chunksize=2)
+    expected = pd.read_json(path, lines=True)
+    pd.testing.assert_frame_equal(df, expected[df.columns], check_dtype=False)
+    assert list(df.columns) == ["id", "value", "label", "extra"]
+
+
+def test_json_lines_projection_and_filter(tmp_path):
+    rows = [{"name": name, "age": age, "city": "X"} for name, age in [("A", 24), ("B", 20), ("C", 36)]]
+    path = write_lines(tmp_path / "users.ndjson", rows)
+    df = read_table(path, ("name",), Compare("age", ">", 21), chunksize=1)
+    assert list(df["name"]) == ["A", "C"]
+    assert list(df.index) == [0, 2]
+
+
+def test_load_json_lines(tmp_path):
+    rows = [{"dept": d, "salary": s} for d, s in [("x", 10), ("y", 20), ("x", 30)]]
+    path = write_lines(tmp_path / "staff.jsonl", rows)
+    interpreter = Interpreter(load_cache=False)
+    report = interpreter.run_script(f"""
+        LOAD '{path}' AS staff;
+        LOAD '{path}' AS streamed STREAM;
+        SELECT dept, SUM(salary) FROM staff GROUP BY(dept);
+        SELECT dept, SUM(salary) FROM streamed GROUP BY(dept);
+    """, keep_results=True)
+    eager, streamed = report[2]["result"], report[3]["result"]
+    assert list(eager["sum_salary"]) == [40, 20]
+    pd.testing.assert_frame_equal(eager, streamed, check_dtype=False)
+
+
+def test_eager_json_load_matches_read_json(tmp_path):
+    # a whole .json file keeps pandas' conversions: dates and numeric strings
+    path = tmp_path / "scores.json"
+    path.write_text(json.dumps([
+        {"name": "a", "date": "2024-01-02", "score": "12"},
+        {"name": "b", "date": "2024-03-04", "score": "7"},
+    ]))
+    pd.testing.assert_frame_equal(read_table(str(path)), pd.read_json(path))
+
+    interpreter = Interpreter(load_cache=False)
+    report = interpreter.run_script(f"""
+        LOAD '{path}' AS scores;
+        SELECT name FROM scores FILTER(score > 10);
+    """, keep_results=True)
+    assert interpreter.table["scores"]["date"].dtype.kind == "M"
+    assert list(report[1]["result"]["name"]) == ["a"]
+
+
+@pytest.mark.parametrize("chunksize", [1, 2, 100])
+def test_chunked_json_dtypes_match_eager(tmp_path, chunksize):
+    path = tmp_path / "events.json"
+    path.write_text(json.dumps([
+        {"name": "a", "created_at": "2024-01-02", "score": "12", "price": 1.0},
+        {"name": "b", "created_at": "2024-03-04", "score": "7", "price": 2.5},
+        {"name": "c", "created_at": None, "score": "30", "price": 3.0},
+    ]))
+    eager = pd.read_json(path)
+    chunked = pd.concat(read_json_chunks(str(path), chunksize=chunksize))
+    pd.testing.assert_frame_equal(chunked, eager)
+
+    interpreter = Interpreter(load_cache=False)
+    for mode in ("", "LAZY", "STREAM"):
+        report = interpreter.run_script(f"""
+            LOAD '{path}' AS events {mode};
+            SELECT name FROM events FILTER(score > 10);
+        """, keep_results=True)
+        assert list(report[1]["result"]["name"]) == ["a", "c"]
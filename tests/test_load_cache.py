@@ -0,0 +1,128 @@
+import os
+import pandas as pd
+import pytest
+from lib.load_cache import LoadCache
+from lib.interpreter.interpreter import Interpreter
+from lib.readers import read_table
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "users.csv"
+    pd.DataFrame({'name': ['Rachel', 'Alice', 'Kristy'], 'age': [24, 20, 36]}).to_csv(path, index=False)
+    return str(path)
+
+
+def counting_reader():
+    calls = []
+    def read(file_name):
+        calls.append(file_name)
+        return read_table(file_name)
+    return read, calls
+
+
+def test_unchanged_file_is_served_from_cache(tmp_path, csv_file):
+    cache = LoadCache(str(tmp_path / "cache"))
+    read, calls = counting_reader()
+    first = cache.load(csv_file, read)
+    second = cache.load(csv_file, read)
+    pd.testing.assert_frame_equal(first, second)
+    assert first is not second
+    assert len(calls) == 1
+
+    # the cache outlives the interpreter that filled it
+    assert LoadCache(str(tmp_path / "cache")).load(csv_file, read) is not None
+    assert len(calls) == 1
+
+    info = cache.cache_info()
+    assert (info["hits"], info["misses"], info["entries"]) == (1, 1, 1)
+    assert info["bytes_saved"] == os.path.getsize(csv_file)
+
+
+def test_changed_file_or_options_miss(tmp_path, csv_file):
+    cache = LoadCache(str(tmp_path / "cache"))
+    read, calls = counting_reader()
+    cache.load(csv_file, read)
+    cache.load(csv_file, read, options=("optimize",))
+    assert len(calls) == 2
+
+    pd.DataFrame({'name': ['Peter'], 'age': [36]}).to_csv(csv_file, index=False)
+    assert list(cache.load(csv_file, read)['name']) == ['Peter']
+    assert len(calls) == 3
+
+
+def test_lru_eviction(tmp_path):
+    files = []
+    for i in range(3):
+        path = tmp_path / f"t{i}.csv"
+        pd.DataFrame({'x': range(i * 1000, i * 1000 + 1000)}).to_csv(path, index=False)
+        files.append(str(path))
+
+    cache = LoadCache(str(tmp_path / "cache"))
+    read, calls = counting_reader()
+    cache.load(files[0], read)
+    entry_size = cache.cache_info()["bytes"]
+    cache.max_bytes = 2 * entry_size + entry_size // 2
+
+    cache.load(files[1], read)
+    os.utime(cache.entry_path(files[0]), (100, 100))
+    os.utime(cache.entry_path(files[1]), (200, 200))
+    # the first file is used again, so the second one is the least recently used
+    cache.load(files[0], read)
+    cache.load(files[2], read)
+    assert cache.cache_info()["evictions"] == 1
+    assert not os.path.exists(cache.entry_path(files[1]))
+    assert os.path.exists(cache.entry_path(files[0]))
+
+
+def test_corrupt_entry_is_replaced(tmp_path, csv_file):
+    cache = LoadCache(str(tmp_path / "cache"))
+    read, calls = counting_reader()
+    cache.load(csv_file, read)
+    with open(cache.entry_path(csv_file), "wb") as f:
+        f.write(b"not a pickle")
+    assert len(cache.load(csv_file, read)) == 3
+    assert len(calls) == 2
+
+
+def test_interpreter_load_cache(tmp_path, csv_file):
+    cache = LoadCache(str(tmp_path / "cache"))
+    for _ in range(2):
+        interpreter = Interpreter(load_cache=cache)
+        interpreter.run_script(f"LOAD '{csv_file}' AS users; FILL NA users age WITH MEAN")
+    assert cache.cache_info()["hits"] == 1
+    assert Interpreter(load_cache=False).load_cache is None
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_cache_directory_is_private(tmp_path, csv_file, monkeypatch):
+    assert Interpreter().load_cache.directory == str(tmp_path / "load_cache")
+
+    cache = LoadCache(str(tmp_path / "cache"))
+    read, calls = counting_reader()
+    cache.load(csv_file, read)
+    assert os.stat(tmp_path / "cache").st_mode & 0o777 == 0o700
+
+    # entries in a directory owned by another user are never unpickled
+    uid = os.getuid()
+    monkeypatch.setattr(os, "getuid", lambda: uid + 1)
+    cache.load(csv_file, read)
+    assert len(calls) == 2 and cache.hits == 0
+
+
+def test_format_version_and_failed_writes(tmp_path, csv_file, monkeypatch):
+    cache = LoadCache(str(tmp_path / "cache"))
+    read, calls = counting_reader()
+    cache.load(csv_file, read)
+    # entries written by other readers are not served
+    monkeypatch.setattr("lib.load_cache.FORMAT_VERSION", -1)
+    cache.load(csv_file, read)
+    assert len(calls) == 2 and cache.hits == 0
+
+    # a write failing half way leaves no temporary file behind
+    def full_disk(*args, **kwargs):
+        raise OSError("No space left on device")
+    monkeypatch.setattr("lib.load_cache.pickle.dump", full_disk)
+    cache.clear()
+    assert len(cache.load(csv_file, read)) == 3
+    assert os.listdir(tmp_path / "cache") == []
@@ -1,7 +1,9 @@
+import os
 import pytest
 import pandas as pd
-from lark import Token, Tree
 from lib.interpreter.load_interpreter import LoadInterpreter
+from lib.nodes import LoadStmt, SaveStmt, Compare
+from lib.tables import LazyTable, get_table
 
 
 @pytest.fixture
@@ -10,36 +12,132 @@ def interpreter():
     return LoadInterpreter({})
 
 def test_load_csv(interpreter):
-    tree = Tree('load_stmt', [
-        Token('STRING', "'benchmark/Bank Data.csv'"),
-        Token('TABLE_NAME', 'users')
-    ])
+    stmt = LoadStmt('benchmark/Bank Data.csv', 'users')
 
-    table = interpreter.execute(tree)
+    table = interpreter.execute(stmt)
     assert "Name" in table.columns
     assert isinstance(table, pd.DataFrame)
 
 def test_load_json(interpreter):
-    tree = Tree('load_stmt', [
-        Token('STRING', "'benchmark/Students_Grading_Dataset.json'"),
-        Token('TABLE_NAME', 'students')
-    ])
-    table = interpreter.execute(tree)
+    stmt = LoadStmt('benchmark/Students_Grading_Dataset.json', 'students')
+    table = interpreter.execute(stmt)
     assert "Student_ID" in table.columns
     assert isinstance(table, pd.DataFrame)
 
 def test_load_invalid_file_format(interpreter):
-    tree = Tree('load_stmt', [
-        Token('STRING', "'benchmark/invalid_file.txt'"),
-        Token('TABLE_NAME', 'invalid_table')
-    ])
+    stmt = LoadStmt('benchmark/invalid_file.txt', 'invalid_table')
     with pytest.raises(ValueError):
-        interpreter.execute(tree)
+        interpreter.execute(stmt)
 
 def test_load_file_not_exist(interpreter):
-    tree = Tree('load_stmt', [
-        Token('STRING', "'benchmark/nonexistent.csv'"),
-        Token('TABLE_NAME', 'nonexistent_table')
-    ])
+    stmt = LoadStmt('benchmark/nonexistent.csv', 'nonexistent_table')
     with pytest.raises(FileNotFoundError):
-        interpreter.execute(tree)
\ No newline at end of file
+        interpreter.execute(stmt)
+def test_load_lazy(interpreter, tmp_path, monkeypatch):
+    path = tmp_path / "wide.csv"
+    pd.DataFrame({
+        'name': ['Rachel', 'Alice', 'Kristy'],
+        'age': [24, 20, 36],
+        'salary': [100, 200, 300],
+    }).to_csv(path, index=False)
+
+    table = interpreter.execute(LoadStmt(str(path), 'wide', 'lazy'))
+    assert isinstance(table, LazyTable)
+
+    # the file is only read on demand, with the requested columns
+    reads = []
+    read_csv = pd.read_csv
+    def spy(*args, **kwargs):
+        reads.append(kwargs.get("usecols"))
+        return read_csv(*args, **kwargs)
+    monkeypatch.setattr(pd, "read_csv", spy)
+
+    df = table.read(('name',), Compare('age', '>', 21))
+    assert list(df['name']) == ['Rachel', 'Kristy']
+    assert list(df.index) == [0, 2]
+    assert reads == [['name', 'age']]
+
+def test_lazy_table_materializes_for_clean_commands(tmp_path):
+    path = tmp_path / "users.csv"
+    pd.DataFrame({'age': [24, None, 36]}).to_csv(path, index=False)
+    tables = {'users': LazyTable(str(path))}
+    df = get_table(tables, 'users')
+    assert tables['users'] is df
+    assert len(df) == 3
+
+@pytest.mark.parametrize("extension", [".csv", ".json"])
+def test_save_and_load_text(tmp_path, extension):
+    tables = {'users': pd.DataFrame({'name': ['Rachel', 'Alice'], 'age': [24, 20]})}
+    interpreter = LoadInterpreter(tables)
+    path = str(tmp_path / f"users{extension}")
+
+    assert interpreter.execute(SaveStmt('users', path)) == path
+    loaded = interpreter.execute(LoadStmt(path, 'copy'))
+    pd.testing.assert_frame_equal(loaded, tables['users'])
+
+    with pytest.raises(ValueError):
+        interpreter.execute(SaveStmt('users', str(tmp_path / "users.txt")))
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permissions")
+def test_save_file_mode(tmp_path):
+    # a new file gets the usual mode (umask applied), a replaced one keeps its mode
+    interpreter = LoadInterpreter({'users': pd.DataFrame({'name': ['Rachel']})})
+    path = str(tmp_path / "users.csv")
+    umask = os.umask(0o022)
+    try:
+        interpreter.execute(SaveStmt('users', path))
+    finally:
+        os.umask(umask)
+    assert os.stat(path).st_mode & 0o777 == 0o644
+
+    os.chmod(path, 0o640)
+    interpreter.execute(SaveStmt('users', path))
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+@pytest.mark.parametrize("extension", [".parquet", ".feather", ".arrow"])
+def test_save_and_load_columnar(tmp_path, extension):
+    pytest.importorskip("pyarrow")
+    df = pd.DataFrame({
+        'name': ['Rachel', 'Alice', 'Kristy'],
+        'age': [24, 20, 36],
+        'salary': [1.5, None, 3.0],
+    }, index=[4, 7, 9])
+    interpreter = LoadInterpreter({'users': df})
+    path = str(tmp_path / f"users{extension}")
+    interpreter.execute(SaveStmt('users', path))
+
+    # dtypes and row labels survive the round trip
+    pd.testing.assert_frame_equal(interpreter.execute(LoadStmt(path, 'copy')), df)
+
+    lazy = interpreter.execute(LoadStmt(path, 'lazy_copy', 'lazy'))
+    pd.testing.assert_frame_equal(lazy.read(('name',), Compare('age', '>', 21)), df.loc[[4, 9], ['name']])
+
+def test_load_glob(tmp_path):
+    pd.DataFrame({'name': ['Rachel', 'Alice'], 'age': [24, 20]}).to_csv(tmp_path / "2026-01.csv", index=False)
+    pd.DataFrame({'name': ['Kristy'], 'salary': [1.5]}).to_csv(tmp_path / "2026-02.csv", index=False)
+    pd.DataFrame({'name': ['Bob']}).to_csv(tmp_path / "2025-12.csv", index=False)
+    interpreter = LoadInterpreter({})
+
+    df = interpreter.execute(LoadStmt(str(tmp_path / "2026-*.csv"), 'users', source="file"))
+    # the union of the shards' columns, missing values are NA
+    assert list(df.columns) == ['name', 'age', 'salary', 'file']
+    assert list(df.index) == [0, 1, 2]
+    assert df['name'].tolist() == ['Rachel', 'Alice', 'Kristy']
+    assert df['age'].isna().tolist() == [False, False, True]
+    assert df['file'].tolist() == [str(tmp_path / "2026-01.csv")] * 2 + [str(tmp_path / "2026-02.csv")]
+
+    assert 'file' not in interpreter.execute(LoadStmt(str(tmp_path / "*.csv"), 'all')).columns
+    with pytest.raises(ValueError):
+        interpreter.execute(LoadStmt(str(tmp_path / "2026-*.csv"), 'users', source="name"))
+    with pytest.raises(ValueError):
+        interpreter.execute(LoadStmt(str(tmp_path / "2026-*.csv"), 'users', 'lazy'))
+    with pytest.raises(FileNotFoundError):
+        interpreter.execute(LoadStmt(str(tmp_path / "2027-*.csv"), 'users'))
+
+def test_load_file_named_like_pattern(tmp_path):
+    # an existing file is loaded as it is, even when its name holds glob characters
+    path = str(tmp_path / "data[1].csv")
+    pd.DataFrame({'name': ['Rachel'], 'age': [24]}).to_csv(path, index=False)
+    interpreter = LoadInterpreter({})
+    assert interpreter.execute(LoadStmt(path, 'users'))['name'].tolist() == ['Rachel']
+    assert isinstance(interpreter.execute(LoadStmt(path, 'lazy_users', 'lazy')), LazyTable)
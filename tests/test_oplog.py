@@ -0,0 +1,120 @@
+import pytest
+import pandas as pd
+from lib.interpreter.interpreter import Interpreter
+from lib.optimize import optimize_dtypes
+from lib.oplog import DEFAULT_LIMIT
+from lib.nodes import (
+    Undo, Redo, FillNA, DropNA, CleanNumeric, CleanNonNumeric, DropRow, DropColumn, ReplaceCell,
+    FilterOutliers, Normalize, LoadStmt,
+)
+
+df_users = pd.DataFrame({
+    'name': ['Rachel', 'Alice', 'Kristy', 'Peter', 'Xavier', 'Bob'],
+    'age': ['24', '20', 'x', '36', None, '41'],
+    'salary': [1000.0, None, 75000.0, 56000.0, 88000.0, 1000000.0],
+    'job': ['dev', 'dev', 'doctor', 'dev', 'teacher', 'dev'],
+}, index=[10, 11, 12, 13, 14, 15])
+
+commands = [
+    CleanNumeric('users', ('age',)),
+    FillNA('users', 'salary', 'median'),
+    ReplaceCell('users', 13, 'job', 'pilot'),
+    ReplaceCell('users', 10, 'bonus', 5),
+    Normalize('users', 'salary'),
+    DropRow('users', 11),
+    DropColumn('users', 'bonus'),
+    FilterOutliers('users', 'age', 'zscore', 1.0),
+    CleanNonNumeric('users', ('name',)),
+    DropNA('users', 0, 'any', ('salary',)),
+]
+
+
+def run(interpreter, df):
+    # the table and its column versions after every command
+    interpreter.table['users'] = df
+    states = [(interpreter.table['users'], dict(interpreter.table.versions['users']))]
+    for cmd in commands:
+        interpreter.interpret(cmd)
+        states.append((interpreter.table['users'], dict(interpreter.table.versions['users'])))
+    return states
+
+
+def assert_state(interpreter, state):
+    pd.testing.assert_frame_equal(interpreter.table['users'], state[0])
+    assert interpreter.table.versions['users'] == state[1]
+
+
+@pytest.mark.parametrize("optimize", [False, True])
+def test_undo_redo_every_command(optimize):
+    interpreter = Interpreter(load_cache=False, history=DEFAULT_LIMIT)
+    df = optimize_dtypes(df_users)[0] if optimize else df_users
+    states = run(interpreter, df)
+
+    for i in reversed(range(len(commands))):
+        assert interpreter.interpret(Undo()) == 1
+        assert_state(interpreter, states[i])
+    assert interpreter.interpret(Undo()) == 0
+
+    for i in range(1, len(commands) + 1):
+        assert interpreter.interpret(Redo()) == 1
+        assert_state(interpreter, states[i])
+    assert interpreter.interpret(Redo()) == 0
+
+    assert interpreter.interpret(Undo(4)) == 4
+    assert_state(interpreter, states[-5])
+
+
+def test_compact_deltas():
+    interpreter = Interpreter(load_cache=False, history=DEFAULT_LIMIT)
+    run(interpreter, df_users)
+    done = interpreter.log.done
+    # DROP ROW stores one row, REPLACE one value, FILL NA the previous column
+    assert len(done[5].rows[2]) == 1 and done[5].rows[1].tolist() == [1]
+    assert done[2].cell[2:4] == ('dev', 'pilot') and not done[2].before_columns
+    assert list(done[1].before_columns) == ['salary'] and done[1].rows is None
+    assert all(change.tables is None for change in done)
+
+
+def test_new_command_clears_redo():
+    interpreter = Interpreter(load_cache=False, history=DEFAULT_LIMIT)
+    states = run(interpreter, df_users)
+    interpreter.interpret(Undo(2))
+    interpreter.interpret(FillNA('users', 'salary', 'value', 0.0))
+    assert interpreter.interpret(Redo()) == 0
+    interpreter.interpret(Undo())
+    assert_state(interpreter, states[-3])
+
+
+def test_undo_after_table_replaced(tmp_path):
+    path = tmp_path / "users.csv"
+    df_users.to_csv(path, index=False)
+    interpreter = Interpreter(load_cache=False, history=DEFAULT_LIMIT)
+    interpreter.interpret(LoadStmt(str(path), 'users'))
+    interpreter.interpret(DropRow('users', 0))
+    interpreter.interpret(LoadStmt(str(path), 'users'))
+    with pytest.raises(ValueError):
+        interpreter.interpret(Undo())
+
+
+def test_undo_lazy_and_from_dsl():
+    interpreter = Interpreter(load_cache=False, lazy=True, history=DEFAULT_LIMIT)
+    interpreter.table['users'] = df_users
+    report = interpreter.run_script("""
+        CLEAN NUMERIC users age REMOVE STRINGS;
+        NORMALIZE users age;
+        DROP ROW 10 FROM users;
+        UNDO 2;
+        SELECT * FROM users;
+        REDO;
+        SELECT * FROM users;
+    """, keep_results=True)
+    # the first two commands are fused, and undone as one operation
+    assert report[3]["result"] == 2
+    pd.testing.assert_frame_equal(report[4]["result"], df_users)
+    assert report[5]["result"] == 1
+    # the fused run is redone, the dropped row is not
+    assert list(report[6]["result"]['age']) == pytest.approx([4 / 21, 0.0, 16 / 21, 1.0])
+
+    # no history unless one is asked for
+    with pytest.raises(ValueError):
+        Interpreter(load_cache=False).interpret(Undo())
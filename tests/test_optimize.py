@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+from lib.optimize import optimize_dtypes
+from lib.interpreter.interpreter import Interpreter
+
+
+n = 1000
+df = pd.DataFrame({
+    'small': np.arange(n) % 100 - 50,
+    'medium': np.arange(n) * 30,
+    'large': np.arange(n) * 2 ** 40,
+    'halves': np.where(np.arange(n) % 7 == 0, np.nan, np.arange(n) / 2),
+    'decimals': np.arange(n) / 10,
+    'grade': np.array(['A', 'B', 'C', None])[np.arange(n) % 4],
+    'email': [f"user{i}@example.com" for i in range(n)],
+    'mixed': [1, 'a'] * (n // 2),
+})
+
+
+def test_optimize_dtypes():
+    optimized, report = optimize_dtypes(df, sample_size=100)
+    assert dict(optimized.dtypes.astype(str)) == {
+        'small': 'int8', 'medium': 'int16', 'large': 'int64',
+        'halves': 'float32', 'decimals': 'float64',
+        'grade': 'category', 'email': 'object', 'mixed': 'object',
+    }
+    # the values are unchanged
+    pd.testing.assert_frame_equal(optimized, df, check_dtype=False, check_categorical=False)
+    assert optimized['grade'].isna().sum() == n // 4
+
+    assert list(report.columns) == ['dtype_before', 'dtype_after', 'bytes_before', 'bytes_after']
+    assert report.loc['small', 'bytes_after'] * 8 == report.loc['small', 'bytes_before']
+    assert report.loc['grade', 'bytes_after'] < report.loc['grade', 'bytes_before'] / 10
+    assert (report.loc['email', 'bytes_before'] == report.loc['email', 'bytes_after'])
+
+
+def test_commands_on_optimized_table(tmp_path):
+    path = tmp_path / "users.csv"
+    pd.DataFrame({
+        'score': [-100, 100, 90, -90, 100],
+        'grade': ['A', 'B', None, 'C', 'A'],
+    }).to_csv(path, index=False)
+    interpreter = Interpreter(load_cache=False)
+    report = interpreter.run_script(f"""
+        LOAD '{path}' AS users OPTIMIZE;
+        SELECT grade, SUM(score) FROM users GROUP BY(grade);
+        SELECT score FROM users FILTER(grade > 'A');
+        FILL NA users grade WITH 'none';
+        REPLACE users ROW 0 COLUMN grade WITH 'Z';
+        NORMALIZE users score;
+    """, keep_results=True)
+    users = interpreter.table['users']
+    assert interpreter.load_interpreter.memory_reports['users'].loc['score', 'dtype_after'] == 'int8'
+    # sums don't overflow the small integer type
+    assert list(report[1]["result"]["sum_score"]) == [0, 100, -90]
+    # categories compare like the strings they stand for
+    assert list(report[2]["result"]["score"]) == [100, -90]
+    assert list(users['grade']) == ['Z', 'B', 'none', 'C', 'A']
+    assert list(users['score']) == [0.0, 1.0, 0.95, 0.05, 1.0]
+
+
+def test_new_category_keeps_lexical_order(tmp_path):
+    path = tmp_path / "users.csv"
+    pd.DataFrame({
+        'gender': ['Male', None, 'Female', 'Male'] * 25,
+        'score': np.arange(100),
+    }).to_csv(path, index=False)
+    interpreter = Interpreter(load_cache=False)
+    report = interpreter.run_script(f"""
+        LOAD '{path}' AS users OPTIMIZE;
+        FILL NA users gender WITH 'Agender';
+        SELECT gender, score FROM users ORDER BY(gender, score) LIMIT 3;
+        SELECT gender, COUNT(*) FROM users GROUP BY(gender);
+        REPLACE users ROW 0 COLUMN gender WITH 5;
+    """, keep_results=True)
+    assert list(report[2]["result"]["gender"]) == ['Agender', 'Agender', 'Agender']
+    assert list(report[3]["result"]["gender"]) == ['Agender', 'Female', 'Male']
+    # a value that doesn't sort with the strings: the column becomes plain objects
+    gender = interpreter.table['users']['gender']
+    assert gender.dtype == object
+    assert list(gender[:4]) == [5, 'Agender', 'Female', 'Male']
+
+
+def test_optimize_needs_eager_load(tmp_path):
+    path = tmp_path / "users.csv"
+    pd.DataFrame({'score': [1]}).to_csv(path, index=False)
+    with pytest.raises(ValueError):
+        Interpreter(load_cache=False).run_script(f"LOAD '{path}' AS users LAZY OPTIMIZE")
@@ -1,19 +1,35 @@
 import pytest
-from lib.parser import Parser
+import os
+from lib.parser import Parser, get_parser, build_lark, grammar_cache_path
 from lark.exceptions import UnexpectedInput
+from lib.nodes import (
+    LoadStmt, SaveStmt, SelectStmt, AggExpr, Compare, Logical, FilterClause, GroupByClause,
+    OrderByClause, LimitClause, CreateIndex, Snapshot, Restore, ShowSnapshots, FillNA, DropNA,
+    CleanNumeric, FilterOutliers, Normalize, PlotCmd,
+)
 
 def nice_print(dsl_code, tree):
     print("\nDSL Code:")
     print(dsl_code)
     print("\nParsed AST:")
-    print(tree.pretty())
+    print(tree)
 
 parser = Parser()
 def test_load():
     dsl_code = "LOAD 'data.csv' AS users;"
     tree = parser.parse(dsl_code)
-    expected_ast = "load_stmt\n  'data.csv'\n  users"
-    assert tree.pretty().strip() == expected_ast.strip()
+    assert tree == LoadStmt("data.csv", "users")
+
+def test_load_options():
+    assert parser.parse("LOAD 'data.csv' AS users OPTIMIZE;") == LoadStmt("data.csv", "users", "eager", True)
+    assert parser.parse("LOAD 'data.csv' AS users lazy;") == LoadStmt("data.csv", "users", "lazy")
+    assert parser.parse("LOAD 'data/2026-*.csv' AS users WITH SOURCE;") == \
+        LoadStmt("data/2026-*.csv", "users", source="source_file")
+    assert parser.parse("LOAD 'data/*.csv' AS users OPTIMIZE WITH SOURCE shard;") == \
+        LoadStmt("data/*.csv", "users", "eager", True, "shard")
+
+def test_save():
+    assert parser.parse("SAVE users TO 'out/users.parquet';") == SaveStmt("users", "out/users.parquet")
 
 def test_select_with_filter():
     dsl_code = "SELECT name FROM users FILTER(age > 18 AND age < 30);"
@@ -79,6 +95,44 @@ def test_complex_query():
     """
     tree = parser.parse(dsl_code)
     nice_print(dsl_code, tree)
+    assert tree == SelectStmt(("name", AggExpr("COUNT", "*")), "users", (
+        FilterClause(Logical("AND", Compare("age", ">", 18), Compare("age", "<", 30))),
+        GroupByClause(("age",)),
+        OrderByClause((("age", False),)),
+    ))
+
+def test_limit():
+    assert parser.parse("SELECT name FROM users ORDER BY(age DESC) LIMIT 10;") == SelectStmt(
+        ("name",), "users", (OrderByClause((("age", False),)), LimitClause(10)),
+    )
+    # LIMIT ends the query
+    with pytest.raises(UnexpectedInput):
+        parser.parse("SELECT name FROM users LIMIT 10 ORDER BY(age);")
+
+def test_create_index():
+    assert parser.parse("CREATE INDEX ON users(age);") == CreateIndex("users", "age")
+
+def test_snapshots():
+    assert parser.parse("SNAPSHOT users AS users_v1;") == Snapshot("users", "users_v1")
+    assert parser.parse("RESTORE users FROM users_v1;") == Restore("users", "users_v1")
+    assert parser.parse("SHOW SNAPSHOTS;") == ShowSnapshots()
+
+def test_clean_commands():
+    assert parser.parse("FILL NA users age WITH MEDIAN;") == FillNA("users", "age", "median")
+    assert parser.parse("FILL NA users job WITH 'none';") == FillNA("users", "job", "value", "none")
+    assert parser.parse("DROP NA users ROW WHERE ALL IN (age, job);") == DropNA("users", 0, "all", ("age", "job"))
+    assert parser.parse("FILTER OUTLIERS users age WITH ZSCORE(2.5);") == FilterOutliers("users", "age", "zscore", 2.5)
+    assert parser.parse("FILTER OUTLIERS users age WITH IQR APPROX;") == FilterOutliers("users", "age", approx=True)
+    assert parser.parse("FILTER OUTLIERS users age APPROX;") == FilterOutliers("users", "age", approx=True)
+    assert parser.parse("FILL NA users age WITH MODE APPROX;") == FillNA("users", "age", "mode", approx=True)
+    assert parser.parse("NORMALIZE users age WITH ZSCORE;") == Normalize("users", "age", "zscore")
+    assert parser.parse("CLEAN NUMERIC users age REMOVE STRINGS;") == CleanNumeric("users", ("age",))
+    assert parser.parse("CLEAN NUMERIC users (age, income) STRIP STRINGS;") == \
+        CleanNumeric("users", ("age", "income"), strip=True)
+    assert parser.parse("CLEAN NUMERIC users STRIP STRINGS;") == CleanNumeric("users", None, strip=True)
+
+def test_plot():
+    assert parser.parse("PLOT (age, salary) FROM users AS SCATTER;") == PlotCmd(("age", "salary"), "users", "SCATTER")
 
 def test_invalid_syntax():
     # test missing quotes
@@ -96,3 +150,77 @@ def test_invalid_syntax():
     # test invalid aggregate function
     with pytest.raises(UnexpectedInput):
         parser.parse("SELECT INVALID_FUNC(*) FROM users;")
+
+def test_parse_program():
+    script = """
+    -- load and query in one pass
+    LOAD 'data.csv' AS users;
+    SELECT name FROM users FILTER(age > 18) AS adults;
+    FILTER OUTLIERS adults age
+    """
+    statements = parser.parse_program(script)
+    assert [type(stmt).__name__ for stmt in statements] == ["LoadStmt", "SelectStmt", "FilterOutliers"]
+
+def test_parse_program_invalid_statement():
+    with pytest.raises(UnexpectedInput):
+        parser.parse_program("LOAD 'data.csv' AS users; SELECT FROM users;")
+
+def test_parsers_share_compiled_grammar():
+    assert Parser().parser is parser.parser
+    assert get_parser() is get_parser()
+
+def test_grammar_cache(tmp_path):
+    # the first build writes the serialized tables, the second one loads them
+    build_lark(str(tmp_path))
+    assert os.path.isfile(grammar_cache_path(str(tmp_path)))
+    cached = build_lark(str(tmp_path))
+    assert cached.parse("LOAD 'data.csv' AS users;", start="start") == LoadStmt("data.csv", "users")
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_grammar_cache_directory_is_private(tmp_path, monkeypatch):
+    # a shared directory is made private, one of another user is never read
+    cache_dir = tmp_path / "parser"
+    cache_dir.mkdir(mode=0o777)
+    os.chmod(cache_dir, 0o777)
+    build_lark(str(cache_dir))
+    assert os.stat(cache_dir).st_mode & 0o777 == 0o700
+
+    other = tmp_path / "other"
+    other.mkdir()
+    uid = os.getuid()
+    monkeypatch.setattr(os, "getuid", lambda: uid + 1)
+    lark_parser = build_lark(str(other))
+    assert not os.listdir(other)
+    assert lark_parser.parse("LOAD 'data.csv' AS users;", start="start") == LoadStmt("data.csv", "users")
+
+def test_parse_cache():
+    cached_parser = Parser(cache_size=2)
+    first = cached_parser.parse("SELECT name FROM users FILTER(name == 'A  B');")
+    # whitespace and the trailing ';' don't matter, string literals do
+    assert cached_parser.parse("SELECT  name\n FROM users FILTER(name == 'A  B')") is first
+    assert cached_parser.parse("SELECT name FROM users FILTER(name == 'A B');") is not first
+    assert cached_parser.cache_info() == {"hits": 1, "misses": 2, "size": 2, "max_size": 2}
+
+    # the least recently used entry is evicted
+    cached_parser.parse("SELECT * FROM users;")
+    cached_parser.parse("SELECT name FROM users FILTER(name == 'A  B');")
+    assert cached_parser.cache_info()["misses"] == 4
+
+def test_parse_cache_key_keeps_comments_and_keywords_apart():
+    cached_parser = Parser()
+    filtered = cached_parser.parse("SELECT * FROM t -- note\nFILTER(a > 1)")
+    assert filtered.clauses
+    # the FILTER is part of the comment here
+    unfiltered = cached_parser.parse("SELECT * FROM t -- note FILTER(a > 1)")
+    assert unfiltered is not filtered and not unfiltered.clauses
+    assert cached_parser.parse("SELECT * FROM t\n-- other note\nFILTER(a > 1)") is filtered
+
+    cached_parser.parse("SELECT g FROM t GROUP BY (g)")
+    with pytest.raises(UnexpectedInput):
+        cached_parser.parse("SELECT g FROM t GROUP  BY (g)")
+
+def test_cached_nodes_are_immutable():
+    tree = parser.parse("SELECT name FROM users GROUP BY(name);")
+    with pytest.raises(AttributeError):
+        tree.table = "other"
+    assert isinstance(tree.clauses, tuple)
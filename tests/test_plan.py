@@ -0,0 +1,62 @@
+import pytest
+from lib.parser import Parser
+from lib.nodes import Compare, Logical
+from lib.plan import Scan, Project, Aggregate, Sort, Limit, TopK, build_plan, optimize, explain
+
+parser = Parser()
+
+def plan_of(dsl):
+    return optimize(build_plan(parser.parse(dsl)))
+
+
+def test_projection_pushdown():
+    plan = plan_of("SELECT name FROM users FILTER(age > 18) ORDER BY(salary DESC);")
+    assert plan == Project(
+        Sort(Scan("users", ("name", "salary"), Compare("age", ">", 18)), (("salary", False),)),
+        ("name",),
+    )
+
+
+def test_filter_before_sort_and_merge():
+    plan = plan_of("SELECT * FROM users ORDER BY(age) FILTER(age > 18) FILTER(name != 'Bob');")
+    assert plan == Sort(
+        Scan("users", None, Logical("AND", Compare("age", ">", 18), Compare("name", "!=", "Bob"))),
+        (("age", True),),
+    )
+
+
+def test_sort_moves_above_aggregate():
+    plan = plan_of("SELECT age, COUNT(*) FROM users ORDER BY(age DESC) GROUP BY(age);")
+    assert isinstance(plan, Sort)
+    assert isinstance(plan.child, Aggregate)
+    assert plan.child.child == Scan("users", ("age",))
+
+    plan = plan_of("SELECT age, SUM(salary) FROM users GROUP BY(age) ORDER BY(sum_salary DESC) LIMIT 1;")
+    assert plan == TopK(Aggregate(Scan("users", ("age", "salary")), ("age",), plan.child.aggregates),
+                        (("sum_salary", False),), 1)
+    with pytest.raises(ValueError):
+        build_plan(parser.parse("SELECT age, SUM(salary) FROM users GROUP BY(age) ORDER BY(salary DESC);"))
+
+
+def test_limit_becomes_topk():
+    plan = plan_of("SELECT name FROM users ORDER BY(score DESC) LIMIT 50;")
+    assert plan == Project(TopK(Scan("users", ("name", "score")), (("score", False),), 50), ("name",))
+
+    plan = plan_of("SELECT age, COUNT(*) FROM users GROUP BY(age) ORDER BY(age) LIMIT 3;")
+    assert isinstance(plan, TopK) and isinstance(plan.child, Aggregate)
+
+    # without ORDER BY the first rows are kept as they are
+    assert plan_of("SELECT * FROM users LIMIT 5;") == Limit(Scan("users"), 5)
+
+
+def test_explain():
+    text = explain(plan_of("SELECT name FROM users FILTER(age > 18 AND name == 'x');"))
+    assert text == (
+        "Project [name]\n"
+        "  Scan users [name] WHERE (age > 18 AND name == 'x')"
+    )
+
+
+def test_invalid_group_by():
+    with pytest.raises(ValueError):
+        build_plan(parser.parse("SELECT name FROM users GROUP BY(age);"))
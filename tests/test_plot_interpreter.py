@@ -1,8 +1,8 @@
 import pytest
 import pandas as pd
 import matplotlib.pyplot as plt
-from lark import Tree, Token
 from lib.interpreter.plot_interpreter import PlotInterpreter
+from lib.nodes import PlotCmd
 
 @pytest.fixture
 def sample_table():
@@ -18,51 +18,29 @@ def test_histogram_plot(monkeypatch, sample_table):
     # monkeypatch to prevent plt.show() from displaying the plot
     monkeypatch.setattr(plt, "show", lambda: None)
     interpreter = PlotInterpreter(sample_table)
-    tree = Tree('plot_cmd', [
-        Token('COL_NAME', 'age'),
-        Token('TABLE_NAME', 'people'),
-        Token('PLOT_TYPE', 'HISTOGRAM')
-    ])
-    interpreter.execute(tree)
+    cmd = PlotCmd(('age',), 'people', 'HISTOGRAM')
+    interpreter.execute(cmd)
 
 def test_scatter_plot(monkeypatch, sample_table):
     monkeypatch.setattr(plt, "show", lambda: None)
     interpreter = PlotInterpreter(sample_table)
-    tree = Tree('plot_cmd', [
-        Token('COL_NAME', 'height'),
-        Token('COL_NAME', 'weight'),
-        Token('TABLE_NAME', 'people'),
-        Token('PLOT_TYPE', 'SCATTER')
-    ])
-    interpreter.execute(tree)
+    cmd = PlotCmd(('height', 'weight'), 'people', 'SCATTER')
+    interpreter.execute(cmd)
 
 def test_box_plot(monkeypatch, sample_table):
     monkeypatch.setattr(plt, "show", lambda: None)
     interpreter = PlotInterpreter(sample_table)
-    tree = Tree('plot_cmd', [
-        Token('COL_NAME', 'height'),
-        Token('TABLE_NAME', 'people'),
-        Token('PLOT_TYPE', 'BOX')
-    ])
-    interpreter.execute(tree)
+    cmd = PlotCmd(('height',), 'people', 'BOX')
+    interpreter.execute(cmd)
 
 def test_line_plot_two_columns(monkeypatch, sample_table):
     monkeypatch.setattr(plt, "show", lambda: None)
     interpreter = PlotInterpreter(sample_table)
-    tree = Tree('plot_cmd', [
-        Token('COL_NAME', 'age'),
-        Token('COL_NAME', 'weight'),
-        Token('TABLE_NAME', 'people'),
-        Token('PLOT_TYPE', 'LINE')
-    ])
-    interpreter.execute(tree)
+    cmd = PlotCmd(('age', 'weight'), 'people', 'LINE')
+    interpreter.execute(cmd)
 
 def test_bar_plot(monkeypatch, sample_table):
     monkeypatch.setattr(plt, "show", lambda: None)
     interpreter = PlotInterpreter(sample_table)
-    tree = Tree('plot_cmd', [
-        Token('COL_NAME', 'category'),
-        Token('TABLE_NAME', 'people'),
-        Token('PLOT_TYPE', 'BAR')
-    ])
-    interpreter.execute(tree)
\ No newline at end of file
+    cmd = PlotCmd(('category',), 'people', 'BAR')
+    interpreter.execute(cmd)
\ No newline at end of file
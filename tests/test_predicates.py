@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+from lib.nodes import Compare, Logical, Not
+from lib.predicates import compile_condition
+
+
+df = pd.DataFrame({
+    'age': [24, 20, None, 36, 45, 19, 30, 52],
+    'name': ["O'Neil", 'Alice', 'Kristy', 'Peter', 'Xavier', 'Bob', 'Carol', 'Dan'],
+})
+
+
+def test_compare_with_quotes_and_missing_values():
+    assert compile_condition(Compare('name', '==', "O'Neil"))(df).tolist() == [True] + [False] * 7
+    # NaN never satisfies a comparison, as in df.query
+    assert not compile_condition(Compare('age', '>', 0))(df)[2]
+
+
+def test_short_circuit_matches_full_evaluation():
+    # 'name == Alice' is selective, so the right side only sees one row
+    selective = Logical('AND', Compare('name', '==', 'Alice'), Compare('age', '<', 30))
+    broad = Logical('OR', Compare('age', '>', 0), Not(Compare('name', '!=', 'Bob')))
+    for cond in (selective, broad, Not(selective)):
+        expected = df.eval(_as_query(cond)).to_numpy(dtype=bool)
+        assert np.array_equal(compile_condition(cond)(df), expected)
+
+
+def _as_query(cond):
+    if isinstance(cond, Compare):
+        return f"{cond.column} {cond.op} {cond.value!r}"
+    if isinstance(cond, Logical):
+        op = "&" if cond.op == "AND" else "|"
+        return f"({_as_query(cond.left)}) {op} ({_as_query(cond.right)})"
+    return f"~({_as_query(cond.operand)})"
@@ -1,7 +1,10 @@
 import pytest
 import pandas as pd
-from lark import Tree, Token
 from lib.interpreter.interpreter import SelectInterpreter
+from lib.tables import StreamTable
+from lib.nodes import (
+    SelectStmt, AggExpr, Compare, Logical, Not, FilterClause, GroupByClause, OrderByClause, LimitClause,
+)
 
 
 # test with user-defined data
@@ -23,49 +26,29 @@ def select_interpreter():
 Test Select Queries
 """
 def test_select_with_all_columns(select_interpreter):
-    tree = Tree('select_stmt', [
-        Tree('select_columns', [Token('STAR', '*')]),
-        Tree('from_clause', [Token('TABLE_NAME', 'users')])
-    ])
-    result_df = select_interpreter.execute(tree)
+    stmt = SelectStmt('*', 'users')
+    result_df = select_interpreter.execute(stmt)
     assert result_df.shape == df_users.shape  
     assert result_df.equals(df_users)  
 
 
 def test_select_with_single_column(select_interpreter):
-    tree = Tree('select_stmt', [
-        Tree('select_columns', [Tree('select_column', [Token('COL_NAME', 'name')])]),
-        Tree('from_clause', [Token('TABLE_NAME', 'users')])
-    ])
-    result_df = select_interpreter.execute(tree)
+    stmt = SelectStmt(('name',), 'users')
+    result_df = select_interpreter.execute(stmt)
     assert list(result_df.columns) == ["name"]
     assert "Rachel" in result_df["name"].values
 
 
 def test_select_with_multiple_columns(select_interpreter):
-    tree = Tree('select_stmt', [
-        Tree('select_columns', [
-            Tree('select_column', [Token('COL_NAME', 'name')]),
-            Tree('select_column', [Token('COL_NAME', 'age')])
-        ]),
-        Tree('from_clause', [Token('TABLE_NAME', 'users')])
-    ])
-    result_df = select_interpreter.execute(tree)
+    stmt = SelectStmt(('name', 'age'), 'users')
+    result_df = select_interpreter.execute(stmt)
     assert list(result_df.columns) == ["name", "age"]
     assert "Rachel" in result_df["name"].values
 
 
 def test_select_with_agg(select_interpreter):
-    tree = Tree('select_stmt', [
-        Tree('select_columns', [
-            Tree('agg_expr', [
-                Tree('sum', []),
-                Tree('agg_param', [Token('COL_NAME', 'salary')])
-            ])
-        ]),
-        Tree('from_clause', [Token('TABLE_NAME', 'users')])
-    ])
-    result_df = select_interpreter.execute(tree)
+    stmt = SelectStmt((AggExpr('SUM', 'salary'),), 'users')
+    result_df = select_interpreter.execute(stmt)
     # print(result_df)
     assert result_df.iloc[0, 0] == df_users["salary"].sum()
 
@@ -75,186 +58,89 @@ def test_select_with_agg(select_interpreter):
 Test Filter Queries
 """
 def test_select_with_filter(select_interpreter):
-    tree = Tree('select_stmt', [
-        Tree('select_columns', [Tree('select_column', [Token('COL_NAME', 'name')])]),
-        Tree('from_clause', [
-            Token('TABLE_NAME', 'users'),
-                Tree('filter_clause', [
-                    Tree('condition', [
-                        Tree('simple_condition', [
-                            Token('COL_NAME', 'age'),
-                            Token('OP', '>'),
-                            Token('NUMBER', '18')
-                        ])
-                    ])
-                ])
-        ])
-    ])
-
-    result_df = select_interpreter.execute(tree)
+    stmt = SelectStmt(('name',), 'users', (
+        FilterClause(Compare('age', '>', 18)),
+    ))
+
+    result_df = select_interpreter.execute(stmt)
     assert list(result_df.columns) == ["name"]
     assert "Rachel" in result_df["name"].values
 
 
 def test_select_with_filter_not(select_interpreter):
-    tree = Tree('select_stmt', [
-        Tree('select_columns', [Tree('select_column', [Token('COL_NAME', 'name')])]),
-        Tree('from_clause', [
-            Token('TABLE_NAME', 'users'),
-                Tree('filter_clause', [
-                    Tree('condition', [
-                        Tree('not', [
-                            Tree('simple_condition', [
-                                Token('COL_NAME', 'age'),
-                                Token('OP', '>='),
-                                Token('NUMBER', '30')
-                            ])
-                        ])
-                    ])
-                ])
-        ])
-    ])
-    result_df = select_interpreter.execute(tree)
+    stmt = SelectStmt(('name',), 'users', (
+        FilterClause(Not(Compare('age', '>=', 30))),
+    ))
+    result_df = select_interpreter.execute(stmt)
     assert list(result_df.columns) == ["name"]
     assert set(result_df["name"].values) == {"Rachel", "Alice", "Kristy"}
 
 
 
 def test_select_with_multiple_filter(select_interpreter):
-    tree = Tree('select_stmt', [
-        Tree('select_columns', [Tree('select_column', [Token('COL_NAME', 'name')])]),
-        Tree('from_clause', [
-            Token('TABLE_NAME', 'users'),
-                Tree('filter_clause', [
-                    Tree('condition', [
-                        Tree('logical_condition', [
-                            Tree('simple_condition', [
-                                Token('COL_NAME', 'age'),
-                                Token('OP', '>'),
-                                Token('NUMBER', '18')
-                            ]),
-                            Token('LOP', 'AND'),
-                            Tree('simple_condition', [
-                                Token('COL_NAME', 'age'),
-                                Token('OP', '<'),
-                                Token('NUMBER', '30')
-                            ])
-                        ])
-                    ])
-                ])
-        ])
-    ])
-    result_df = select_interpreter.execute(tree)
+    stmt = SelectStmt(('name',), 'users', (
+        FilterClause(Logical('AND', Compare('age', '>', 18), Compare('age', '<', 30))),
+    ))
+    result_df = select_interpreter.execute(stmt)
     assert list(result_df.columns) == ["name"]
     assert "Rachel" in result_df["name"].values
     assert "Alice" in result_df["name"].values
     assert "Peter" not in result_df["name"].values
 
-    tree2 = Tree('select_stmt', [
-        Tree('select_columns', [Tree('select_column', [Token('COL_NAME', 'name')])]),
-        Tree('from_clause', [
-            Token('TABLE_NAME', 'users'),
-            Tree('filter_clause', [
-                Tree('logical_condition', [
-                    Tree('simple_condition', [
-                        Token('COL_NAME', 'age'),
-                        Token('OP', '<'),
-                        Token('NUMBER', '24')
-                    ]),
-                    Token('LOP', 'OR'),
-                    Tree('simple_condition', [
-                        Token('COL_NAME', 'age'),
-                        Token('OP', '>'),
-                        Token('NUMBER', '36')
-                    ])
-                ])
-            ])
-        ])
-    ])  
-    result_df2 = select_interpreter.execute(tree2)
+    stmt2 = SelectStmt(('name',), 'users', (
+        FilterClause(Logical('OR', Compare('age', '<', 24), Compare('age', '>', 36))),
+    ))
+    result_df2 = select_interpreter.execute(stmt2)
     assert list(result_df2.columns) == ["name"]
 
     assert "Xavier" in result_df2["name"].values
     assert "Rachel" not in result_df2["name"].values
 
 def test_select_with_compound_filter(select_interpreter):
-    tree = Tree('select_stmt', [
-        Tree('select_columns', [
-            Tree('select_column', [Token('COL_NAME', 'name')])
-        ]),
-        Tree('from_clause', [
-            Token('TABLE_NAME', 'users'),
-                Tree('filter_clause', [
-                    Tree('condition', [
-                        Tree('not', [
-                            Tree('logical_condition', [
-                                Tree('simple_condition', [
-                                    Token('COL_NAME', 'age'),
-                                    Token('OP', '>'),
-                                    Token('NUMBER', '18')
-                                ]),
-                                Token('LOP', 'AND'),
-                                Tree('simple_condition', [
-                                    Token('COL_NAME', 'age'),
-                                    Token('OP', '<'),
-                                    Token('NUMBER', '30')
-                                ])
-                            ])
-                        ])
-                    ])
-                ])
-        ])
-    ])
-    result_df = select_interpreter.execute(tree)
+    stmt = SelectStmt(('name',), 'users', (
+        FilterClause(Not(Logical('AND', Compare('age', '>', 18), Compare('age', '<', 30)))),
+    ))
+    result_df = select_interpreter.execute(stmt)
     assert list(result_df.columns) == ["name"]
     assert set(result_df["name"].values) == {"Peter", "Xavier"} 
 
+def test_select_with_string_filter(select_interpreter):
+    stmt = SelectStmt(('age',), 'users', (
+        FilterClause(Compare('name', '==', 'Kristy')),
+    ))
+    result_df = select_interpreter.execute(stmt)
+    assert list(result_df["age"].values) == [24]
+
 """
 Test Group By Queries
 """
 def test_group_by(select_interpreter):
-    tree = Tree('select_stmt', [
-        Tree('select_columns', [
-            Tree('select_column', [Token('COL_NAME', 'age')]),
-            Tree('agg_expr', [
-                Tree('count', []),
-                Tree('agg_param', [Token('STAR', '*')])
-            ])
-        ]),
-        Tree('from_clause', [
-            Token('TABLE_NAME', 'users'),
-            Tree('groupby_clause', [
-                Tree('columns', [
-                    Token('COL_NAME', 'age')
-                ])
-            ])
-        ])
-    ])
-    result_df = select_interpreter.execute(tree)
+    stmt = SelectStmt(('age', AggExpr('COUNT', '*')), 'users', (
+        GroupByClause(('age',)),
+    ))
+    result_df = select_interpreter.execute(stmt)
     assert "count" in result_df.columns
     assert 24 in result_df["age"].values
 
 
+def test_group_by_multiple_aggregates(select_interpreter):
+    stmt = SelectStmt(('age', AggExpr('COUNT', '*'), AggExpr('SUM', 'salary'), AggExpr('AVG', 'salary')), 'users', (
+        GroupByClause(('age',)),
+    ))
+    result_df = select_interpreter.execute(stmt)
+    # COUNT(*) no longer hides the other aggregates
+    assert list(result_df.columns) == ["age", "count", "sum_salary", "avg_salary"]
+    row = result_df[result_df["age"] == 24].iloc[0]
+    assert row["count"] == 2
+    assert row["sum_salary"] == 1075000
+    assert row["avg_salary"] == 537500
+
+
 def test_group_by_multiple_columns(select_interpreter):
-    tree = Tree('select_stmt', [
-        Tree('select_columns', [
-            Tree('select_column', [Token('COL_NAME', 'age')]),
-            Tree('agg_expr', [
-                Tree('count', []),
-                Tree('agg_param', [Token('STAR', '*')])
-            ])
-        ]),
-        Tree('from_clause', [
-            Token('TABLE_NAME', 'users'),
-            Tree('groupby_clause', [
-                Tree('columns', [
-                    Token('COL_NAME', 'age'),
-                    Token('COL_NAME', 'name')
-                ])
-            ])
-        ])
-    ])
-    result_df = select_interpreter.execute(tree)
+    stmt = SelectStmt(('age', AggExpr('COUNT', '*')), 'users', (
+        GroupByClause(('age', 'name')),
+    ))
+    result_df = select_interpreter.execute(stmt)
     assert "count" in result_df.columns
     assert (24, "Rachel") in list(zip(result_df["age"], result_df["name"]))
 
@@ -263,61 +149,24 @@ def test_group_by_multiple_columns(select_interpreter):
 Test Order By Queries
 """
 def test_order_by(select_interpreter):
-    tree1 = Tree('select_stmt', [
-        Tree('select_columns', [Tree('select_column', [Token('COL_NAME', 'name')])]),
-        Tree('from_clause', [
-            Token('TABLE_NAME', 'users'),
-            Tree('orderby_clause', [
-                Tree('order_columns', [
-                    Tree('order_column', [
-                        Token('COL_NAME', 'age'),
-                        Token('ORDER', 'ASC')
-                    ])
-                ])
-            ])
-        ])
-    ])
-    result_df1 = select_interpreter.execute(tree1)
+    stmt1 = SelectStmt(('name',), 'users', (
+        OrderByClause((('age', True),)),
+    ))
+    result_df1 = select_interpreter.execute(stmt1)
     assert result_df1.iloc[0]["name"] == "Alice"  
 
-    tree2 = Tree('select_stmt', [
-        Tree('select_columns', [Tree('select_column', [Token('COL_NAME', 'name')])]),
-        Tree('from_clause', [
-            Token('TABLE_NAME', 'users'),
-            Tree('orderby_clause', [
-                Tree('order_columns', [
-                    Tree('order_column', [
-                        Token('COL_NAME', 'age'),
-                        Token('ORDER', 'DESC')
-                    ])
-                ])
-            ])
-        ])
-    ])
-    result_df2 = select_interpreter.execute(tree2)
+    stmt2 = SelectStmt(('name',), 'users', (
+        OrderByClause((('age', False),)),
+    ))
+    result_df2 = select_interpreter.execute(stmt2)
     assert result_df2.iloc[0]["name"] == "Xavier" 
 
 
 def test_order_by_multiple_columns(select_interpreter):
-    tree = Tree('select_stmt', [
-        Tree('select_columns', [Tree('select_column', [Token('COL_NAME', 'name')])]),
-        Tree('from_clause', [
-            Token('TABLE_NAME', 'users'),
-            Tree('orderby_clause', [
-                Tree('order_columns', [
-                    Tree('order_column', [
-                        Token('COL_NAME', 'age'),
-                        Token('ORDER', 'ASC')
-                    ]),
-                    Tree('order_column', [
-                        Token('COL_NAME', 'name'),
-                        Token('ORDER', 'DESC')
-                    ])
-                ])
-            ])
-        ])
-    ])
-    result_df = select_interpreter.execute(tree)
+    stmt = SelectStmt(('name',), 'users', (
+        OrderByClause((('age', True), ('name', False))),
+    ))
+    result_df = select_interpreter.execute(stmt)
     assert list(result_df["name"].values) == ["Alice", "Rachel", "Kristy", "Peter", "Xavier"]
 
 
@@ -325,27 +174,10 @@ def test_order_by_multiple_columns(select_interpreter):
 Test Compound Queries
 """
 def test_select_with_agg_filter(select_interpreter):
-    tree = Tree('select_stmt', [
-        Tree('select_columns', [
-            Tree('agg_expr', [
-                Tree('count', []),
-                Tree('agg_param', [Token('STAR', '*')])
-            ])
-        ]),
-        Tree('from_clause', [
-            Token('TABLE_NAME', 'users'),
-            Tree('filter_clause', [
-                Tree('condition', [
-                    Tree('simple_condition', [
-                        Token('COL_NAME', 'age'),
-                        Token('OP', '>'),
-                        Token('NUMBER', '18')
-                    ])
-                ])
-            ])
-        ])
-    ])
-    result_df = select_interpreter.execute(tree)
+    stmt = SelectStmt((AggExpr('COUNT', '*'),), 'users', (
+        FilterClause(Compare('age', '>', 18)),
+    ))
+    result_df = select_interpreter.execute(stmt)
     assert result_df.iloc[0, 0] == len(df_users[df_users["age"] > 18])
 
 
@@ -353,82 +185,86 @@ def test_select_with_agg_filter(select_interpreter):
 Test Complex Query
 """
 def test_complex_query(select_interpreter):
-    tree = Tree('select_stmt', [
-        Tree('select_columns', [
-            Tree('select_column', [Token('COL_NAME', 'name')]),
-            Tree('agg_expr', [
-                Tree('count', []),
-                Tree('agg_param', [Token('STAR', '*')])
-            ])
-        ]),
-        Tree('from_clause', [
-            Token('TABLE_NAME', 'users'),
-                Tree('filter_clause', [
-                    Tree('condition', [
-                        Tree('logical_condition', [
-                            Tree('simple_condition', [
-                                Token('COL_NAME', 'age'),
-                                Token('OP', '>'),
-                                Token('NUMBER', '18')
-                            ]),
-                            Token('LOP', 'AND'),
-                            Tree('simple_condition', [
-                                Token('COL_NAME', 'age'),
-                                Token('OP', '<'),
-                                Token('NUMBER', '30')
-                            ])
-                        ])
-                    ])
-                ]),
-            Tree('groupby_clause', [
-                Tree('columns', [
-                    Token('COL_NAME', 'name'),
-                    Token('COL_NAME', 'age')
-                ])
-            ]),
-            Tree('orderby_clause', [
-                Tree('order_columns', [
-                    Tree('order_column', [
-                        Token('COL_NAME', 'age'),
-                        Token('ORDER', 'DESC')
-                    ])
-                ])
-            ])
-        ])
-    ])
-    result_df = select_interpreter.execute(tree)
+    stmt = SelectStmt(('name', AggExpr('COUNT', '*')), 'users', (
+        FilterClause(Logical('AND', Compare('age', '>', 18), Compare('age', '<', 30))),
+        GroupByClause(('name', 'age')),
+        OrderByClause((('age', False),)),
+    ))
+    result_df = select_interpreter.execute(stmt)
     assert "name" in result_df.columns
     assert "count" in result_df.columns
     assert 24 in result_df["age"].values
 
 
 def test_creates_new_table(select_interpreter):
-    # The AS Token will be ignored by lark
-    tree = Tree('select_stmt', [
-        Tree('select_columns', [Tree('select_column', [Token('COL_NAME', 'name')])]),
-        Tree('from_clause', [Token('TABLE_NAME', 'users')]),
-        Token('TABLE_NAME', 'young_users')
-    ])
-
-    result_df = select_interpreter.execute(tree)
+    stmt = SelectStmt(('name',), 'users', into='young_users')
+
+    result_df = select_interpreter.execute(stmt)
     assert 'young_users' in select_interpreter.tables
     new_df = select_interpreter.tables['young_users']
     assert "name" in new_df.columns
     assert "Rachel" in new_df["name"].values
 
 def test_invalid_group_by(select_interpreter):
-    tree = Tree('select_stmt', [
-        Tree('select_columns', [
-            Tree('select_column', [Token('COL_NAME', 'name')])
-        ]),
-        Tree('from_clause', [
-            Token('TABLE_NAME', 'users'),
-            Tree('groupby_clause', [
-                Tree('columns', [
-                    Token('COL_NAME', 'age')
-                ])
-            ])
-        ])
-    ])
+    stmt = SelectStmt(('name',), 'users', (
+        GroupByClause(('age',)),
+    ))
     with pytest.raises(ValueError):
-        select_interpreter.execute(tree)
\ No newline at end of file
+        select_interpreter.execute(stmt)
+
+def test_filter_type_mismatch(select_interpreter):
+    stmt = SelectStmt(('age',), 'users', (
+        FilterClause(Compare('name', '<', 24)),
+    ))
+    with pytest.raises(TypeError):
+        select_interpreter.execute(stmt)
+
+
+"""
+Test Streamed Tables
+"""
+@pytest.fixture
+def stream_interpreter(tmp_path):
+    path = tmp_path / "users.csv"
+    df_users.to_csv(path, index=False)
+    # two rows per chunk, so every query merges several chunks
+    return SelectInterpreter({'users': StreamTable(str(path), chunksize=2)})
+
+
+def test_stream_select_with_filter(stream_interpreter):
+    cond = Compare('age', '>', 21)
+    stmt = SelectStmt(('name',), 'users', (FilterClause(cond),))
+    result_df = stream_interpreter.execute(stmt)
+    assert list(result_df['name']) == ['Rachel', 'Kristy', 'Peter', 'Xavier']
+    assert list(result_df.index) == [0, 2, 3, 4]
+
+
+def test_stream_aggregates(stream_interpreter):
+    aggs = (AggExpr('COUNT', '*'), AggExpr('SUM', 'salary'), AggExpr('MIN', 'age'),
+            AggExpr('MAX', 'name'), AggExpr('AVG', 'age'))
+    result_df = stream_interpreter.execute(SelectStmt(aggs, 'users'))
+    row = result_df.iloc[0]
+    assert row['count'] == 5
+    assert row['sum_salary'] == df_users['salary'].sum()
+    assert row['min_age'] == 20
+    assert row['max_name'] == 'Xavier'
+    assert row['avg_age'] == pytest.approx(df_users['age'].mean())
+
+
+def test_stream_group_by(stream_interpreter):
+    aggs = (AggExpr('COUNT', '*'), AggExpr('AVG', 'salary'))
+    stmt = SelectStmt(('age',) + aggs, 'users', (GroupByClause(('age',)),))
+    result_df = stream_interpreter.execute(stmt)
+    expected = df_users.groupby('age')['salary'].agg(['size', 'mean']).reset_index()
+    assert list(result_df['age']) == list(expected['age'])
+    assert list(result_df['count']) == list(expected['size'])
+    assert list(result_df['avg_salary']) == pytest.approx(list(expected['mean']))
+
+
+def test_order_by_limit(select_interpreter):
+    stmt = SelectStmt(('name',), 'users', (
+        OrderByClause((('age', False), ('name', True))),
+        LimitClause(2),
+    ))
+    result_df = select_interpreter.execute(stmt)
+    assert list(result_df['name']) == ['Xavier', 'Peter']
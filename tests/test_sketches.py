@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+from lib.sketches import KLLSketch, FrequentItems
+
+
+values = np.random.default_rng(0).lognormal(0, 1, 200_000)
+ordered = np.sort(values)
+
+
+def rank_error(sketch, q):
+    return abs(np.searchsorted(ordered, sketch.quantile(q)) / len(values) - q)
+
+
+def test_kll_quantiles():
+    sketch = KLLSketch(seed=0).update(values)
+    assert sketch.count == len(values)
+    assert len(sketch) < 1000
+    for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+        assert rank_error(sketch, q) < 0.0133
+
+
+def test_kll_merge():
+    left = KLLSketch(seed=1).update(values[:50_000])
+    right = KLLSketch(seed=2).update(values[50_000:])
+    merged = left.merge(right)
+    assert merged.count == len(values)
+    assert rank_error(merged, 0.5) < 0.0133
+
+
+def test_kll_skips_missing_values():
+    sketch = KLLSketch().update([1.0, np.nan, 3.0, 2.0])
+    assert sketch.count == 3
+    assert sketch.quantile(0.5) == 2.0
+    assert np.isnan(KLLSketch().quantile(0.5))
+
+
+def test_kll_is_deterministic_and_reads_series_in_batches():
+    # a nullable column, read batch by batch
+    values = pd.Series(np.random.default_rng(3).integers(0, 10_000, 200_000)).astype("Int64")
+    values[::7] = pd.NA
+    sketches = [KLLSketch().update(values) for _ in range(2)]
+    assert sketches[0].count == values.count()
+    assert [level.tolist() for level in sketches[0].levels] == [level.tolist() for level in sketches[1].levels]
+    exact = values.dropna().to_numpy(dtype=float)
+    assert abs((exact < sketches[0].quantile(0.5)).mean() - 0.5) < 0.0133
+
+
+def test_frequent_items():
+    rng = np.random.default_rng(0)
+    data = np.concatenate([rng.integers(0, 5000, 100_000), np.full(2_000, 7)])
+    summary = FrequentItems(k=100).update(rng.permutation(data))
+    assert len(summary.counters) <= 100
+    assert summary.most_frequent() == 7
+
+    # the counters underestimate by at most n / (k + 1)
+    exact = pd.Series(data).value_counts()
+    assert exact[7] - summary.counters[7] <= summary.error_bound()
+
+
+def test_frequent_items_merge():
+    left = FrequentItems(k=10).update(['a', 'b', 'a', None])
+    right = FrequentItems(k=10).update(['b', 'b', 'c'])
+    merged = left.merge(right)
+    assert merged.count == 6
+    assert merged.most_frequent() == 'b'
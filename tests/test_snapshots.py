@@ -0,0 +1,75 @@
+import pytest
+import numpy as np
+import pandas as pd
+from lib.interpreter.interpreter import Interpreter
+from lib.nodes import Snapshot, Restore, ShowSnapshots, DropRow, Normalize, FillNA
+
+
+@pytest.fixture
+def interpreter():
+    interpreter = Interpreter(load_cache=False)
+    interpreter.table['users'] = pd.DataFrame({
+        'name': ['Rachel', 'Alice', 'Kristy', 'Peter'],
+        'age': [24.0, None, 36.0, 20.0],
+        'salary': [100, 200, 300, 400],
+    })
+    return interpreter
+
+
+def test_snapshot_and_restore(interpreter):
+    original = interpreter.table['users'].copy()
+    interpreter.interpret(Snapshot('users', 'v1'))
+    interpreter.interpret(FillNA('users', 'age', 'value', 0))
+    interpreter.interpret(DropRow('users', 2))
+    assert len(interpreter.table['users']) == 3
+
+    restored = interpreter.interpret(Restore('users', 'v1'))
+    pd.testing.assert_frame_equal(restored, original)
+    # the snapshot is kept and can be restored again
+    interpreter.interpret(Normalize('users', 'salary'))
+    pd.testing.assert_frame_equal(interpreter.interpret(Restore('users', 'v1')), original)
+
+    with pytest.raises(ValueError):
+        interpreter.interpret(Restore('users', 'v2'))
+    with pytest.raises(ValueError):
+        interpreter.interpret(Snapshot('missing', 'v2'))
+
+
+def test_snapshots_share_columns(interpreter):
+    interpreter.interpret(Snapshot('users', 'v1'))
+    interpreter.interpret(Normalize('users', 'salary'))
+    interpreter.interpret(Snapshot('users', 'v2'))
+
+    # only the replaced column differs between the versions
+    v1 = interpreter.snapshots.entries['v1'][1]
+    v2 = interpreter.snapshots.entries['v2'][1]
+    assert np.shares_memory(v1['age'].to_numpy(), v2['age'].to_numpy())
+    assert not np.shares_memory(v1['salary'].to_numpy(), v2['salary'].to_numpy())
+
+    report = interpreter.interpret(ShowSnapshots())
+    assert list(report.index) == ['v1', 'v2', 'users']
+    assert report.loc['v1', 'rows'] == 4
+    salary = interpreter.table['users']['salary'].memory_usage(index=False)
+    assert report.loc['v1', 'bytes'] - report.loc['v1', 'shared_bytes'] == salary
+    assert report.loc['users', 'shared_bytes'] == report.loc['users', 'bytes']
+
+
+def test_restore_keeps_column_versions(interpreter):
+    interpreter.interpret(Snapshot('users', 'v1'))
+    before = dict(interpreter.table.versions['users'])
+    interpreter.interpret(DropRow('users', 0))
+    interpreter.interpret(Restore('users', 'v1'))
+    # caches keyed by column version (statistics, indexes) match the restored columns
+    assert interpreter.table.versions['users'] == before
+
+
+def test_snapshot_from_dsl(interpreter):
+    report = interpreter.run_script("""
+        SNAPSHOT users AS users_v1;
+        DROP ROW 0 FROM users;
+        RESTORE users FROM users_v1;
+        SELECT COUNT(*) FROM users;
+        SHOW SNAPSHOTS;
+    """, keep_results=True)
+    assert report[3]["result"].iloc[0, 0] == 4
+    assert list(report[4]["result"].index) == ['users_v1', 'users']
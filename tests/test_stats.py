@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+from lib.stats import ColumnStats, StatsCache
+from lib.tables import TableStore
+from lib.interpreter.clean_interpreter import CleanInterpreter
+from lib.nodes import FillNA, Normalize, FilterOutliers, DropRow, ReplaceCell
+
+
+values = pd.Series(np.random.default_rng(0).normal(50, 10, 1000))
+
+
+def assert_stats(stats, s):
+    assert stats.count == s.count()
+    assert stats.mean == pytest.approx(s.mean())
+    assert stats.std() == pytest.approx(s.std())
+
+
+def test_merge_and_remove():
+    left, right = values[:300], values[300:]
+    merged = ColumnStats.of(left).merge(ColumnStats.of(right))
+    assert_stats(merged, values)
+    assert (merged.min, merged.max) == (values.min(), values.max())
+    assert_stats(ColumnStats.of(values).remove(ColumnStats.of(right)), left)
+
+
+def test_scaled():
+    scaled = ColumnStats.of(values).scaled(values.min(), 2.0)
+    assert_stats(scaled, (values - values.min()) / 2.0)
+    assert scaled.min == 0
+
+
+def make_interpreter():
+    tables = TableStore()
+    tables['t'] = pd.DataFrame({'x': [1.0, None, 3.0, 4.0, 100.0], 'y': [5, 4, 3, 2, 1]})
+    return tables, CleanInterpreter(tables)
+
+
+def test_stats_follow_clean_commands():
+    tables, interpreter = make_interpreter()
+    interpreter.execute(FillNA('t', 'x', 'mean'))
+    interpreter.execute(DropRow('t', 4))
+    interpreter.execute(ReplaceCell('t', 0, 'x', 2.0))
+
+    # the moments were updated, never recomputed, and match the table
+    stats = interpreter.stats.column_stats('t', 'x')
+    assert_stats(stats, tables['t']['x'])
+
+    interpreter.execute(Normalize('t', 'x', 'zscore'))
+    stats = interpreter.stats.column_stats('t', 'x')
+    assert stats.mean == pytest.approx(0)
+    assert stats.std() == pytest.approx(1)
+
+
+def test_cached_stats_are_reused(monkeypatch):
+    tables, interpreter = make_interpreter()
+    interpreter.execute(FilterOutliers('t', 'y', 'iqr'))
+
+    calls = []
+    quantile = pd.Series.quantile
+    def spy(self, q, *args, **kwargs):
+        calls.append(q)
+        return quantile(self, q, *args, **kwargs)
+    monkeypatch.setattr(pd.Series, "quantile", spy)
+
+    # no row was removed, 'y' keeps its version and its memoized quartiles
+    interpreter.execute(FilterOutliers('t', 'y', 'iqr'))
+    assert calls == []
+    # an unrelated column update leaves the statistics of 'y' valid
+    interpreter.execute(FillNA('t', 'x', 'value', 0))
+    interpreter.execute(FilterOutliers('t', 'y', 'iqr'))
+    assert calls == []
+
+
+def test_changed_columns_are_recomputed():
+    tables, interpreter = make_interpreter()
+    assert interpreter.stats.mean(tables['t'], 't', 'y') == 3
+    tables['t'] = pd.DataFrame({'y': [10, 20]})
+    assert interpreter.stats.mean(tables['t'], 't', 'y') == 15
+
+
+def test_unversioned_tables_are_not_cached():
+    cache = StatsCache({'t': pd.DataFrame({'y': [1, 2]})})
+    assert cache.column_stats('t', 'y') is not cache.column_stats('t', 'y')
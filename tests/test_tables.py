@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from lib.tables import TableStore, update_columns, set_cell
+from lib.interpreter.clean_interpreter import CleanInterpreter
+from lib.nodes import FillNA, DropColumn, ReplaceCell
+
+
+def make_users():
+    return pd.DataFrame({
+        'id': [1, 2, 3, 4],
+        'age': [24.0, None, 36.0, 45.0],
+        'salary': [100.0, 200.0, 300.0, 400.0],
+    })
+
+
+def shares(left, right, col):
+    return np.shares_memory(left[col].to_numpy(), right[col].to_numpy())
+
+
+def test_store_keeps_the_columns():
+    df = make_users()
+    tables = TableStore()
+    tables['users'] = df
+    assert tables['users'].equals(df)
+    assert shares(tables['users'], df, 'salary')
+
+
+def test_update_columns_shares_untouched_columns():
+    tables = TableStore()
+    tables['users'] = make_users()
+    old = tables['users']
+
+    new = update_columns(tables, 'users', {'age': old['age'].fillna(0)})
+    assert tables['users'] is new
+    assert new['age'].isnull().sum() == 0
+    # the previous version is unchanged and the other columns are not copied
+    assert old['age'].isnull().sum() == 1
+    assert shares(old, new, 'salary') and shares(old, new, 'id')
+    assert not shares(old, new, 'age')
+
+
+def test_set_cell_copies_one_column():
+    tables = TableStore()
+    tables['users'] = make_users()
+    old = tables['users']
+
+    new = set_cell(tables, 'users', 2, 'salary', 0.0)
+    assert new.at[2, 'salary'] == 0.0
+    assert old.at[2, 'salary'] == 300.0
+    assert shares(old, new, 'age') and not shares(old, new, 'salary')
+
+
+def test_clean_commands_leave_previous_versions_intact():
+    tables = TableStore()
+    tables['users'] = make_users()
+    original = tables['users']
+    interpreter = CleanInterpreter(tables)
+
+    interpreter.execute(FillNA('users', 'age', 'value', 0))
+    interpreter.execute(ReplaceCell('users', 0, 'salary', 1.0))
+    interpreter.execute(DropColumn('users', 'id'))
+
+    df = tables['users']
+    assert list(df.columns) == ['age', 'salary']
+    assert df.at[0, 'salary'] == 1.0 and df.at[1, 'age'] == 0
+    assert original.equals(make_users())
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+import pytest
+from lib.topk import top_k, sort_rows
+
+
+rng = np.random.default_rng(0)
+df = pd.DataFrame({
+    'score': rng.integers(0, 20, 400).astype(float),
+    'grade': rng.integers(0, 5, 400),
+    'name': rng.choice(['a', 'b', 'c'], 400),
+}, index=rng.permutation(400))
+df.loc[df.index[rng.random(400) < 0.1], 'score'] = np.nan
+
+
+@pytest.mark.parametrize("keys", [
+    (('score', True),),
+    (('score', False),),
+    (('score', False), ('grade', True)),
+    (('grade', True), ('score', False)),
+    (('name', True), ('score', True)),
+])
+@pytest.mark.parametrize("k", [0, 1, 7, 50, 390, 1000])
+def test_top_k_matches_full_sort(keys, k):
+    # ties and missing values keep the order of a stable full sort
+    pd.testing.assert_frame_equal(top_k(df, keys, k), sort_rows(df, keys).head(k))